@@ -0,0 +1,78 @@
+"""Benchmark bitmap index query latency over large populations.
+
+Half of the variables are dense (about half of the rows set) and half are sparse (about one row in
+128 set), so chunks get both bitmap and array containers. Each query is timed as the median of
+several `count` calls.
+
+    python benchmarks/bitmap_index.py --rows 1000000 --rows 50000000
+"""
+
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import click
+from markers.bitmap_index import BitmapIndex
+from markers.lexer import Lexer
+from markers.parser import Parser
+
+QUERIES = [
+    "d0",
+    "s0",
+    "d0 and d1",
+    "d0 and s0",
+    "d0 or s0 or s1",
+    "not d0 and (d1 or not s2)",
+    "(d0 and d1 and not d2) or (s0 and not s1) or (d3 and s3)",
+]
+SPARSE_ROUNDS = 6
+
+
+def random_bitmap(num_rows: int, sparse: bool, rng: random.Random) -> bytes:
+    """Return a random bitmap with about half of the rows set, or one in 128 if sparse."""
+    num_bytes = (num_rows + 7) // 8
+    bits = int.from_bytes(rng.randbytes(num_bytes), "little")
+    if sparse:
+        for _ in range(SPARSE_ROUNDS):
+            bits &= int.from_bytes(rng.randbytes(num_bytes), "little")
+    return bits.to_bytes(num_bytes, "little")
+
+
+@click.command()
+@click.option("--rows", "row_counts", type=int, multiple=True, default=[1_000_000, 50_000_000])
+@click.option("--vars", "num_vars", type=int, default=8, help="Number of dense and of sparse variables.")
+@click.option("--repeat", type=int, default=5)
+@click.option("--seed", type=int, default=0)
+def main(row_counts: tuple[int, ...], num_vars: int, repeat: int, seed: int) -> None:
+    """Print build time, index size, load time, and query latencies for each population size."""
+    rng = random.Random(seed)
+    exprs = [(query, Parser(Lexer.tokenize(query)).parse()) for query in QUERIES]
+    for num_rows in row_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "population.index"
+            bitmaps = {f"d{idx}": random_bitmap(num_rows, sparse=False, rng=rng) for idx in range(num_vars)}
+            bitmaps.update({f"s{idx}": random_bitmap(num_rows, sparse=True, rng=rng) for idx in range(num_vars)})
+            start = time.perf_counter()
+            BitmapIndex(path).append_bitmaps(num_rows, bitmaps)
+            build = time.perf_counter() - start
+            start = time.perf_counter()
+            index = BitmapIndex(path)
+            load = time.perf_counter() - start
+            click.echo(
+                f"{num_rows:,} rows: built in {build:.2f}s, {path.stat().st_size / 2**20:,.1f} MiB, "
+                f"loaded in {load:.2f}s"
+            )
+            for query, expr in exprs:
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    count = index.count(expr)
+                    timings.append(time.perf_counter() - start)
+                median = statistics.median(timings) * 1000
+                click.echo(f"  {median:9.1f} ms  {count:>12,}  {query}")
+
+
+if __name__ == "__main__":
+    main()
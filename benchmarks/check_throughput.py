@@ -0,0 +1,57 @@
+"""Benchmark corpus checking throughput as the number of worker processes grows.
+
+About one formula in a hundred is invalid, so the report stays small and the run measures parsing.
+
+    python benchmarks/check_throughput.py --formulas 200000 --jobs 1 --jobs 2 --jobs 4
+"""
+
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import click
+from markers.check import Checker
+
+NUM_VARS = 64
+TERMS_PER_FORMULA = 8
+INVALID_PROBABILITY = 0.01
+
+
+def write_corpus(path: Path, num_formulas: int, rng: random.Random) -> None:
+    """Write a corpus file of random formulas, one per line."""
+    with path.open("w", encoding="utf-8") as file:
+        for _ in range(num_formulas):
+            terms = [f"v{rng.randrange(NUM_VARS)}" for _ in range(TERMS_PER_FORMULA)]
+            formula = f"({' and '.join(terms[:4])}) or not ({' or '.join(terms[4:])})"
+            if rng.random() < INVALID_PROBABILITY:
+                formula += " and"
+            file.write(formula + "\n")
+
+
+@click.command()
+@click.option("--formulas", "num_formulas", type=int, default=200_000)
+@click.option("--jobs", "job_counts", type=int, multiple=True)
+@click.option("--seed", type=int, default=0)
+def main(num_formulas: int, job_counts: tuple[int, ...], seed: int) -> None:
+    """Print formulas checked per second for each number of worker processes."""
+    cpus = os.cpu_count() or 1
+    job_counts = job_counts or tuple(sorted({1, 2, 4, cpus}))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "corpus.markers"
+        write_corpus(path, num_formulas, random.Random(seed))
+        for jobs in job_counts:
+            checker = Checker(jobs)
+            start = time.perf_counter()
+            for _ in checker.check([path]):
+                pass
+            elapsed = time.perf_counter() - start
+            click.echo(
+                f"{jobs:>3} jobs: {checker.formulas / elapsed:>10,.0f} formulas/s, {checker.invalid:,} invalid, "
+                f"{elapsed:.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Benchmark incremental reparsing after a one-character edit as the program grows.
+
+Each program has one rule per line, joined by `or`. A variable name is edited near the start, in the
+middle, and near the end of the program, and each reparse is timed against a full parse.
+
+    python benchmarks/incremental_reparse.py --lines 1000 --lines 10000 --lines 100000
+"""
+
+import random
+import time
+
+import click
+from markers.incremental import Edit, parse_program, reparse
+
+NUM_VARS = 64
+NOT_PROBABILITY = 0.25
+EDITS_PER_PLACE = 20
+
+
+def random_rule(rng: random.Random) -> str:
+    """Return a random rule with a nested group and negations."""
+    terms = [f"{'not ' if rng.random() < NOT_PROBABILITY else ''}v{rng.randrange(NUM_VARS)}" for _ in range(5)]
+    return f"{terms[0]} and ({terms[1]} or {terms[2]}) and not ({terms[3]} and {terms[4]})"
+
+
+@click.command()
+@click.option("--lines", "line_counts", type=int, multiple=True)
+@click.option("--seed", type=int, default=0)
+def main(line_counts: tuple[int, ...], seed: int) -> None:
+    """Print the time of a full parse and of reparsing edits at the start, middle, and end."""
+    rng = random.Random(seed)
+    for num_lines in line_counts or (1_000, 10_000, 100_000):
+        program = " or\n".join(random_rule(rng) for _ in range(num_lines))
+        start = time.perf_counter()
+        result = parse_program(program)
+        full = time.perf_counter() - start
+
+        timings = []
+        for fraction in (0.0, 0.5, 1.0):
+            # Rename the first variable of a line, and then rename it back
+            offset = result.program.rfind("\n", 0, int(len(result.program) * fraction)) + 1
+            offset = result.program.index("v", offset) + 1
+            elapsed = 0.0
+            for idx in range(EDITS_PER_PLACE):
+                edit = Edit(offset, 0, "x") if idx % 2 == 0 else Edit(offset, 1, "")
+                start = time.perf_counter()
+                result = reparse(result, edit)
+                elapsed += time.perf_counter() - start
+            assert result.expr is not None
+            timings.append(elapsed / EDITS_PER_PLACE)
+
+        click.echo(
+            f"{num_lines:>8} lines: full parse {full * 1000:9.1f} ms, reparse "
+            + ", ".join(
+                f"{place} {timing * 1000:6.3f} ms" for place, timing in zip(("start", "middle", "end"), timings)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
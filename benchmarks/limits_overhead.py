@@ -0,0 +1,80 @@
+"""Benchmark the overhead of resource limits on programs that stay within them.
+
+Random formulas are lexed, parsed, and evaluated with no limits and with the untrusted limits, and
+each stage is timed as the best of several runs.
+
+    python benchmarks/limits_overhead.py --formulas 20000
+"""
+
+import random
+import time
+from functools import partial
+from typing import Callable, Optional
+
+import click
+from markers import Evaluator, Lexer, Parser
+from markers.limits import UNTRUSTED_LIMITS, Limits
+
+NUM_VARS = 64
+TERMS_PER_FORMULA = 8
+NOT_PROBABILITY = 0.25
+TRUE_PROBABILITY = 0.5
+
+
+def random_formula(rng: random.Random) -> str:
+    """Return a random formula with nested groups and negations."""
+    terms = [
+        f"{'not ' if rng.random() < NOT_PROBABILITY else ''}v{rng.randrange(NUM_VARS)}"
+        for _ in range(TERMS_PER_FORMULA)
+    ]
+    return f"({' and '.join(terms[:4])}) or not ({' or '.join(terms[4:6])}) and ({' or '.join(terms[6:])})"
+
+
+def best_time(run: Callable[[], object], repeat: int) -> float:
+    """Return the fastest of several runs in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@click.command()
+@click.option("--formulas", "num_formulas", type=int, default=20_000)
+@click.option("--repeat", type=int, default=5)
+@click.option("--seed", type=int, default=0)
+def main(num_formulas: int, repeat: int, seed: int) -> None:
+    """Print the time of each stage with and without limits, and the relative overhead."""
+    rng = random.Random(seed)
+    programs = [random_formula(rng) for _ in range(num_formulas)]
+    env = {f"v{idx}": rng.random() < TRUE_PROBABILITY for idx in range(NUM_VARS)}
+
+    def lex(limits: Optional[Limits]) -> None:
+        for program in programs:
+            Lexer.tokenize(program, limits=limits)
+
+    token_lists = [Lexer.tokenize(program) for program in programs]
+
+    def parse(limits: Optional[Limits]) -> None:
+        for tokens in token_lists:
+            Parser(tokens, limits=limits).parse()
+
+    exprs = [Parser(tokens).parse() for tokens in token_lists]
+
+    def evaluate(limits: Optional[Limits]) -> None:
+        evaluator = Evaluator(limits=limits)
+        for expr in exprs:
+            evaluator.evaluate(expr, env)
+
+    for stage, run in [("lex", lex), ("parse", parse), ("evaluate", evaluate)]:
+        unlimited = best_time(partial(run, None), repeat)
+        limited = best_time(partial(run, UNTRUSTED_LIMITS), repeat)
+        overhead = (limited / unlimited - 1) * 100
+        click.echo(
+            f"{stage:>8}: {unlimited * 1000:8.1f} ms unlimited, {limited * 1000:8.1f} ms limited, {overhead:+6.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
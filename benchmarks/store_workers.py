@@ -0,0 +1,97 @@
+"""Benchmark worker startup and memory with a shared formula store versus parsing in every worker.
+
+Each worker either parses the definitions file itself or maps the compiled store, then evaluates
+every formula once. Private memory is read from /proc, so it is only reported on Linux.
+
+    python benchmarks/store_workers.py --formulas 100000 --workers 8
+"""
+
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import click
+from markers.definitions import iter_definitions
+from markers.evaluator import Evaluator
+from markers.store import FormulaStore, build_store
+
+NUM_VARS = 64
+TERMS_PER_FORMULA = 6
+NEGATE_PROBABILITY = 0.3
+
+
+def write_definitions(path: Path, num_formulas: int, rng: random.Random) -> None:
+    """Write a definitions file of random formulas."""
+    with path.open("w", encoding="utf-8") as file:
+        for idx in range(num_formulas):
+            terms = [
+                f"not v{rng.randrange(NUM_VARS)}"
+                if rng.random() < NEGATE_PROBABILITY
+                else f"v{rng.randrange(NUM_VARS)}"
+                for _ in range(TERMS_PER_FORMULA)
+            ]
+            file.write(f"f{idx} = ({' and '.join(terms[:3])}) or ({' or '.join(terms[3:])})\n")
+
+
+def private_kib() -> int:
+    """Return the private memory of the current process in KiB, or 0 if unavailable."""
+    try:
+        lines = Path("/proc/self/smaps_rollup").read_text().splitlines()
+    except OSError:
+        return 0
+    return sum(int(line.split()[1]) for line in lines if line.startswith(("Private_Clean", "Private_Dirty")))
+
+
+def parse_worker(path: Path) -> tuple[float, int]:
+    """Parse the definitions and evaluate every formula."""
+    start = time.perf_counter()
+    with path.open(encoding="utf-8") as file:
+        definitions = list(iter_definitions(file))
+    startup = time.perf_counter() - start
+    env = {f"v{idx}": idx % 2 == 0 for idx in range(NUM_VARS)}
+    evaluator = Evaluator()
+    for definition in definitions:
+        evaluator.evaluate(definition.expr, env)
+    return startup, private_kib()
+
+
+def store_worker(path: Path) -> tuple[float, int]:
+    """Map the store and evaluate every formula."""
+    start = time.perf_counter()
+    store = FormulaStore(path)
+    startup = time.perf_counter() - start
+    env = {f"v{idx}": idx % 2 == 0 for idx in range(NUM_VARS)}
+    with store:
+        for name in store.names():
+            store.evaluate(name, env)
+        return startup, private_kib()
+
+
+@click.command()
+@click.option("--formulas", "num_formulas", type=int, default=100_000)
+@click.option("--workers", "num_workers", type=int, default=4)
+@click.option("--seed", type=int, default=0)
+def main(num_formulas: int, num_workers: int, seed: int) -> None:
+    """Print per-worker startup time and private memory for both approaches."""
+    with tempfile.TemporaryDirectory() as tmp:
+        definitions = Path(tmp) / "rules.markers"
+        store = Path(tmp) / "rules.store"
+        write_definitions(definitions, num_formulas, random.Random(seed))
+        start = time.perf_counter()
+        with definitions.open(encoding="utf-8") as file:
+            build_store(store, iter_definitions(file))
+        click.echo(f"built store of {num_formulas} formulas in {time.perf_counter() - start:.2f}s")
+        click.echo(f"store size {store.stat().st_size / 1024:,.0f} KiB")
+
+        for label, worker, path in [("parse", parse_worker, definitions), ("store", store_worker, store)]:
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                results = list(executor.map(worker, [path] * num_workers))
+            startup = max(result[0] for result in results)
+            memory = sum(result[1] for result in results)
+            click.echo(f"{label}: startup {startup:.3f}s per worker, private memory {memory / 1024:,.1f} MiB total")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark batch evaluation throughput as the thread count grows.
+
+Run it on a regular and a free-threaded interpreter to compare scaling with and without the GIL:
+
+    python benchmarks/thread_scaling.py
+    python3.13t benchmarks/thread_scaling.py
+"""
+
+import random
+import sys
+import time
+
+import click
+from markers.evaluator import Evaluator
+from markers.expressions import Expr
+from markers.lexer import Lexer
+from markers.parser import Parser
+from markers.type import Env
+
+TRUE_PROBABILITY = 0.5
+GROUP_SIZE = 4
+
+
+def build_program(num_vars: int, rng: random.Random) -> str:
+    """Build a random program in which every variable appears once."""
+    terms = [f"not v{idx}" if rng.random() < TRUE_PROBABILITY else f"v{idx}" for idx in range(num_vars)]
+    groups = [" and ".join(terms[idx : idx + GROUP_SIZE]) for idx in range(0, num_vars, GROUP_SIZE)]
+    return " or ".join(f"({group})" for group in groups)
+
+
+def build_envs(num_vars: int, num_envs: int, rng: random.Random) -> list[Env]:
+    """Build random environments assigning every variable."""
+    return [{f"v{idx}": rng.random() < TRUE_PROBABILITY for idx in range(num_vars)} for _ in range(num_envs)]
+
+
+def gil_enabled() -> bool:
+    """Return whether the interpreter runs with the GIL."""
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return True if is_gil_enabled is None else bool(is_gil_enabled())
+
+
+def measure(expr: Expr, envs: list[Env], threads: int, repeat: int) -> float:
+    """Return the best throughput in evaluations per second."""
+    evaluator = Evaluator()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        evaluator.evaluate_batch(expr, envs, max_workers=threads)
+        best = min(best, time.perf_counter() - start)
+    return len(envs) / best
+
+
+@click.command()
+@click.option("--vars", "num_vars", type=int, default=64)
+@click.option("--envs", "num_envs", type=int, default=50_000)
+@click.option("--max-threads", type=int, default=8)
+@click.option("--repeat", type=int, default=3)
+@click.option("--seed", type=int, default=0)
+def main(num_vars: int, num_envs: int, max_threads: int, repeat: int, seed: int) -> None:
+    """Print evaluation throughput for 1, 2, 4, ... threads."""
+    rng = random.Random(seed)
+    expr = Parser(Lexer.tokenize(build_program(num_vars, rng))).parse()
+    envs = build_envs(num_vars, num_envs, rng)
+
+    click.echo(f"python {sys.version.split()[0]}, GIL {'enabled' if gil_enabled() else 'disabled'}")
+    baseline = None
+    threads = 1
+    while threads <= max_threads:
+        throughput = measure(expr, envs, threads, repeat)
+        baseline = baseline or throughput
+        click.echo(f"threads {threads:>3}: {throughput:>12,.0f} evals/s  speedup {throughput / baseline:.2f}x")
+        threads *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import importlib.metadata
 from markers.evaluator import Evaluator
 from markers.lexer import Lexer
 from markers.parser import Parser
+from markers.stats import Stats
 
 __version__ = importlib.metadata.version("markers")
 
@@ -10,5 +11,6 @@ __all__ = [
     "Evaluator",
     "Lexer",
     "Parser",
+    "Stats",
     "__version__",
 ]
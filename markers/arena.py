@@ -0,0 +1,417 @@
+from array import array
+from dataclasses import dataclass, field
+from typing import Iterator, Optional, Union
+
+from markers.error import EvaluateError, ParseError
+from markers.parser import ParserBase
+from markers.tokens import (
+    AndOpToken,
+    LeftParenToken,
+    LitToken,
+    NameToken,
+    NotOpToken,
+    OrOpToken,
+    RightParenToken,
+    Token,
+)
+from markers.type import Env, LineIndex, PositionInfo
+
+_FALSE = 0
+_TRUE = 1
+_VAR = 2
+_NOT = 3
+_AND = 4
+_OR = 5
+
+_KIND_NAMES = ("lit", "lit", "var", "not", "and", "or")
+_KIND_LENGTHS = (5, 4, 0, 3, 3, 2)
+_NO_OFFSET = -1
+
+
+@dataclass
+class Arena:
+    """Expression tree stored as columns of a struct-of-arrays, with one entry per node.
+
+    For a variable, `lefts` holds the index of its name in `names`. For NOT it holds the operand,
+    and for AND/OR it holds the left operand while `rights` holds the right one. AND/OR chains are
+    stored as left-nested binary nodes, and `chained` marks the nodes that continue the chain of their
+    left operand, which tells a chain apart from a parenthesized group of the same operator. Only the
+    offset of each node is stored, and full positions are computed on demand from the line index. A
+    node costs 18 bytes instead of a dataclass instance per node.
+    """
+
+    kinds: "array[int]" = field(default_factory=lambda: array("B"))
+    lefts: "array[int]" = field(default_factory=lambda: array("i"))
+    rights: "array[int]" = field(default_factory=lambda: array("i"))
+    chained: "array[int]" = field(default_factory=lambda: array("B"))
+    offsets: "array[int]" = field(default_factory=lambda: array("q"))
+    names: list[str] = field(default_factory=list)
+    index: Optional[LineIndex] = None
+    root: int = -1
+    _name_ids: dict[str, int] = field(default_factory=dict, repr=False)
+
+    def __len__(self) -> int:
+        """Return the number of nodes."""
+        return len(self.kinds)
+
+    def _add(self, kind: int, left: int, right: int, pos: PositionInfo, chained: bool = False) -> int:
+        self.kinds.append(kind)
+        self.lefts.append(left)
+        self.rights.append(right)
+        self.chained.append(chained)
+        self.offsets.append(_NO_OFFSET if pos.offset is None else pos.offset)
+        return len(self.kinds) - 1
+
+    def add_lit(self, val: bool, pos: PositionInfo) -> int:
+        """Add a literal node.
+
+        Args:
+            val (bool): The literal value.
+            pos (PositionInfo): The position of the literal.
+
+        Returns:
+            int: The node index.
+        """
+        return self._add(_TRUE if val else _FALSE, -1, -1, pos)
+
+    def add_var(self, name: str, pos: PositionInfo) -> int:
+        """Add a variable node, interning its name.
+
+        Args:
+            name (str): The variable name.
+            pos (PositionInfo): The position of the variable.
+
+        Returns:
+            int: The node index.
+        """
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = self._name_ids[name] = len(self.names)
+            self.names.append(name)
+        return self._add(_VAR, name_id, -1, pos)
+
+    def add_not(self, arg: int, pos: PositionInfo) -> int:
+        """Add a NOT node.
+
+        Args:
+            arg (int): The operand node index.
+            pos (PositionInfo): The position of the operator.
+
+        Returns:
+            int: The node index.
+        """
+        return self._add(_NOT, arg, -1, pos)
+
+    def add_and(self, left: int, right: int, pos: PositionInfo, chained: bool = False) -> int:
+        """Add an AND node.
+
+        Args:
+            left (int): The left operand node index.
+            right (int): The right operand node index.
+            pos (PositionInfo): The position of the operator.
+            chained (bool): Whether the node continues the AND chain of its left operand.
+
+        Returns:
+            int: The node index.
+        """
+        return self._add(_AND, left, right, pos, chained)
+
+    def add_or(self, left: int, right: int, pos: PositionInfo, chained: bool = False) -> int:
+        """Add an OR node.
+
+        Args:
+            left (int): The left operand node index.
+            right (int): The right operand node index.
+            pos (PositionInfo): The position of the operator.
+            chained (bool): Whether the node continues the OR chain of its left operand.
+
+        Returns:
+            int: The node index.
+        """
+        return self._add(_OR, left, right, pos, chained)
+
+    def view(self, node: Optional[int] = None) -> "NodeView":
+        """Return a handle to a node.
+
+        Args:
+            node (Optional[int]): The node index, defaulting to the root.
+
+        Returns:
+            NodeView: The node handle.
+        """
+        return NodeView(self, self.root if node is None else node)
+
+    def evaluate(self, env: Env, node: Optional[int] = None) -> bool:
+        """Evaluate a node without recursion, short-circuiting AND/OR.
+
+        Args:
+            env (Env): The environment with variable assignments.
+            node (Optional[int]): The node index, defaulting to the root.
+
+        Raises:
+            EvaluateError: If a variable is unknown.
+
+        Returns:
+            bool: Whether the node evaluates to true.
+        """
+        kinds, lefts, rights, names = self.kinds, self.lefts, self.rights, self.names
+        values: list[bool] = []
+        # Non-negative entries are nodes to visit, and ~node resumes a node once its left operand is known
+        stack = [self.root if node is None else node]
+        while stack:
+            item = stack.pop()
+            if item >= 0:
+                kind = kinds[item]
+                if kind <= _TRUE:
+                    values.append(kind == _TRUE)
+                elif kind == _VAR:
+                    name = names[lefts[item]]
+                    if name not in env:
+                        msg = f'Unknown variable: "{name}"'
+                        raise EvaluateError(msg, self.pos(item))
+                    values.append(env[name])
+                else:
+                    stack.extend([~item, lefts[item]])
+                continue
+            item = ~item
+            kind = kinds[item]
+            if kind == _NOT:
+                values[-1] = not values[-1]
+            elif values[-1] == (kind == _AND):
+                # The left operand does not decide the result, so the right operand's value is the result
+                values.pop()
+                stack.append(rights[item])
+        return values[0]
+
+    def to_string(self, node: Optional[int] = None) -> str:
+        """Render a node without recursion, in the same format as expression nodes.
+
+        Chains are rendered as one group, like n-ary nodes, while parenthesized groups keep their own
+        parentheses even if they use the same operator.
+
+        Args:
+            node (Optional[int]): The node index, defaulting to the root.
+
+        Returns:
+            str: The string representation.
+        """
+        kinds, lefts, rights, chained = self.kinds, self.lefts, self.rights, self.chained
+        parts: list[str] = []
+        # Entries are either literal text to emit or node indices to render
+        stack: list[Union[str, int]] = [self.root if node is None else node]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                parts.append(item)
+                continue
+            kind = kinds[item]
+            if kind <= _TRUE:
+                parts.append("True" if kind == _TRUE else "False")
+            elif kind == _VAR:
+                parts.append(self.names[lefts[item]])
+            elif kind == _NOT:
+                stack.extend([")", lefts[item], "(not "])
+            else:
+                operands = [rights[item]]
+                while chained[item]:
+                    item = lefts[item]
+                    operands.append(rights[item])
+                operands.append(lefts[item])
+                separator = f" {_KIND_NAMES[kind]} "
+                stack.append(")")
+                for idx, operand in enumerate(operands):
+                    if idx > 0:
+                        stack.append(separator)
+                    stack.append(operand)
+                stack.append("(")
+        return "".join(parts)
+
+    def __str__(self) -> str:
+        """Return the string representation of the root node."""
+        return self.to_string()
+
+    def pos(self, node: int) -> PositionInfo:
+        """Return the position of a node.
+
+        Args:
+            node (int): The node index.
+
+        Returns:
+            PositionInfo: The position, or an empty position if the offset or line index is unknown.
+        """
+        kind = self.kinds[node]
+        length = len(self.names[self.lefts[node]]) if kind == _VAR else _KIND_LENGTHS[kind]
+        offset = self.offsets[node]
+        if offset == _NO_OFFSET or self.index is None:
+            return PositionInfo(0, 0, length)
+        return PositionInfo.at(self.index, offset, length)
+
+
+class NodeView:
+    """Lightweight handle to a node of an arena, for walking the tree without building expressions."""
+
+    __slots__ = ("arena", "node")
+
+    def __init__(self, arena: Arena, node: int):
+        """Initialize a NodeView.
+
+        Args:
+            arena (Arena): The arena that holds the node.
+            node (int): The node index.
+        """
+        self.arena = arena
+        self.node = node
+
+    @property
+    def kind(self) -> str:
+        """Return the node kind, one of "lit", "var", "not", "and", or "or"."""
+        return _KIND_NAMES[self.arena.kinds[self.node]]
+
+    @property
+    def name(self) -> str:
+        """Return the name of a variable node."""
+        if self.arena.kinds[self.node] != _VAR:
+            msg = f"Node {self.node} is not a variable"
+            raise TypeError(msg)
+        return self.arena.names[self.arena.lefts[self.node]]
+
+    @property
+    def value(self) -> bool:
+        """Return the value of a literal node."""
+        kind = self.arena.kinds[self.node]
+        if kind > _TRUE:
+            msg = f"Node {self.node} is not a literal"
+            raise TypeError(msg)
+        return kind == _TRUE
+
+    @property
+    def pos(self) -> PositionInfo:
+        """Return the position of the node."""
+        return self.arena.pos(self.node)
+
+    def children(self) -> tuple["NodeView", ...]:
+        """Return handles to the child nodes."""
+        kind = self.arena.kinds[self.node]
+        if kind == _NOT:
+            return (NodeView(self.arena, self.arena.lefts[self.node]),)
+        if kind >= _AND:
+            return (
+                NodeView(self.arena, self.arena.lefts[self.node]),
+                NodeView(self.arena, self.arena.rights[self.node]),
+            )
+        return ()
+
+    def walk(self) -> Iterator["NodeView"]:
+        """Iterate over the subtree in pre-order without recursion.
+
+        Yields:
+            NodeView: The next node handle.
+        """
+        stack = [self]
+        while stack:
+            view = stack.pop()
+            yield view
+            stack.extend(reversed(view.children()))
+
+    def evaluate(self, env: Env) -> bool:
+        """Evaluate the node.
+
+        Args:
+            env (Env): The environment with variable assignments.
+
+        Raises:
+            EvaluateError: If a variable is unknown.
+
+        Returns:
+            bool: Whether the node evaluates to true.
+        """
+        return self.arena.evaluate(env, self.node)
+
+    def __eq__(self, other: object) -> bool:
+        """Return whether two handles refer to the same node."""
+        if not isinstance(other, NodeView):
+            return NotImplemented
+        return self.arena is other.arena and self.node == other.node
+
+    def __hash__(self) -> int:
+        """Return the hash of the handle."""
+        return hash((id(self.arena), self.node))
+
+    def __str__(self) -> str:
+        """Return the string representation of the node."""
+        return self.arena.to_string(self.node)
+
+    def __repr__(self) -> str:
+        """Return the representation of the handle."""
+        return f"NodeView(node={self.node}, kind={self.kind!r})"
+
+
+@dataclass
+class ArenaParser(ParserBase):
+    """Boolean expression parser that builds an arena instead of expression nodes.
+
+    It accepts the same programs and reports the same errors as Parser.
+    """
+
+    index: Optional[LineIndex] = None
+
+    def parse(self) -> Arena:
+        """Parse the boolean expression.
+
+        Raises:
+            ParseError: If the expression is invalid.
+
+        Returns:
+            Arena: The arena, with the root of the expression set.
+        """
+        arena = Arena(index=self.index)
+        arena.root = self._or(arena)
+        if self._has():
+            token = self._peek()
+            msg = f'Unexpected token "{token!s}"'
+            raise ParseError(msg, token.pos)
+        return arena
+
+    def _or(self, arena: Arena) -> int:
+        left = self._and(arena)
+        chained = False
+        while token := self._match(OrOpToken):
+            left = arena.add_or(left, self._and(arena), token.pos, chained)
+            chained = True
+        return left
+
+    def _and(self, arena: Arena) -> int:
+        left = self._not(arena)
+        chained = False
+        while token := self._match(AndOpToken):
+            left = arena.add_and(left, self._not(arena), token.pos, chained)
+            chained = True
+        return left
+
+    def _not(self, arena: Arena) -> int:
+        if token := self._match(NotOpToken):
+            return arena.add_not(self._not(arena), token.pos)
+        return self._operand(arena)
+
+    def _operand(self, arena: Arena) -> int:
+        if token := self._match(LeftParenToken):
+            result = self._or(arena)
+            if not self._match(RightParenToken):
+                msg = "Expected closing paren matching opening"
+                raise ParseError(msg, token.pos)
+            return result
+        if token := self._match(LitToken):
+            assert isinstance(token, LitToken)
+            return arena.add_lit(token.value, token.pos)
+        if token := self._match(NameToken):
+            assert isinstance(token, NameToken)
+            if not token.value.isidentifier():
+                msg = f'Unexpected token "{token.value}"'
+                raise ParseError(msg, token.pos)
+            return arena.add_var(token.value, token.pos)
+        return self._unexpected_end()
+
+    def _unexpected_end(self) -> int:
+        token: Optional[Token] = self._last_token()
+        msg = "Unexpected end of input"
+        raise ParseError(msg, PositionInfo(0, 0, 0) if token is None else token.pos)
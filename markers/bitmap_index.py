@@ -0,0 +1,352 @@
+import os
+import struct
+import sys
+from array import array
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Mapping, Optional
+
+from markers.error import EvaluateError, InternalError
+from markers.expressions import BinaryOp, BinaryOpKind, Expr, Lit, NaryOp, UnaryOp, UnaryOpKind, Var, walk
+from markers.type import Env
+
+CHUNK_ROWS = 1 << 16
+_CHUNK_BYTES = CHUNK_ROWS // 8
+# A sorted array of 16-bit row numbers is smaller than a bitmap up to this many rows
+_ARRAY_MAX = 4096
+
+_MAGIC = b"MKBI"
+_VERSION = 1
+_HEADER = struct.Struct("<4sI")
+_NAME = struct.Struct("<BI")
+_CHUNK = struct.Struct("<BII")
+_CONTAINER = struct.Struct("<IBI")
+_TAG_NAME = ord("N")
+_TAG_CHUNK = ord("C")
+_KIND_ARRAY = 0
+_KIND_BITMAP = 1
+
+# Set bit positions of every byte value, for iterating over the rows of a bitmap
+_BYTE_BITS = tuple(tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256))
+
+
+@dataclass
+class _Chunk:
+    rows: int
+    # Containers by variable id, as (kind, payload), where a missing container has no set rows
+    containers: dict[int, tuple[int, bytes]] = field(default_factory=dict)
+
+    def column(self, var_ids: dict[str, int], name: str) -> int:
+        return self.bits(var_ids[name])
+
+    def bits(self, var_id: int) -> int:
+        container = self.containers.get(var_id)
+        if container is None:
+            return 0
+        kind, payload = container
+        if kind == _KIND_BITMAP:
+            return int.from_bytes(payload, "little")
+        rows = array("H")
+        rows.frombytes(payload)
+        if sys.byteorder == "big":
+            rows.byteswap()
+        bitmap = bytearray(_CHUNK_BYTES)
+        for row in rows:
+            bitmap[row >> 3] |= 1 << (row & 7)
+        return int.from_bytes(bitmap, "little")
+
+
+class BitmapIndex:
+    """Compressed bitmap index over a population of environments, one bitmap per variable.
+
+    Rows are split into chunks of 65536, and each variable has one container per chunk in the style
+    of roaring bitmaps: a sorted array of 16-bit row numbers when at most 4096 rows are set, and a
+    plain bitmap otherwise. Chunks where a variable has no set rows have no container. Queries
+    combine the containers of each chunk following the AND/OR/NOT structure of an expression, so
+    their cost grows with the number of chunks and expression nodes, not with the number of rows.
+
+    Variables that an environment does not have are false for its row. An index with a path is
+    persisted as it is appended to, by rewriting the last chunk if it is partial and appending the
+    rest, and is loaded again by opening the same path. An index must not be appended to while
+    another process reads or appends to the same file.
+
+    The file is a header (magic, version) followed by little-endian records: a name record
+    (tag, length, UTF-8 name) for each variable in order of its id, and a chunk record (tag, rows,
+    container count) followed by (variable id, kind, length, payload) for each container.
+    """
+
+    __slots__ = ("_chunks", "_last_chunk_offset", "_name_ids", "_rows", "_size", "names", "path")
+
+    def __init__(self, path: Optional[Path] = None):
+        """Initialize a BitmapIndex, loading it if the path exists and creating it otherwise.
+
+        Args:
+            path (Optional[Path]): The path to the index file, or None to keep the index in memory.
+
+        Raises:
+            InternalError: If the file is not a bitmap index.
+        """
+        self.path = path
+        self.names: list[str] = []
+        self._name_ids: dict[str, int] = {}
+        self._chunks: list[_Chunk] = []
+        self._rows = 0
+        self._size = 0
+        self._last_chunk_offset = 0
+        if path is None:
+            return
+        if path.exists():
+            self._load(path)
+        else:
+            path.write_bytes(_HEADER.pack(_MAGIC, _VERSION))
+            self._size = self._last_chunk_offset = _HEADER.size
+
+    def __len__(self) -> int:
+        """Return the number of rows."""
+        return self._rows
+
+    def append(self, envs: Iterable[Env]) -> None:
+        """Append a row for each environment.
+
+        Args:
+            envs (Iterable[Env]): The environments with variable assignments.
+        """
+        columns: dict[str, list[int]] = {}
+        num_rows = 0
+        for row, env in enumerate(envs):
+            for name, value in env.items():
+                rows = columns.setdefault(name, [])
+                if value:
+                    rows.append(row)
+            num_rows = row + 1
+
+        bitmaps: dict[str, bytes] = {}
+        for name, rows in columns.items():
+            bitmap = bytearray((num_rows + 7) // 8)
+            for row in rows:
+                bitmap[row >> 3] |= 1 << (row & 7)
+            bitmaps[name] = bytes(bitmap)
+        self.append_bitmaps(num_rows, bitmaps)
+
+    def append_bitmaps(self, num_rows: int, bitmaps: Mapping[str, bytes]) -> None:
+        """Append rows given as one little-endian bitmap per variable.
+
+        This is the fast path for bulk loading, since it does not build an environment per row.
+
+        Args:
+            num_rows (int): The number of rows to append.
+            bitmaps (Mapping[str, bytes]): The bitmap of each variable, with bit `i` for row `i`.
+
+        Raises:
+            InternalError: If a bitmap does not have one bit per row.
+        """
+        num_bytes = (num_rows + 7) // 8
+        for name, bitmap in bitmaps.items():
+            if len(bitmap) != num_bytes:
+                msg = f'Expected {num_bytes} bitmap bytes for "{name}", found {len(bitmap)}'
+                raise InternalError(msg)
+        if num_rows == 0 and not bitmaps:
+            return
+
+        new_names = [name for name in bitmaps if name not in self._name_ids]
+        for name in new_names:
+            self._name_ids[name] = len(self.names)
+            self.names.append(name)
+
+        # Shift the new rows past the rows of a partial last chunk, so they can be sliced into chunks
+        partial = self._rows % CHUNK_ROWS
+        if partial:
+            first = self._chunks.pop()
+            rewrite = True
+        else:
+            first = _Chunk(0)
+            rewrite = False
+        span = partial + num_rows
+        mask = (1 << num_rows) - 1
+        shifted = {
+            self._name_ids[name]: ((int.from_bytes(bitmap, "little") & mask) << partial).to_bytes(
+                (span + 7) // 8, "little"
+            )
+            for name, bitmap in bitmaps.items()
+        }
+
+        new_chunks: list[_Chunk] = []
+        for start in range(0, span, CHUNK_ROWS):
+            chunk = _Chunk(min(CHUNK_ROWS, span - start))
+            byte_start = start // 8
+            for var_id, data in shifted.items():
+                bits = int.from_bytes(data[byte_start : byte_start + _CHUNK_BYTES], "little")
+                if start == 0:
+                    bits |= first.bits(var_id)
+                _set_container(chunk, var_id, bits)
+            if start == 0:
+                for var_id in first.containers.keys() - shifted.keys():
+                    chunk.containers[var_id] = first.containers[var_id]
+            new_chunks.append(chunk)
+
+        self._chunks.extend(new_chunks)
+        self._rows += num_rows
+        if self.path is not None:
+            self._write(new_names, new_chunks, rewrite)
+
+    def count(self, expr: Expr) -> int:
+        """Return the number of rows that satisfy an expression.
+
+        Args:
+            expr (Expr): The AST expression node to evaluate.
+
+        Raises:
+            EvaluateError: If a variable is not in the index.
+            InternalError: If the expression is invalid.
+
+        Returns:
+            int: The number of matching rows.
+        """
+        return sum(bits.bit_count() for _, bits in self._iter_results(expr))
+
+    def iter_ids(self, expr: Expr) -> Iterator[int]:
+        """Iterate over the rows that satisfy an expression, in order.
+
+        Args:
+            expr (Expr): The AST expression node to evaluate.
+
+        Raises:
+            EvaluateError: If a variable is not in the index.
+            InternalError: If the expression is invalid.
+
+        Yields:
+            int: The next matching row number.
+        """
+        for base, bits in self._iter_results(expr):
+            yield from _iter_rows(bits, base)
+
+    def _iter_results(self, expr: Expr) -> Iterator[tuple[int, int]]:
+        for node in walk(expr):
+            if isinstance(node, Var) and node.name not in self._name_ids:
+                msg = f'Unknown variable: "{node.name}"'
+                raise EvaluateError(msg, node.pos)
+        for idx, chunk in enumerate(self._chunks):
+            yield idx * CHUNK_ROWS, evaluate_bits(expr, partial(chunk.column, self._name_ids), chunk.rows)
+
+    def _load(self, path: Path) -> None:
+        data = path.read_bytes()
+        if len(data) < _HEADER.size or _HEADER.unpack_from(data) != (_MAGIC, _VERSION):
+            msg = f"Not a bitmap index: {path}"
+            raise InternalError(msg)
+        offset = _HEADER.size
+        view = memoryview(data)
+        while offset < len(data):
+            tag = data[offset]
+            if tag == _TAG_NAME:
+                _, length = _NAME.unpack_from(data, offset)
+                offset += _NAME.size
+                name = bytes(view[offset : offset + length]).decode()
+                self._name_ids[name] = len(self.names)
+                self.names.append(name)
+                offset += length
+            elif tag == _TAG_CHUNK:
+                self._last_chunk_offset = offset
+                _, rows, num_containers = _CHUNK.unpack_from(data, offset)
+                offset += _CHUNK.size
+                chunk = _Chunk(rows)
+                for _ in range(num_containers):
+                    var_id, kind, length = _CONTAINER.unpack_from(data, offset)
+                    offset += _CONTAINER.size
+                    chunk.containers[var_id] = (kind, bytes(view[offset : offset + length]))
+                    offset += length
+                self._chunks.append(chunk)
+                self._rows += rows
+            else:
+                msg = f"Corrupt bitmap index record at byte {offset}: {path}"
+                raise InternalError(msg)
+        self._size = len(data)
+
+    def _write(self, new_names: list[str], new_chunks: list[_Chunk], rewrite: bool) -> None:
+        assert self.path is not None
+        records = bytearray()
+        for name in new_names:
+            encoded = name.encode()
+            records += _NAME.pack(_TAG_NAME, len(encoded)) + encoded
+        # The rewritten chunk replaces the previous last chunk, and new names must precede it
+        offset = self._last_chunk_offset if rewrite else self._size
+        for chunk in new_chunks:
+            self._last_chunk_offset = offset + len(records)
+            records += _CHUNK.pack(_TAG_CHUNK, chunk.rows, len(chunk.containers))
+            for var_id, (kind, payload) in sorted(chunk.containers.items()):
+                records += _CONTAINER.pack(var_id, kind, len(payload)) + payload
+        with self.path.open("r+b") as file:
+            file.seek(offset)
+            file.write(records)
+            file.truncate()
+            file.flush()
+            os.fsync(file.fileno())
+        self._size = offset + len(records)
+
+
+def evaluate_bits(expr: Expr, columns: Callable[[str], int], num_rows: int) -> int:
+    """Evaluate an expression over many rows at once, with one bit per row.
+
+    Args:
+        expr (Expr): The AST expression node to evaluate.
+        columns (Callable[[str], int]): The function that returns the bits of a variable, with bit `i` for row `i`.
+        num_rows (int): The number of rows.
+
+    Raises:
+        InternalError: If the expression is invalid.
+
+    Returns:
+        int: The bits of the rows that satisfy the expression.
+    """
+    return _evaluate_bits(expr, columns, (1 << num_rows) - 1)
+
+
+def _evaluate_bits(expr: Expr, columns: Callable[[str], int], full: int) -> int:
+    match expr:
+        case Lit(val):
+            return full if val else 0
+        case Var(name):
+            return columns(name)
+        case UnaryOp(UnaryOpKind.NOT, arg):
+            return full ^ _evaluate_bits(arg, columns, full)
+        case BinaryOp(BinaryOpKind.AND | BinaryOpKind.OR as kind) | NaryOp(kind=kind):
+            result = None
+            for child in expr.children():
+                bits = _evaluate_bits(child, columns, full)
+                if result is None:
+                    result = bits
+                elif kind == BinaryOpKind.AND:
+                    result &= bits
+                else:
+                    result |= bits
+                # Skip the remaining operands once the result cannot change
+                if result == (0 if kind == BinaryOpKind.AND else full):
+                    break
+            assert result is not None
+            return result
+        case other:
+            msg = f"Bitwise evaluation is not implemented for expression type: {type(other)}"
+            raise InternalError(msg)
+
+
+def _set_container(chunk: _Chunk, var_id: int, bits: int) -> None:
+    cardinality = bits.bit_count()
+    if cardinality == 0:
+        chunk.containers.pop(var_id, None)
+    elif cardinality <= _ARRAY_MAX:
+        rows = array("H", _iter_rows(bits, 0))
+        if sys.byteorder == "big":
+            rows.byteswap()
+        chunk.containers[var_id] = (_KIND_ARRAY, rows.tobytes())
+    else:
+        chunk.containers[var_id] = (_KIND_BITMAP, bits.to_bytes(_CHUNK_BYTES, "little"))
+
+
+def _iter_rows(bits: int, base: int) -> Iterator[int]:
+    if not bits:
+        return
+    for idx, byte in enumerate(bits.to_bytes(_CHUNK_BYTES, "little")):
+        if byte:
+            row = base + idx * 8
+            for bit in _BYTE_BITS[byte]:
+                yield row + bit
@@ -0,0 +1,162 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional, Union
+
+from markers.error import InternalError
+from markers.evaluator import Evaluator
+from markers.expressions import Expr
+from markers.type import Env
+
+DEFAULT_MAX_ENTRIES = 1024
+
+
+@dataclass
+class CacheStats:
+    """Counters of a result cache."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Return the fraction of lookups answered from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def to_dict(self) -> dict[str, object]:
+        """Return the stats as a plain dictionary.
+
+        Returns:
+            dict[str, object]: The stats keyed by name.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+
+@dataclass(eq=False)
+class _Branch:
+    name: str
+    parent: Optional["_Branch"]
+    key: bool
+    children: list[Optional[Union["_Branch", "_Leaf"]]] = field(default_factory=lambda: [None, None])
+
+
+@dataclass(eq=False)
+class _Leaf:
+    value: bool
+    parent: Optional[_Branch]
+    key: bool
+
+
+@dataclass
+class ResultCache:
+    """Cache of the results of one expression, keyed on the variables that decided each result.
+
+    Each entry is the sequence of variables an evaluation read and their values. Evaluation reads
+    variables in an order that only depends on the values read before, so the entries form a
+    decision trie: probing reads one variable per level from the environment and either reaches a
+    cached result or finds no entry for the path. Environments with many variables therefore hit
+    the cache as long as they agree on the few variables that short-circuiting left relevant.
+    Entries are evicted in least recently used order.
+
+    A cache is mutated on every lookup, so it must only be used by one thread at a time.
+    """
+
+    expr: Expr
+    max_entries: int = DEFAULT_MAX_ENTRIES
+    evaluator: Evaluator = field(default_factory=Evaluator)
+    stats: CacheStats = field(default_factory=CacheStats)
+    _root: Optional[Union[_Branch, _Leaf]] = field(default=None, init=False, repr=False)
+    _entries: "OrderedDict[_Leaf, None]" = field(default_factory=OrderedDict, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        """Validate the cache size."""
+        if self.max_entries < 1:
+            msg = f"Result cache size must be positive, found {self.max_entries}"
+            raise InternalError(msg)
+
+    def __len__(self) -> int:
+        """Return the number of cached results."""
+        return len(self._entries)
+
+    def evaluate(self, env: Env) -> bool:
+        """Evaluate the expression, answering from the cache when the decisive variables match.
+
+        Args:
+            env (Env): The environment with variable assignments.
+
+        Raises:
+            EvaluateError: If a variable is unknown.
+            InternalError: If the expression is invalid.
+
+        Returns:
+            bool: Whether the expression evaluates to true.
+        """
+        leaf = self._probe(env)
+        if leaf is not None:
+            self.stats.hits += 1
+            self._entries.move_to_end(leaf)
+            return leaf.value
+
+        self.stats.misses += 1
+        result = self.evaluator.evaluate_traced(self.expr, env)
+        self._insert(result.reads, result.value)
+        return result.value
+
+    def clear(self) -> None:
+        """Remove every cached result, keeping the stats."""
+        self._root = None
+        self._entries.clear()
+
+    def _probe(self, env: Env) -> Optional[_Leaf]:
+        node = self._root
+        while isinstance(node, _Branch):
+            if node.name not in env:
+                # Evaluate to report the unknown variable with its position
+                return None
+            node = node.children[env[node.name]]
+        return node
+
+    def _insert(self, reads: tuple[tuple[str, bool], ...], value: bool) -> None:
+        parent: Optional[_Branch] = None
+        key = False
+        for name, read in reads:
+            node = self._root if parent is None else parent.children[key]
+            if node is None:
+                node = _Branch(name, parent, key)
+                self._attach(node)
+            elif not isinstance(node, _Branch) or node.name != name:
+                msg = f'Result cache read "{name}" out of order'
+                raise InternalError(msg)
+            parent, key = node, read
+
+        leaf = _Leaf(value, parent, key)
+        self._attach(leaf)
+        self._entries[leaf] = None
+        if len(self._entries) > self.max_entries:
+            oldest, _ = self._entries.popitem(last=False)
+            self._detach(oldest)
+            self.stats.evictions += 1
+
+    def _attach(self, node: Union[_Branch, _Leaf]) -> None:
+        if node.parent is None:
+            self._root = node
+        else:
+            node.parent.children[node.key] = node
+
+    def _detach(self, node: Union[_Branch, _Leaf]) -> None:
+        # Remove the node and every ancestor that it leaves without children
+        while True:
+            parent = node.parent
+            if parent is None:
+                self._root = None
+                return
+            parent.children[node.key] = None
+            if any(child is not None for child in parent.children):
+                return
+            node = parent
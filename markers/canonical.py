@@ -0,0 +1,127 @@
+import hashlib
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Optional
+
+from markers.error import InternalError
+from markers.expressions import And, Expr, Lit, Or, UnaryOp, UnaryOpKind, Var, fold_polarized
+
+_DIGEST_SIZE = 16
+
+
+@dataclass
+class _Canonical:
+    expr: Expr
+    digest: bytes
+    # The operands of an AND/OR, kept so that a parent of the same kind can splice them in
+    operands: Optional[list["_Canonical"]] = None
+
+
+@dataclass
+class Deduplicator:
+    """Streaming filter that recognizes formulas already seen up to canonical form.
+
+    Only the structural hash of each unique formula is kept, so memory grows with the number of
+    unique formulas and not with the number of formulas seen.
+    """
+
+    seen: set[str] = field(default_factory=set)
+
+    def add(self, expr: Expr) -> bool:
+        """Record a formula.
+
+        Args:
+            expr (Expr): The AST expression node.
+
+        Raises:
+            InternalError: If the expression is invalid.
+
+        Returns:
+            bool: Whether no equivalent formula was recorded before.
+        """
+        digest = structural_hash(expr)
+        if digest in self.seen:
+            return False
+        self.seen.add(digest)
+        return True
+
+
+def canonicalize(expr: Expr) -> Expr:
+    """Rewrite an expression into a canonical form.
+
+    Negations are pushed down to the variables and literals (De Morgan) and double negations are
+    removed. Nested AND/OR chains of the same kind are flattened, and their operands are
+    deduplicated and sorted by structural hash. Positions are dropped. Expressions that differ only
+    in operand order, grouping, or negation placement have the same canonical form.
+
+    Args:
+        expr (Expr): The AST expression node.
+
+    Raises:
+        InternalError: If the expression is invalid.
+
+    Returns:
+        Expr: The canonical expression.
+    """
+    return _canonicalize(expr).expr
+
+
+def structural_hash(expr: Expr) -> str:
+    """Return a stable hash of the canonical form of an expression.
+
+    The hash does not depend on positions, and is the same across processes and Python versions.
+
+    Args:
+        expr (Expr): The AST expression node.
+
+    Raises:
+        InternalError: If the expression is invalid.
+
+    Returns:
+        str: The hex digest.
+    """
+    return _canonicalize(expr).digest.hex()
+
+
+def _canonicalize(expr: Expr) -> _Canonical:
+    return fold_polarized(expr, _leaf_node, _operator)
+
+
+def _leaf_node(node: Expr, negated: bool) -> _Canonical:
+    match node:
+        case Lit(val):
+            return _leaf(Lit(val != negated), b"t" if val != negated else b"f")
+        case Var(name):
+            var = _var(name)
+            return _leaf(UnaryOp(UnaryOpKind.NOT, var.expr), b"n" + var.digest) if negated else var
+        case other:
+            msg = f"Canonicalize is not implemented for expression type: {type(other)}"
+            raise InternalError(msg)
+
+
+@lru_cache(maxsize=4096)
+def _var(name: str) -> _Canonical:
+    # Canonical nodes are never mutated, so variables can be shared between formulas
+    return _leaf(Var(name), b"v" + name.encode())
+
+
+def _leaf(expr: Expr, data: bytes) -> _Canonical:
+    return _Canonical(expr, hashlib.blake2b(data, digest_size=_DIGEST_SIZE).digest())
+
+
+def _operator(is_and: bool, children: list[_Canonical]) -> _Canonical:
+    operands: dict[bytes, _Canonical] = {}
+    for child in children:
+        # Only AND/OR results carry operands, and a child of the other kind is a single operand
+        if child.operands is not None and isinstance(child.expr, And) == is_and:
+            operands.update((operand.digest, operand) for operand in child.operands)
+        else:
+            operands[child.digest] = child
+    if len(operands) == 1:
+        return next(iter(operands.values()))
+
+    ordered = [operands[digest] for digest in sorted(operands)]
+    cls = And if is_and else Or
+    data = (b"&" if is_and else b"|") + b"".join(operand.digest for operand in ordered)
+    digest = hashlib.blake2b(data, digest_size=_DIGEST_SIZE).digest()
+    return _Canonical(cls(tuple(operand.expr for operand in ordered)), digest, ordered)
@@ -0,0 +1,165 @@
+import itertools
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from markers.error import LimitError, ParseError, UserError
+from markers.lexer import Lexer
+from markers.limits import Limits
+from markers.parser import RecoveringParser
+from markers.type import PositionInfo
+
+DEFAULT_BATCH_SIZE = 1000
+# Batches submitted per worker ahead of the one being reported, which bounds memory use
+_BATCHES_PER_WORKER = 2
+
+
+@dataclass
+class CheckError:
+    """Parse error of a formula, with its position in the corpus file."""
+
+    message: str
+    line_no: int
+    char_no: int
+    length: int
+
+
+@dataclass
+class CheckResult:
+    """Every parse error of one formula of a corpus file."""
+
+    path: str
+    line_no: int
+    program: str
+    errors: list[CheckError]
+
+    def to_dict(self) -> dict[str, object]:
+        """Return the result as a plain dictionary.
+
+        Returns:
+            dict[str, object]: The result keyed by name, with the errors as dictionaries.
+        """
+        return {
+            "file": self.path,
+            "line": self.line_no,
+            "formula": self.program,
+            "errors": [
+                {"message": error.message, "line": error.line_no, "column": error.char_no, "length": error.length}
+                for error in self.errors
+            ],
+        }
+
+
+# Lines of one file to check together, as (path, [(line number, program)])
+_Batch = tuple[str, list[tuple[int, str]]]
+
+
+@dataclass
+class Checker:
+    """Parallel checker for corpus files with one formula per line.
+
+    Lines are read lazily and parsed in batches on a process pool, with a bounded number of batches
+    in flight, so memory use does not grow with the size of the corpus. Each formula is parsed with
+    RecoveringParser, so every error of a formula is reported and not just the first. Results are
+    reported in input order. With one job, batches are checked in the current process.
+    """
+
+    jobs: Optional[int] = None
+    batch_size: int = DEFAULT_BATCH_SIZE
+    limits: Optional[Limits] = None
+    formulas: int = field(default=0, init=False)
+    invalid: int = field(default=0, init=False)
+
+    def check(self, paths: Iterable[Path]) -> Iterator[CheckResult]:
+        """Check corpus files, skipping blank lines.
+
+        Args:
+            paths (Iterable[Path]): The corpus files.
+
+        Yields:
+            CheckResult: The errors of the next formula that fails to parse.
+        """
+        batches = self._iter_batches(paths)
+        if self.jobs == 1:
+            for batch in batches:
+                yield from self._report(check_batch(batch, self.limits))
+            return
+
+        jobs = self.jobs or os.cpu_count() or 1
+        with ProcessPoolExecutor(jobs) as executor:
+            max_pending = jobs * _BATCHES_PER_WORKER
+            pending: deque[Future[list[CheckResult]]] = deque()
+            for batch in batches:
+                pending.append(executor.submit(check_batch, batch, self.limits))
+                if len(pending) >= max_pending:
+                    yield from self._report(pending.popleft().result())
+            while pending:
+                yield from self._report(pending.popleft().result())
+
+    def _report(self, results: list[CheckResult]) -> Iterator[CheckResult]:
+        self.invalid += len(results)
+        yield from results
+
+    def _iter_batches(self, paths: Iterable[Path]) -> Iterator[_Batch]:
+        for path in paths:
+            with path.open(encoding="utf-8") as file:
+                lines = ((line_no, line.rstrip("\r\n")) for line_no, line in enumerate(file, start=1))
+                programs = ((line_no, program) for line_no, program in lines if program.strip())
+                while batch := list(itertools.islice(programs, self.batch_size)):
+                    self.formulas += len(batch)
+                    yield str(path), batch
+
+
+def check_program(program: str, first_line: int = 1, limits: Optional[Limits] = None) -> list[UserError]:
+    """Return every parse error of a program.
+
+    A program that exceeds a limit is reported with the errors found before the limit was reached,
+    followed by the limit error.
+
+    Args:
+        program (str): The boolean expression program.
+        first_line (int): The line number of the first line of the program.
+        limits (Optional[Limits]): Limits on the program size and nesting depth.
+
+    Returns:
+        list[UserError]: The errors in the order they were found, empty if the program is valid.
+    """
+    try:
+        parser = RecoveringParser(Lexer.tokenize(program, first_line=first_line, limits=limits), limits=limits)
+    except LimitError as exc:
+        return [exc]
+    try:
+        parser.parse()
+    except ParseError:
+        pass
+    except LimitError as exc:
+        return [*parser.errors, exc]
+    except RecursionError:
+        msg = "Expression is nested too deeply to parse"
+        return [*parser.errors, ParseError(msg, PositionInfo(first_line, 1, 0))]
+    return list(parser.errors)
+
+
+def check_batch(batch: _Batch, limits: Optional[Limits] = None) -> list[CheckResult]:
+    """Check a batch of formulas from one file, returning the results of formulas with errors.
+
+    Args:
+        batch (tuple[str, list[tuple[int, str]]]): The file path and its (line number, program) pairs.
+        limits (Optional[Limits]): Limits on the size and nesting depth of each formula.
+
+    Returns:
+        list[CheckResult]: The results of the formulas that fail to parse.
+    """
+    path, programs = batch
+    results = []
+    for line_no, program in programs:
+        errors = check_program(program, first_line=line_no, limits=limits)
+        if errors:
+            check_errors = [
+                CheckError(error.message, error.pos.line_no, error.pos.char_no, error.pos.length) for error in errors
+            ]
+            results.append(CheckResult(path, line_no, program, check_errors))
+    return results
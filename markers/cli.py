@@ -1,12 +1,33 @@
+import csv
+import itertools
+import json
 import logging
+import mmap
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Generator, Iterable, Optional, TextIO
 
 import click
 from rich.pretty import pprint
 
-from markers.error import error_context
+from markers.canonical import Deduplicator
+from markers.check import DEFAULT_BATCH_SIZE, Checker
+from markers.definitions import iter_definitions
+from markers.error import ParseError, error_context
 from markers.evaluator import Evaluator
-from markers.lexer import Lexer
+from markers.lexer import BytesLexer, Lexer
+from markers.minimize import EXACT_MAX_VARS, minimize
+from markers.normal_form import to_cnf, to_dnf, to_tseitin_cnf
 from markers.parser import Parser
+from markers.serializer import dump
+from markers.stats import Stats
+from markers.store import build_store
+from markers.tokens import Token
+from markers.truth_table import IncrementalEvaluator
+from markers.type import Source
+
+logger = logging.getLogger(__name__)
 
 
 @click.group()
@@ -22,49 +43,271 @@ def set_logger_config(info: bool, debug: bool) -> None:
         logging.basicConfig(level=logging.DEBUG)
 
 
+@contextmanager
+def read_program(program: Optional[str], file: Optional[Path]) -> Generator[Source, None, None]:
+    """Yield the program text, or the memory-mapped contents of the program file."""
+    if (program is None) == (file is None):
+        msg = "Provide exactly one of PROGRAM or --file"
+        raise click.UsageError(msg)
+    if file is None:
+        assert program is not None
+        yield program
+        return
+    with file.open("rb") as f:
+        if file.stat().st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+
+
+def lex_program(source: Source, stats: Optional[Stats]) -> Iterable[Token]:
+    """Lex a program, streaming tokens from buffers unless stats need the lexing phase timed."""
+    if isinstance(source, str):
+        return Lexer.tokenize(source, stats=stats)
+    if stats is not None:
+        return BytesLexer.tokenize(source, stats=stats)
+    return BytesLexer.iter_tokens(source)
+
+
+def print_stats(stats: Optional[Stats]) -> None:
+    """Print instrumentation stats to stderr."""
+    if stats is None:
+        return
+    print(f"lex: {stats.lex_seconds:.6f}s", file=sys.stderr)
+    print(f"parse: {stats.parse_seconds:.6f}s", file=sys.stderr)
+    print(f"eval: {stats.eval_seconds:.6f}s", file=sys.stderr)
+    print(f"node visits: {stats.node_visits}", file=sys.stderr)
+    print(f"short circuits: {stats.short_circuits}", file=sys.stderr)
+    for name, count in stats.var_lookups.most_common():
+        print(f"lookups {name}: {count}", file=sys.stderr)
+
+
 @main.command(name="parse")
-@click.argument("program")
+@click.argument("program", required=False)
+@click.option("--file", type=click.Path(exists=True, dir_okay=False, path_type=Path))
 @click.option("--pretty", is_flag=True)
+@click.option("--stats", "show_stats", is_flag=True)
 @click.option("--info", is_flag=True)
 @click.option("--debug", is_flag=True)
-def parse_command(
-    program: str,
+def parse_command(  # noqa: PLR0913
+    program: Optional[str] = None,
+    file: Optional[Path] = None,
     pretty: bool = False,
+    show_stats: bool = False,
     info: bool = False,
     debug: bool = False,
 ) -> None:
     """Run the CLI."""
     set_logger_config(info, debug)
+    stats = Stats() if show_stats else None
 
-    with error_context(program):
-        tokens = Lexer.tokenize(program)
-        expr = Parser(tokens).parse()
+    with read_program(program, file) as source, error_context(source):
+        tokens = lex_program(source, stats)
+        expr = Parser(tokens, stats=stats).parse()
 
         if pretty:
-            print(str(expr))
+            dump(expr, sys.stdout)
+            print()
         else:
             pprint(expr)
+        print_stats(stats)
 
 
 @main.command(name="eval")
-@click.argument("program")
+@click.argument("program", required=False)
+@click.option("--file", type=click.Path(exists=True, dir_okay=False, path_type=Path))
 @click.option("--true-vars", "-t", multiple=True)
 @click.option("--false-vars", "-f", multiple=True)
+@click.option("--stats", "show_stats", is_flag=True)
 @click.option("--info", is_flag=True)
 @click.option("--debug", is_flag=True)
-def eval_command(
-    program: str,
+def eval_command(  # noqa: PLR0913
+    program: Optional[str],
+    file: Optional[Path],
     true_vars: tuple[str],
     false_vars: tuple[str],
+    show_stats: bool = False,
     info: bool = False,
     debug: bool = False,
 ) -> None:
     """Run the CLI."""
     set_logger_config(info, debug)
+    stats = Stats() if show_stats else None
 
-    with error_context(program):
+    with read_program(program, file) as source, error_context(source):
         env = {**dict.fromkeys(true_vars, True), **dict.fromkeys(false_vars, False)}
-        tokens = Lexer.tokenize(program)
-        expr = Parser(tokens).parse()
-        result = Evaluator().evaluate(expr, env)
+        tokens = lex_program(source, stats)
+        expr = Parser(tokens, stats=stats).parse()
+        result = Evaluator(stats=stats).evaluate(expr, env)
         print(result)
+        print_stats(stats)
+
+
+@main.command(name="cnf")
+@click.argument("program", required=False)
+@click.option("--file", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("--exact", is_flag=True, help="Distribute into an equivalent CNF instead of a Tseitin encoding.")
+@click.option("--dnf", is_flag=True, help="Distribute into an equivalent DNF.")
+@click.option("--max-clauses", type=int)
+@click.option("--timeout", type=float)
+@click.option("--info", is_flag=True)
+@click.option("--debug", is_flag=True)
+def cnf_command(  # noqa: PLR0913
+    program: Optional[str],
+    file: Optional[Path],
+    exact: bool = False,
+    dnf: bool = False,
+    max_clauses: Optional[int] = None,
+    timeout: Optional[float] = None,
+    info: bool = False,
+    debug: bool = False,
+) -> None:
+    """Print a program in DIMACS clause form."""
+    set_logger_config(info, debug)
+
+    with read_program(program, file) as source, error_context(source):
+        expr = Parser(lex_program(source, None)).parse()
+        if dnf:
+            clause_set = to_dnf(expr, max_clauses=max_clauses, timeout=timeout)
+        elif exact:
+            clause_set = to_cnf(expr, max_clauses=max_clauses, timeout=timeout)
+        else:
+            clause_set = to_tseitin_cnf(expr)
+        for line in clause_set.iter_dimacs():
+            print(line)
+
+
+@main.command(name="table")
+@click.argument("program", required=False)
+@click.option("--file", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("--format", "output_format", type=click.Choice(["csv", "jsonl"]), default="csv")
+@click.option("--limit", type=int, help="Stop after this many rows.")
+@click.option("--info", is_flag=True)
+@click.option("--debug", is_flag=True)
+def table_command(  # noqa: PLR0913
+    program: Optional[str],
+    file: Optional[Path],
+    output_format: str = "csv",
+    limit: Optional[int] = None,
+    info: bool = False,
+    debug: bool = False,
+) -> None:
+    """Print the truth table of a program in Gray code order."""
+    set_logger_config(info, debug)
+
+    with read_program(program, file) as source, error_context(source):
+        expr = Parser(lex_program(source, None)).parse()
+        evaluator = IncrementalEvaluator(expr)
+        names = evaluator.names
+        rows = itertools.islice(evaluator.iter_gray_code(), limit)
+        if output_format == "csv":
+            writer = csv.writer(sys.stdout, lineterminator="\n")
+            writer.writerow([*names, "result"])
+            for row in rows:
+                writer.writerow([*map(int, row.values), int(row.result)])
+        else:
+            for row in rows:
+                print(json.dumps({"values": dict(zip(names, row.values)), "result": row.result}))
+
+
+@main.command(name="dedup")
+@click.argument("corpus", type=click.File("r", encoding="utf-8"), default="-")
+@click.option("--info", is_flag=True)
+@click.option("--debug", is_flag=True)
+def dedup_command(corpus: TextIO, info: bool = False, debug: bool = False) -> None:
+    """Print the first of each group of equivalent formulas in a corpus with one formula per line.
+
+    Formulas are equivalent if they have the same canonical form, so operand order, grouping, and
+    negation placement do not matter. Lines that fail to parse are reported to stderr and skipped.
+    """
+    set_logger_config(info, debug)
+
+    deduplicator = Deduplicator()
+    total = 0
+    for line_no, line in enumerate(corpus, start=1):
+        program = line.strip()
+        if not program:
+            continue
+        total += 1
+        try:
+            expr = Parser(Lexer.iter_tokens(program)).parse()
+        except ParseError as exc:
+            print(f"line {line_no}: ParseError: {exc.message}", file=sys.stderr)
+            continue
+        if deduplicator.add(expr):
+            print(program)
+    logger.info("%d formulas, %d unique", total, len(deduplicator.seen))
+
+
+@main.command(name="check")
+@click.argument("files", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("--jobs", "-j", type=int, help="Number of worker processes, defaulting to the number of CPUs.")
+@click.option("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, show_default=True)
+@click.option("--info", is_flag=True)
+@click.option("--debug", is_flag=True)
+def check_command(
+    files: tuple[Path, ...],
+    jobs: Optional[int],
+    batch_size: int,
+    info: bool = False,
+    debug: bool = False,
+) -> None:
+    """Check corpus files with one formula per line, printing a JSON line for each invalid formula.
+
+    Every parse error of a formula is reported, not just the first. Exits with status 1 if any
+    formula is invalid.
+    """
+    set_logger_config(info, debug)
+
+    checker = Checker(jobs, batch_size)
+    for result in checker.check(files):
+        print(json.dumps(result.to_dict()))
+    logger.info("%d formulas, %d invalid", checker.formulas, checker.invalid)
+    if checker.invalid:
+        sys.exit(1)
+
+
+@main.command(name="store")
+@click.argument("definitions", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.argument("output", type=click.Path(dir_okay=False, path_type=Path))
+@click.option("--info", is_flag=True)
+@click.option("--debug", is_flag=True)
+def store_command(definitions: Path, output: Path, info: bool = False, debug: bool = False) -> None:
+    """Compile a definitions file into a formula store that worker processes can map read-only."""
+    set_logger_config(info, debug)
+
+    with definitions.open(encoding="utf-8") as file:
+        program = file.read()
+    with error_context(program):
+        build_store(output, iter_definitions(program.splitlines(keepends=True)))
+
+
+@main.command(name="minimize")
+@click.argument("program", required=False)
+@click.option("--file", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option("--timeout", type=float, help="Stop after this many seconds with the best result so far.")
+@click.option("--exact-max-vars", type=int, default=EXACT_MAX_VARS, show_default=True)
+@click.option("--info", is_flag=True)
+@click.option("--debug", is_flag=True)
+def minimize_command(  # noqa: PLR0913
+    program: Optional[str],
+    file: Optional[Path],
+    timeout: Optional[float] = None,
+    exact_max_vars: int = EXACT_MAX_VARS,
+    info: bool = False,
+    debug: bool = False,
+) -> None:
+    """Print a program as a minimal sum of products, with literal counts on stderr."""
+    set_logger_config(info, debug)
+
+    with read_program(program, file) as source, error_context(source):
+        expr = Parser(lex_program(source, None)).parse()
+        result = minimize(expr, timeout=timeout, exact_max_vars=exact_max_vars)
+        dump(result.expr, sys.stdout)
+        print()
+        status = "" if result.complete else ", stopped early"
+        print(
+            f"literals: {result.literals_before} -> {result.literals_after} ({result.method}{status})",
+            file=sys.stderr,
+        )
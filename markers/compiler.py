@@ -0,0 +1,110 @@
+from dataclasses import dataclass, field
+
+from markers.error import EvaluateError, InternalError
+from markers.expressions import BinaryOp, Expr, Lit, NaryOp, SlotVar, UnaryOp, Var
+from markers.type import Env, PositionInfo
+
+
+@dataclass
+class CompiledExpr:
+    """Expression whose variables are resolved by slot index instead of by name.
+
+    Slots are numbered in order of first occurrence, and `names[i]` is the variable in slot `i`.
+    """
+
+    expr: Expr
+    names: list[str]
+    positions: list[PositionInfo] = field(repr=False)
+    _slots: dict[str, int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        """Index the slots by variable name."""
+        self._slots = {name: slot for slot, name in enumerate(self.names)}
+
+    def slot(self, name: str) -> int:
+        """Return the slot index of a variable.
+
+        Args:
+            name (str): The variable name.
+
+        Raises:
+            KeyError: If the expression does not reference the variable.
+
+        Returns:
+            int: The slot index.
+        """
+        return self._slots[name]
+
+    def bind(self, env: Env) -> bytearray:
+        """Convert an environment to slot values once, to evaluate against many times.
+
+        Args:
+            env (Env): The environment with variable assignments.
+
+        Raises:
+            EvaluateError: If any variable is unbound, naming all of them.
+
+        Returns:
+            bytearray: The variable values in slot order.
+        """
+        unbound = [slot for slot, name in enumerate(self.names) if name not in env]
+        if unbound:
+            names = ", ".join(f'"{self.names[slot]}"' for slot in unbound)
+            msg = f"Unbound variables: {names}"
+            raise EvaluateError(msg, self.positions[unbound[0]])
+        return bytearray(env[name] for name in self.names)
+
+
+def compile_expr(expr: Expr) -> CompiledExpr:
+    """Assign each distinct variable a slot index and rewrite variables to slot variables.
+
+    Args:
+        expr (Expr): The AST expression node.
+
+    Raises:
+        InternalError: If the expression is invalid.
+
+    Returns:
+        CompiledExpr: The compiled expression.
+    """
+    slots: dict[str, int] = {}
+    positions: list[PositionInfo] = []
+    compiled = _compile(expr, slots, positions)
+    return CompiledExpr(compiled, list(slots), positions)
+
+
+def _compile(expr: Expr, slots: dict[str, int], positions: list[PositionInfo]) -> Expr:
+    # Rebuild the tree in post-order without recursion, with the compiled children of each node on
+    # top of the results stack
+    results: list[Expr] = []
+    stack: list[tuple[Expr, bool]] = [(expr, False)]
+    while stack:
+        node, visited = stack.pop()
+        children = node.children()
+        if children and not visited:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(children))
+            continue
+        start = len(results) - len(children)
+        args = tuple(results[start:])
+        del results[start:]
+        match node:
+            case BinaryOp(kind, pos=pos):
+                result: Expr = BinaryOp(kind, args[0], args[1], pos=pos)
+            case UnaryOp(kind, pos=pos):
+                result = UnaryOp(kind, args[0], pos=pos)
+            case NaryOp(pos=pos, ops=ops):
+                result = type(node)(args, pos=pos, ops=ops)
+            case Var(name, pos=pos):
+                slot = slots.get(name)
+                if slot is None:
+                    slot = slots[name] = len(slots)
+                    positions.append(pos)
+                result = SlotVar(name, slot, pos=pos)
+            case Lit():
+                result = node
+            case other:
+                msg = f"Compile is not implemented for expression type: {type(other)}"
+                raise InternalError(msg)
+        results.append(result)
+    return results[0]
@@ -0,0 +1,225 @@
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+
+from markers.error import DefinitionError, EvaluateError, InternalError
+from markers.expressions import BinaryOp, BinaryOpKind, Definition, Expr, Lit, NaryOp, UnaryOp, UnaryOpKind, Var, walk
+from markers.lexer import Lexer
+from markers.parser import Parser
+from markers.type import Env, PositionInfo
+
+_DEFINITION_START = re.compile(r"\s*\w+\s*=")
+
+
+def iter_definitions(lines: Iterable[str]) -> Iterator[Definition]:
+    """Stream named definitions from lines of a definitions file.
+
+    A line that starts with `name =` begins a new definition, and any other line continues the
+    previous one, so only one definition is held in memory at a time.
+
+    Args:
+        lines (Iterable[str]): The lines of the file, including line endings.
+
+    Raises:
+        ParseError: If a definition is invalid.
+
+    Yields:
+        Definition: The next definition.
+    """
+    chunk: list[str] = []
+    first_line = 1
+    for line_no, line in enumerate(lines, start=1):
+        if chunk and _DEFINITION_START.match(line):
+            yield from _parse_chunk(chunk, first_line)
+            chunk = []
+        if not chunk:
+            first_line = line_no
+        chunk.append(line)
+    if chunk:
+        yield from _parse_chunk(chunk, first_line)
+
+
+def _parse_chunk(chunk: list[str], first_line: int) -> list[Definition]:
+    tokens = Lexer.tokenize("".join(chunk), first_line=first_line)
+    return Parser(tokens).parse_definitions()
+
+
+@dataclass
+class DefinitionGraph:
+    """Named definitions in topological order, where each follows the definitions it references."""
+
+    definitions: dict[str, Definition]
+    dependencies: dict[str, list[str]]
+    order: list[str]
+
+    @classmethod
+    def build(cls, definitions: Iterable[Definition]) -> "DefinitionGraph":
+        """Build a definition graph, resolving references between definitions.
+
+        Args:
+            definitions (Iterable[Definition]): The definitions in program order.
+
+        Raises:
+            DefinitionError: If a name is defined twice or the definitions reference each other cyclically.
+
+        Returns:
+            DefinitionGraph: The definition graph.
+        """
+        by_name: dict[str, Definition] = {}
+        for definition in definitions:
+            if definition.name in by_name:
+                msg = f'Duplicate definition: "{definition.name}"'
+                raise DefinitionError(msg, definition.pos)
+            by_name[definition.name] = definition
+
+        dependencies: dict[str, list[str]] = {}
+        dependents: dict[str, list[str]] = {name: [] for name in by_name}
+        for name, definition in by_name.items():
+            refs = dict.fromkeys(node.name for node in walk(definition.expr) if isinstance(node, Var))
+            dependencies[name] = [ref for ref in refs if ref in by_name]
+            for ref in dependencies[name]:
+                dependents[ref].append(name)
+
+        remaining = {name: len(deps) for name, deps in dependencies.items()}
+        queue = deque(name for name, count in remaining.items() if count == 0)
+        order = []
+        while queue:
+            name = queue.popleft()
+            order.append(name)
+            for dependent in dependents[name]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    queue.append(dependent)
+
+        if len(order) < len(by_name):
+            cycle = cls._find_cycle(dependencies, remaining)
+            msg = f"Cyclic definitions: {' -> '.join(cycle)}"
+            raise DefinitionError(msg, by_name[cycle[0]].pos)
+
+        return cls(by_name, dependencies, order)
+
+    @classmethod
+    def _find_cycle(cls, dependencies: dict[str, list[str]], remaining: dict[str, int]) -> list[str]:
+        # Every unordered definition has an unordered dependency, so following them must revisit a name
+        name = next(name for name, count in remaining.items() if count > 0)
+        path: list[str] = []
+        seen: dict[str, int] = {}
+        while name not in seen:
+            seen[name] = len(path)
+            path.append(name)
+            name = next(dep for dep in dependencies[name] if remaining[dep] > 0)
+        return [*path[seen[name] :], name]
+
+    def evaluate(self, env: Env, names: Optional[Iterable[str]] = None) -> dict[str, bool]:
+        """Evaluate definitions against an environment, evaluating each definition at most once.
+
+        Definitions are evaluated on demand: a reference to another definition is evaluated when it
+        is first read, so short-circuiting skips definitions and variables exactly as if the
+        referenced definitions were written inline.
+
+        Args:
+            env (Env): The environment with variable assignments.
+            names (Optional[Iterable[str]]): The definitions to evaluate, or all definitions if None.
+
+        Raises:
+            DefinitionError: If a requested name is not defined.
+            EvaluateError: If a variable is unknown.
+
+        Returns:
+            dict[str, bool]: The value of each requested definition.
+        """
+        requested = self.order if names is None else list(names)
+        for name in requested:
+            if name not in self.definitions:
+                msg = f'Unknown definition: "{name}"'
+                raise DefinitionError(msg, PositionInfo(0, 0, 0))
+        values: dict[str, bool] = {}
+        for name in requested:
+            if name not in values:
+                self._resolve(name, env, values)
+        return {name: values[name] for name in requested}
+
+    def _resolve(self, name: str, env: Env, values: dict[str, bool]) -> None:
+        # Evaluate a definition, suspending it on a stack of frames whenever it reads a definition that
+        # is not evaluated yet, so long chains of references do not recurse
+        frames = [_Frame(name, [self.definitions[name].expr])]
+        while frames:
+            frame = frames[-1]
+            pending = frame.run(env, values, self.definitions)
+            if pending is None:
+                values[frame.name] = frame.values[0]
+                frames.pop()
+            else:
+                frames.append(_Frame(pending, [self.definitions[pending].expr]))
+
+
+@dataclass
+class _Frame:
+    # Evaluation of one definition. The work stack holds nodes to evaluate and (node, idx) entries that
+    # combine the value of operand `idx` of a node, so AND/OR short-circuit like Evaluator.
+    name: str
+    work: list[Union[Expr, tuple[Expr, int]]]
+    values: list[bool] = field(default_factory=list)
+
+    def run(self, env: Env, values: dict[str, bool], definitions: dict[str, Definition]) -> Optional[str]:
+        # Run until the definition is evaluated and return None, or return the name of a definition
+        # that has to be evaluated first
+        work = self.work
+        stack = self.values
+        while work:
+            item = work.pop()
+            if isinstance(item, tuple):
+                node, idx = item
+                if isinstance(node, UnaryOp):
+                    stack[-1] = not stack[-1]
+                    continue
+                assert isinstance(node, (BinaryOp, NaryOp))
+                args = node.children()
+                short_circuit = node.kind == BinaryOpKind.OR
+                if stack[-1] != short_circuit and idx + 1 < len(args):
+                    stack.pop()
+                    work.append((node, idx + 1))
+                    work.append(args[idx + 1])
+                continue
+            match item:
+                case Lit(val):
+                    stack.append(val)
+                case Var(name) if name in definitions:
+                    if name not in values:
+                        work.append(item)
+                        return name
+                    stack.append(values[name])
+                case Var(name, pos=pos):
+                    if name not in env:
+                        msg = f'Unknown variable: "{name}"'
+                        raise EvaluateError(msg, pos)
+                    stack.append(env[name])
+                case UnaryOp(UnaryOpKind.NOT, arg):
+                    work.append((item, 0))
+                    work.append(arg)
+                case BinaryOp() | NaryOp():
+                    work.append((item, 0))
+                    work.append(item.children()[0])
+                case other:
+                    msg = f"Evaluate is not implement for expression type: {type(other)}"
+                    raise InternalError(msg)
+        return None
+
+
+def load_definitions(path: Path) -> DefinitionGraph:
+    """Load a definitions file into a definition graph.
+
+    Args:
+        path (Path): The path to the definitions file.
+
+    Raises:
+        ParseError: If a definition is invalid.
+        DefinitionError: If the definitions are inconsistent.
+
+    Returns:
+        DefinitionGraph: The definition graph.
+    """
+    with path.open(encoding="utf-8") as file:
+        return DefinitionGraph.build(iter_definitions(file))
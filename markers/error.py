@@ -2,7 +2,7 @@ import sys
 from contextlib import contextmanager
 from typing import Generator
 
-from markers.tokens import PositionInfo
+from markers.type import LineIndex, PositionInfo, Source
 
 
 class UserError(Exception):
@@ -50,6 +50,90 @@ class EvaluateError(UserError):
         super().__init__(message, pos)
 
 
+class DefinitionError(UserError):
+    """Error resulting from an invalid set of named definitions."""
+
+    def __init__(self, message: str, pos: PositionInfo):
+        """Initialize a DefinitionError.
+
+        Args:
+            message (str): The error message.
+            pos (PositionInfo): The position information of the error.
+        """
+        self.message = message
+        super().__init__(message, pos)
+
+
+class NormalFormError(UserError):
+    """Error resulting from a normal form conversion exceeding its budget."""
+
+    def __init__(self, message: str, pos: PositionInfo):
+        """Initialize a NormalFormError.
+
+        Args:
+            message (str): The error message.
+            pos (PositionInfo): The position information of the error.
+        """
+        self.message = message
+        super().__init__(message, pos)
+
+
+class LimitError(UserError):
+    """Error resulting from a program exceeding a resource limit."""
+
+    def __init__(self, message: str, pos: PositionInfo):
+        """Initialize a LimitError.
+
+        Args:
+            message (str): The error message.
+            pos (PositionInfo): The position information of the error.
+        """
+        self.message = message
+        super().__init__(message, pos)
+
+
+class LexLimitError(LimitError):
+    """Error resulting from a program exceeding its length or token limit."""
+
+    def __init__(self, message: str, pos: PositionInfo):
+        """Initialize a LexLimitError.
+
+        Args:
+            message (str): The error message.
+            pos (PositionInfo): The position information of the error.
+        """
+        self.message = message
+        super().__init__(message, pos)
+
+
+class ParseLimitError(LimitError):
+    """Error resulting from a program exceeding its nesting depth or node limit."""
+
+    def __init__(self, message: str, pos: PositionInfo):
+        """Initialize a ParseLimitError.
+
+        Args:
+            message (str): The error message.
+            pos (PositionInfo): The position information of the error.
+        """
+        self.message = message
+        super().__init__(message, pos)
+
+
+class EvaluateLimitError(LimitError):
+    """Error resulting from an evaluation exceeding its step or depth limit."""
+
+    def __init__(self, message: str, pos: PositionInfo):
+        """Initialize a EvaluateLimitError.
+
+        Args:
+            message (str): The error message.
+            pos (PositionInfo): The position information of the error.
+        """
+        self.message = message
+        super().__init__(message, pos)
+
+
 class InternalError(Exception):
     """Error resulting from an internal failure."""
 
@@ -64,10 +148,8 @@ class InternalError(Exception):
 
 
 @contextmanager
-def error_context(program: str) -> Generator[None, None, None]:
+def error_context(program: Source) -> Generator[None, None, None]:
     """Context manager to handle errors."""
-    lines = program.split("\n")
-
     try:
         yield
     except UserError as exc:
@@ -81,7 +163,7 @@ def error_context(program: str) -> Generator[None, None, None]:
 
         if line_no > 0:
             print()
-            program_line = lines[line_no - 1]
+            program_line = LineIndex(program).line(line_no)
             print(program_line, file=sys.stderr)
 
             carets = "-" * (char_no - 1) + "^" * length
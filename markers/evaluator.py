@@ -1,17 +1,165 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from dataclasses import dataclass
+from typing import Iterable, Optional
 
-from markers.error import EvaluateError, InternalError
-from markers.expressions import BinaryOp, BinaryOpKind, Expr, Lit, UnaryOp, UnaryOpKind, Var
-from markers.type import Env
+from markers.compiler import CompiledExpr
+from markers.error import EvaluateError, EvaluateLimitError, InternalError
+from markers.expressions import (
+    And,
+    BinaryOp,
+    BinaryOpKind,
+    Expr,
+    Lit,
+    NaryOp,
+    SlotVar,
+    UnaryOp,
+    UnaryOpKind,
+    Var,
+    variables,
+)
+from markers.limits import Limits, limit_or_max
+from markers.providers import LazyEnv, ProviderResult, TracedResult, TracingEnv
+from markers.stats import Stats
+from markers.type import Env, Provider, SlotValues
+
+# Nodes that never add a level of nesting
+_LEAVES = (Lit, Var)
+
+
+@dataclass(slots=True)
+class _Hooks:
+    # Per-node callbacks of an evaluation that records stats or enforces limits
+    stats: Optional[Stats]
+    max_steps: int
+    max_depth: int
+    steps: int = 0
+
+    def visit(self, expr: Expr, depth: int) -> None:
+        self.steps += 1
+        if self.steps > self.max_steps:
+            msg = f"Evaluation exceeds the limit of {self.max_steps} steps"
+            raise EvaluateLimitError(msg, expr.pos)
+        if depth > self.max_depth:
+            msg = f"Evaluation depth exceeds the limit of {self.max_depth}"
+            raise EvaluateLimitError(msg, expr.pos)
+        if self.stats is not None:
+            self.stats.node_visits += 1
+
+    def read(self, name: str) -> None:
+        if self.stats is not None:
+            self.stats.var_lookups[name] += 1
+
+    def short_circuit(self) -> None:
+        if self.stats is not None:
+            self.stats.short_circuits += 1
 
 
 @dataclass
 class Evaluator:
-    """Boolean expression evaluator."""
+    """Boolean expression evaluator.
+
+    An evaluator without stats holds no mutable state, so one evaluator and one parsed expression can
+    be shared by any number of threads. Stats are not synchronized, so an evaluator with stats must
+    only be used by one thread at a time.
+
+    With limits, every node visited counts against the step limit, and nesting counts against the
+    depth limit the way the parser counts it: every NOT operator and every AND/OR operand that needs
+    parentheses in program text adds a level. Evaluation fails with an EvaluateLimitError at the node that
+    exceeded a limit. Stats and limits are recorded through per-node hooks, so evaluators without
+    either pay a single `is None` check per node for them.
+    """
+
+    stats: Optional[Stats] = None
+    limits: Optional[Limits] = None
 
     def evaluate(self, expr: Expr, env: Env) -> bool:
         """Evaluate the boolean expression.
 
+        Args:
+            expr (Expr): The AST expression node to evaluate.
+            env (Env): The environment with variable assignments.
+
+        Raises:
+            EvaluateError: If a variable is unknown.
+            EvaluateLimitError: If the evaluation exceeds a limit.
+            InternalError: If the expression is invalid.
+
+        Returns:
+            bool: Whether the expression evaluates to true.
+        """
+        hooks = self._hooks(self.stats)
+        if self.stats is not None:
+            with self.stats.timer("eval"):
+                return self._evaluate(expr, env, None, hooks, _root_depth(expr))
+        return self._evaluate(expr, env, None, hooks, _root_depth(expr))
+
+    def evaluate_batch(
+        self,
+        expr: Expr,
+        envs: Iterable[Env],
+        max_workers: Optional[int] = None,
+        chunk_size: int = 256,
+    ) -> list[bool]:
+        """Evaluate the boolean expression against many environments on a thread pool.
+
+        Environments are evaluated in chunks to amortize scheduling overhead. Threads only run in
+        parallel on free-threaded interpreters, but the results are the same on any interpreter.
+        When stats are set, only the wall time of the batch is recorded.
+
+        Args:
+            expr (Expr): The AST expression node to evaluate.
+            envs (Iterable[Env]): The environments with variable assignments.
+            max_workers (Optional[int]): The number of threads, defaulting to the executor default.
+            chunk_size (int): The number of environments evaluated per task.
+
+        Raises:
+            EvaluateError: If a variable is unknown in any environment.
+            EvaluateLimitError: If the evaluation of any environment exceeds a limit.
+            InternalError: If the expression is invalid.
+
+        Returns:
+            list[bool]: Whether the expression evaluates to true, for each environment in order.
+        """
+        env_list = list(envs)
+        chunks = [env_list[idx : idx + chunk_size] for idx in range(0, len(env_list), chunk_size)]
+        depth = _root_depth(expr)
+
+        def evaluate_chunk(chunk: list[Env]) -> list[bool]:
+            # Stats are not synchronized, so threads only count against limits
+            return [self._evaluate(expr, env, None, self._hooks(None), depth) for env in chunk]
+
+        timer = self.stats.timer("eval") if self.stats is not None else nullcontext()
+        with timer, ThreadPoolExecutor(max_workers) as executor:
+            return [value for values in executor.map(evaluate_chunk, chunks) for value in values]
+
+    def evaluate_lazy(self, expr: Expr, provider: Provider) -> ProviderResult:
+        """Evaluate the boolean expression, resolving variables on demand.
+
+        Each variable is resolved from the provider at most once, and variables that short-circuiting
+        makes irrelevant are never resolved.
+
+        Args:
+            expr (Expr): The AST expression node to evaluate.
+            provider (Provider): The function that resolves a variable name, raising KeyError if unknown.
+
+        Raises:
+            EvaluateError: If a variable is unknown.
+            InternalError: If the expression is invalid.
+
+        Returns:
+            ProviderResult: The value along with the number of resolved and skipped variables.
+        """
+        env = LazyEnv(provider)
+        value = self.evaluate(expr, env)
+        return ProviderResult(value, len(env), len(variables(expr)) - len(env))
+
+    def evaluate_traced(self, expr: Expr, env: Env) -> TracedResult:
+        """Evaluate the boolean expression, recording the variables that were read.
+
+        Variables that short-circuiting skips are not read, so the recorded variables and their values
+        are enough to decide the result: any environment that agrees on them evaluates the same way.
+
         Args:
             expr (Expr): The AST expression node to evaluate.
             env (Env): The environment with variable assignments.
@@ -20,23 +168,100 @@ class Evaluator:
             EvaluateError: If a variable is unknown.
             InternalError: If the expression is invalid.
 
+        Returns:
+            TracedResult: The value along with the variables read, in the order of their first read.
+        """
+        tracing = TracingEnv(env)
+        value = self.evaluate(expr, tracing)
+        return TracedResult(value, tuple(tracing.reads.items()))
+
+    def evaluate_compiled(self, compiled: CompiledExpr, values: SlotValues) -> bool:
+        """Evaluate a compiled boolean expression against values in slot order.
+
+        Variables are read by index, so evaluation does no name lookups. Use `CompiledExpr.bind` to
+        convert an environment to slot values once.
+
+        Args:
+            compiled (CompiledExpr): The compiled expression to evaluate.
+            values (SlotValues): The variable values in slot order, as a list, tuple, or bytearray.
+
+        Raises:
+            EvaluateError: If the number of values does not match the number of slots.
+            EvaluateLimitError: If the evaluation exceeds a limit.
+            InternalError: If the expression is invalid.
+
         Returns:
             bool: Whether the expression evaluates to true.
         """
+        if len(values) != len(compiled.names):
+            msg = f"Expected {len(compiled.names)} slot values, found {len(values)}"
+            raise EvaluateError(msg, compiled.expr.pos)
+        hooks = self._hooks(self.stats)
+        if self.stats is not None:
+            with self.stats.timer("eval"):
+                return bool(self._evaluate(compiled.expr, {}, values, hooks, _root_depth(compiled.expr)))
+        return bool(self._evaluate(compiled.expr, {}, values, hooks, _root_depth(compiled.expr)))
+
+    def _hooks(self, stats: Optional[Stats]) -> Optional[_Hooks]:
+        if stats is None and self.limits is None:
+            return None
+        limits = self.limits or Limits()
+        return _Hooks(stats, limit_or_max(limits.max_steps), limit_or_max(limits.max_depth))
+
+    def _evaluate(
+        self,
+        expr: Expr,
+        env: Env,
+        slots: Optional[SlotValues],
+        hooks: Optional[_Hooks],
+        depth: int,
+    ) -> bool:
+        # Every evaluation mode goes through this traversal: compiled expressions read variables from
+        # slots instead of the environment, and stats and limits are recorded through the hooks
+        if hooks is not None:
+            hooks.visit(expr, depth)
         match expr:
             case Lit(val):
                 return val
+            case SlotVar(slot=slot) if slots is not None:
+                return slots[slot]  # type: ignore[return-value]
             case Var(name, pos=pos):
+                if hooks is not None:
+                    hooks.read(name)
                 if name not in env:
                     msg = f'Unknown variable: "{name}"'
                     raise EvaluateError(msg, pos)
                 return env[name]
             case UnaryOp(UnaryOpKind.NOT, arg):
-                return not self.evaluate(arg, env)
-            case BinaryOp(BinaryOpKind.AND, left, right):
-                return self.evaluate(left, env) and self.evaluate(right, env)
-            case BinaryOp(BinaryOpKind.OR, left, right):
-                return self.evaluate(left, env) or self.evaluate(right, env)
+                # Every operand of NOT is nested one level deeper, and leaves keep the depth of their parent
+                arg_depth = depth if hooks is None or isinstance(arg, _LEAVES) else depth + 1
+                return not self._evaluate(arg, env, slots, hooks, arg_depth)
+            case BinaryOp(kind) | NaryOp(kind=kind):
+                # AND stops at the first false operand and OR at the first true one
+                short_circuit = kind == BinaryOpKind.OR
+                args = expr.children()
+                for idx, arg in enumerate(args):
+                    # Only an AND operand of an OR reads the same without parentheses
+                    bare = hooks is None or isinstance(arg, _LEAVES) or short_circuit and _is_and(arg)
+                    arg_depth = depth if bare else depth + 1
+                    if self._evaluate(arg, env, slots, hooks, arg_depth) == short_circuit:
+                        if hooks is not None and idx < len(args) - 1:
+                            hooks.short_circuit()
+                        return short_circuit
+                return not short_circuit
             case other:
                 msg = f"Evaluate is not implement for expression type: {type(other)}"
                 raise InternalError(msg)
+
+
+def _is_and(expr: Expr) -> bool:
+    return isinstance(expr, And) or isinstance(expr, BinaryOp) and expr.kind == BinaryOpKind.AND
+
+
+def _root_depth(expr: Expr) -> int:
+    # Return the nesting depth of the root node as the parser counts it. The nesting of other nodes is
+    # computed from their parent in `Evaluator._evaluate`: only an AND directly under an OR, or an
+    # operator at the root, reads the same without parentheses. Binary chains of the same operator
+    # also count every level, since the parser never builds them and counting them keeps the depth of
+    # the traversal bounded.
+    return 1 if isinstance(expr, UnaryOp) else 0
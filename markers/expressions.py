@@ -1,15 +1,25 @@
 from dataclasses import dataclass, field
 from enum import StrEnum, auto
+from typing import Callable, ClassVar, Iterator, Optional, TypeVar
 
 from markers.type import PositionInfo
 
+_T = TypeVar("_T")
 
-@dataclass(kw_only=True)
+
+@dataclass(frozen=True, kw_only=True)
 class Expr:
-    """Expression node."""
+    """Expression node.
+
+    Expression nodes are immutable, so a parsed expression can be shared and evaluated across threads.
+    """
 
     pos: PositionInfo = field(default_factory=lambda: PositionInfo(0, 0, 0))
 
+    def children(self) -> tuple["Expr", ...]:
+        """Return the child expression nodes."""
+        return ()
+
 
 class BinaryOpKind(StrEnum):
     """Binary operator kind."""
@@ -24,7 +34,7 @@ class UnaryOpKind(StrEnum):
     NOT = auto()
 
 
-@dataclass
+@dataclass(frozen=True)
 class BinaryOp(Expr):
     """Expression node for binary operators."""
 
@@ -32,24 +42,66 @@ class BinaryOp(Expr):
     left: Expr
     right: Expr
 
+    def children(self) -> tuple[Expr, ...]:
+        """Return the child expression nodes."""
+        return (self.left, self.right)
+
     def __str__(self) -> str:
         """Return the string representation of the binary operator."""
         return f"({self.left} {self.kind} {self.right})"
 
 
-@dataclass
+@dataclass(frozen=True)
 class UnaryOp(Expr):
     """Expression node for unary operators."""
 
     kind: UnaryOpKind
     arg: Expr
 
+    def children(self) -> tuple[Expr, ...]:
+        """Return the child expression nodes."""
+        return (self.arg,)
+
     def __str__(self) -> str:
         """Return the string representation of the unary operator."""
         return f"({self.kind} {self.arg})"
 
 
-@dataclass
+@dataclass(frozen=True)
+class NaryOp(Expr):
+    """Expression node for an associative operator applied to a sequence of operands.
+
+    The node position is that of the first operator, and `ops` holds the position of every operator.
+    """
+
+    kind: ClassVar[BinaryOpKind]
+    args: tuple[Expr, ...]
+    ops: tuple[PositionInfo, ...] = field(default=(), kw_only=True, repr=False, compare=False)
+
+    def children(self) -> tuple[Expr, ...]:
+        """Return the child expression nodes."""
+        return self.args
+
+    def __str__(self) -> str:
+        """Return the string representation of the n-ary operator."""
+        return "(" + f" {self.kind} ".join(map(str, self.args)) + ")"
+
+
+@dataclass(frozen=True)
+class And(NaryOp):
+    """Expression node for a conjunction of operands."""
+
+    kind: ClassVar[BinaryOpKind] = BinaryOpKind.AND
+
+
+@dataclass(frozen=True)
+class Or(NaryOp):
+    """Expression node for a disjunction of operands."""
+
+    kind: ClassVar[BinaryOpKind] = BinaryOpKind.OR
+
+
+@dataclass(frozen=True)
 class Var(Expr):
     """Expression node for variables."""
 
@@ -60,7 +112,17 @@ class Var(Expr):
         return f"{self.name}"
 
 
-@dataclass
+@dataclass(frozen=True)
+class SlotVar(Var):
+    """Expression node for variables compiled to a slot index.
+
+    A SlotVar is still a Var, so name-based consumers keep working on compiled expressions.
+    """
+
+    slot: int
+
+
+@dataclass(frozen=True)
 class Lit(Expr):
     """Expression node for literals."""
 
@@ -69,3 +131,193 @@ class Lit(Expr):
     def __str__(self) -> str:
         """Return the string representation of the literal."""
         return f"{self.val}"
+
+
+@dataclass(frozen=True)
+class Definition:
+    """Named formula definition."""
+
+    name: str
+    expr: Expr
+    pos: PositionInfo = field(default_factory=lambda: PositionInfo(0, 0, 0), kw_only=True)
+
+    def __str__(self) -> str:
+        """Return the string representation of the definition."""
+        return f"{self.name} = {self.expr}"
+
+
+def walk(expr: Expr) -> Iterator[Expr]:
+    """Iterate over an expression tree in pre-order without recursion.
+
+    Args:
+        expr (Expr): The root expression node.
+
+    Yields:
+        Expr: The next expression node.
+    """
+    stack = [expr]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.children()))
+
+
+def variables(expr: Expr) -> set[str]:
+    """Return the names of the variables referenced by an expression.
+
+    Args:
+        expr (Expr): The root expression node.
+
+    Returns:
+        set[str]: The variable names.
+    """
+    return {node.name for node in walk(expr) if isinstance(node, Var)}
+
+
+def to_nary(expr: Expr) -> Expr:
+    """Convert chains of binary AND/OR nodes to n-ary And/Or nodes, without recursion.
+
+    Args:
+        expr (Expr): The root expression node.
+
+    Returns:
+        Expr: The equivalent expression with n-ary operators.
+    """
+    return _rebuild(expr, _nary_children, _to_nary_node)
+
+
+def to_binary(expr: Expr) -> Expr:
+    """Convert n-ary And/Or nodes to left-nested binary AND/OR nodes, without recursion.
+
+    Args:
+        expr (Expr): The root expression node.
+
+    Returns:
+        Expr: The equivalent expression with binary operators.
+    """
+    return _rebuild(expr, _children, _to_binary_node)
+
+
+def fold_polarized(
+    expr: Expr,
+    leaf: Callable[[Expr, bool], _T],
+    operator: Callable[[bool, list[_T]], _T],
+) -> _T:
+    """Fold an expression bottom-up as if its negations were pushed down to the leaves, without recursion.
+
+    Each node is folded together with whether it is under an odd number of NOT nodes. A NOT node
+    takes the result of its operand folded with the opposite polarity, and under negation AND and OR
+    swap roles (De Morgan). A subexpression shared between several parents is only folded once per
+    polarity.
+
+    Args:
+        expr (Expr): The root expression node.
+        leaf (Callable[[Expr, bool], _T]): Folds a node that is neither a NOT nor an AND/OR, given
+            whether it is negated.
+        operator (Callable[[bool, list[_T]], _T]): Folds an AND/OR, given whether it acts as an AND and
+            the results of its operands in order.
+
+    Returns:
+        _T: The result for the root.
+    """
+    results: dict[tuple[int, bool], _T] = {}
+    stack: list[tuple[Expr, bool, bool]] = [(expr, False, False)]
+    while stack:
+        node, negated, visited = stack.pop()
+        if not visited and (id(node), negated) in results:
+            continue
+        match node:
+            case UnaryOp(UnaryOpKind.NOT, arg):
+                if not visited:
+                    stack.extend([(node, negated, True), (arg, not negated, False)])
+                    continue
+                result = results[(id(arg), not negated)]
+            case BinaryOp() | NaryOp():
+                children = node.children()
+                if not visited:
+                    stack.append((node, negated, True))
+                    stack.extend((child, negated, False) for child in reversed(children))
+                    continue
+                is_and = (node.kind == BinaryOpKind.AND) != negated
+                result = operator(is_and, [results[(id(child), negated)] for child in children])
+            case _:
+                result = leaf(node, negated)
+        results[(id(node), negated)] = result
+    return results[(id(expr), False)]
+
+
+def _rebuild(
+    expr: Expr,
+    children: Callable[[Expr], tuple[Expr, ...]],
+    rebuild: Callable[[Expr, tuple[Expr, ...]], Expr],
+) -> Expr:
+    results: list[Expr] = []
+    stack: list[tuple[Expr, Optional[tuple[Expr, ...]]]] = [(expr, None)]
+    while stack:
+        node, args = stack.pop()
+        if args is None:
+            args = children(node)
+            stack.append((node, args))
+            stack.extend((child, None) for child in reversed(args))
+            continue
+        start = len(results) - len(args)
+        rebuilt = tuple(results[start:])
+        del results[start:]
+        results.append(rebuild(node, rebuilt))
+    return results[0]
+
+
+def _binary_chain(node: BinaryOp) -> tuple[tuple[Expr, ...], tuple[PositionInfo, ...]]:
+    # Walk nested operators of the same kind in order, collecting the operands and operator positions
+    operands: list[Expr] = []
+    ops: list[PositionInfo] = []
+    stack: list[Expr | PositionInfo] = [node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, PositionInfo):
+            ops.append(item)
+        elif isinstance(item, BinaryOp) and item.kind == node.kind:
+            stack.extend([item.right, item.pos, item.left])
+        else:
+            operands.append(item)
+    return tuple(operands), tuple(ops)
+
+
+def _children(node: Expr) -> tuple[Expr, ...]:
+    return node.children()
+
+
+def _nary_children(node: Expr) -> tuple[Expr, ...]:
+    if isinstance(node, BinaryOp):
+        return _binary_chain(node)[0]
+    return node.children()
+
+
+def _to_nary_node(node: Expr, args: tuple[Expr, ...]) -> Expr:
+    match node:
+        case BinaryOp(kind):
+            cls = And if kind == BinaryOpKind.AND else Or
+            ops = _binary_chain(node)[1]
+            return cls(args, pos=ops[0], ops=ops)
+        case UnaryOp(kind, pos=pos):
+            return UnaryOp(kind, args[0], pos=pos)
+        case NaryOp(pos=pos, ops=ops):
+            return type(node)(args, pos=pos, ops=ops)
+        case _:
+            return node
+
+
+def _to_binary_node(node: Expr, args: tuple[Expr, ...]) -> Expr:
+    match node:
+        case NaryOp(pos=pos, ops=ops):
+            result = args[0]
+            for idx, arg in enumerate(args[1:]):
+                op_pos = ops[idx] if idx < len(ops) else pos
+                result = BinaryOp(node.kind, result, arg, pos=op_pos)
+            return result
+        case BinaryOp(kind, pos=pos):
+            return BinaryOp(kind, args[0], args[1], pos=pos)
+        case UnaryOp(kind, pos=pos):
+            return UnaryOp(kind, args[0], pos=pos)
+        case _:
+            return node
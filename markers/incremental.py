@@ -0,0 +1,419 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Iterator, Optional
+
+from markers.error import InternalError, ParseError
+from markers.expressions import Expr, NaryOp, Or, UnaryOp
+from markers.lexer import Lexer
+from markers.parser import Parser
+from markers.tokens import AndOpToken, EofToken, LeftParenToken, OrOpToken, RightParenToken, Token
+from markers.type import LineIndex, PositionInfo
+
+# Number of edits after which the edit log is rebased
+_MAX_SHIFTS = 512
+
+
+@dataclass
+class Edit:
+    """Text edit replacing a range of a program."""
+
+    offset: int
+    deleted: int
+    inserted: str
+
+
+@dataclass
+class _EditLog:
+    """Edits made to a program since it was last rebased, as (start, delta) pairs.
+
+    Every offset at or after the start of an edit moves by its delta. Positions apply the edits made
+    since they were last read when they are read again, so an edit never visits later positions. Once
+    the log reaches `_MAX_SHIFTS` edits, it is rebased: the positions of the current tokens catch up
+    with every edit in one pass and the edits are dropped, which bounds the memory of the log and the
+    edits a position replays. Positions of tokens replaced by an edit stop following later edits.
+    """
+
+    index: LineIndex
+    shifts: list[tuple[int, int]] = field(default_factory=list)
+    # Number of edits dropped by rebasing, which versions of positions count from
+    base: int = 0
+
+    @property
+    def version(self) -> int:
+        """Return the number of edits made to the program."""
+        return self.base + len(self.shifts)
+
+    def rebase(self, tokens: list[Token]) -> None:
+        """Move the positions of tokens to the current program and drop the edits.
+
+        Args:
+            tokens (list[Token]): The tokens of the current program.
+        """
+        end = self.version
+        groups: defaultdict[int, list[_TrackedPosition]] = defaultdict(list)
+        for token in tokens:
+            pos = token.pos
+            if isinstance(pos, _TrackedPosition) and self.base <= pos.version < end:
+                groups[pos.version].append(pos)
+        # The edits from a version on map its offsets to current offsets piecewise: offsets from
+        # `starts[j]` on move by `deltas[j]`, and their line and column are stale if `moved[j]`
+        starts, deltas, moved = [0], [0], [False]
+        for version in range(end - 1, self.base - 1, -1):
+            start, delta = self.shifts[version - self.base]
+            # Offsets before the edit keep the pieces below it, and later offsets map through the
+            # pieces from where they land
+            left = bisect_left(starts, start)
+            right = bisect_right(starts, start + delta) - 1
+            starts = [*starts[:left], start, *(piece - delta for piece in starts[right + 1 :])]
+            deltas = [*deltas[:left], *(piece + delta for piece in deltas[right:])]
+            moved = [*moved[:left], *([True] * (len(moved) - right))]
+            for pos in groups.get(version, ()):
+                pos.rebase(end, starts, deltas, moved)
+        self.base = end
+        self.shifts.clear()
+
+
+class _TrackedPosition(PositionInfo):
+    """Position whose offset, line, and column follow the later edits of its program.
+
+    The offset, line, and column are replaced together in one state tuple when the position catches
+    up with the edit log, so a concurrent reader never sees them mixed.
+    """
+
+    __slots__ = ("_log", "_state")
+
+    def __init__(self, log: _EditLog, offset: int, length: int):
+        """Initialize a _TrackedPosition.
+
+        Args:
+            log (_EditLog): The edit log of the program.
+            offset (int): The zero-based character offset of the span in the current program.
+            length (int): The length of the span in characters.
+        """
+        super().__init__(0, 0, length, offset=offset)
+        self._log = log
+        self._state: tuple[int, int, Optional[tuple[int, int]]] = (log.version, offset, None)
+
+    @property
+    def version(self) -> int:
+        """Return the number of edits of the program that the position has caught up with."""
+        return self._state[0]
+
+    def rebase(self, version: int, starts: list[int], deltas: list[int], moved: list[bool]) -> None:
+        """Catch up with the edits of a rebase, given as pieces of the offsets they move.
+
+        Args:
+            version (int): The version of the program after the edits.
+            starts (list[int]): The sorted offsets where the pieces start.
+            deltas (list[int]): The distances the offsets of each piece move.
+            moved (list[bool]): Whether an edit moved each piece, which may change its line.
+        """
+        _, offset, location = self._state
+        piece = bisect_right(starts, offset) - 1
+        self._state = (version, offset + deltas[piece], None if moved[piece] else location)
+
+    def _current(self) -> tuple[int, int, Optional[tuple[int, int]]]:
+        state = self._state
+        version, offset, location = state
+        log = self._log
+        end = log.version
+        if version == end or version < log.base:
+            # Positions that missed a rebase belong to replaced tokens and no longer move
+            return state
+        shifts = log.shifts
+        for idx in range(version - log.base, len(shifts)):
+            start, delta = shifts[idx]
+            if offset >= start:
+                # Line numbers may change even if the offset does not
+                offset += delta
+                location = None
+        state = (end, offset, location)
+        self._state = state
+        return state
+
+    def _location(self) -> tuple[int, int]:
+        version, offset, location = self._current()
+        if location is None:
+            location = self._log.index.location(offset)
+            self._state = (version, offset, location)
+        return location
+
+    @property
+    def offset(self) -> Optional[int]:
+        """Return the zero-based character offset of the span in the current program."""
+        return self._current()[1]
+
+    @property
+    def line_no(self) -> int:
+        """Return the one-based line number in the current program."""
+        return self._location()[0]
+
+    @property
+    def char_no(self) -> int:
+        """Return the one-based column number in the current program."""
+        return self._location()[1]
+
+
+@dataclass
+class ParseResult:
+    """Tokens and AST of a program, kept so that later edits can be reparsed incrementally.
+
+    Reparsing takes ownership of the previous result: its tokens, line index, and the positions of its
+    tokens and AST are updated in place for the edited program, so the previous result must not be
+    used afterwards.
+    """
+
+    program: str
+    tokens: list[Token]
+    expr: Optional[Expr]
+    error: Optional[ParseError]
+    index: LineIndex
+    log: _EditLog = field(repr=False)
+    # Whether the operators of the root chain are outside every paren group
+    top_level: bool = field(default=False, repr=False)
+
+
+@dataclass
+class _TrackingLexer(Lexer):
+    """Lexer whose token positions follow later edits of the program."""
+
+    log: _EditLog = field(kw_only=True)
+
+    def _pos(self, offset: int, length: int) -> PositionInfo:
+        return _TrackedPosition(self.log, offset, length)
+
+
+@dataclass
+class _OperandParser(Parser):
+    """Parser for a run of operands of an operator chain, starting in the middle of a token list."""
+
+    previous: Optional[Token] = None
+
+    def __post_init__(self) -> None:
+        """Start after the previous token, which positions errors at the end of input."""
+        self._last = self.previous
+        super().__post_init__()
+
+    def parse_operands(
+        self, chain: type[NaryOp], stop: Optional[int]
+    ) -> Optional[tuple[list[Expr], list[PositionInfo]]]:
+        """Parse operands of a chain and the operators between them, as the chain loop of Parser does.
+
+        Args:
+            chain (type[NaryOp]): The type of the chain, And or Or.
+            stop (Optional[int]): The number of tokens before the operator that ends the run, or None
+                if the run ends with the input.
+
+        Raises:
+            ParseError: If the operands are invalid.
+
+        Returns:
+            Optional[tuple[list[Expr], list[PositionInfo]]]: The operands and operator positions, or None
+                if the run does not end exactly at the stop.
+        """
+        operand = self._and if chain is Or else self._not
+        op_type = OrOpToken if chain is Or else AndOpToken
+        args = [operand()]
+        ops: list[PositionInfo] = []
+        while stop is None or self.idx < stop:
+            token = self._match(op_type)
+            if token is None:
+                break
+            ops.append(token.pos)
+            args.append(operand())
+        if self.idx != stop if stop is not None else self._has():
+            return None
+        return args, ops
+
+
+def parse_program(program: str) -> ParseResult:
+    """Lex and parse a program into a result that can be reparsed incrementally.
+
+    Args:
+        program (str): The boolean expression program.
+
+    Returns:
+        ParseResult: The tokens, and either the AST expression node or the parse error.
+    """
+    log = _EditLog(LineIndex(program))
+    lexer = _TrackingLexer(program, log=log)
+    tokens = []
+    while lexer.has():
+        tokens.append(lexer.next())
+    return _parse_tokens(program, tokens, log)
+
+
+def reparse(previous: ParseResult, edit: Edit) -> ParseResult:
+    """Reparse a program after an edit, reusing the previous tokens and AST.
+
+    Only the tokens around the edit are lexed again, and later tokens keep their position objects,
+    which catch up with the edit when they are read. The parser reparses only the operands of the
+    innermost operator chain around the edit, and the rest of the AST is reused as is. If the edit
+    changes the structure of that chain, wider chains are tried up to the whole program, which is
+    parsed again only if the edit changes the structure of the top-level chain or the previous
+    program did not parse. The AST and parse error are the same as those of a full reparse.
+
+    Args:
+        previous (ParseResult): The result for the program before the edit, which is consumed.
+        edit (Edit): The edit to apply.
+
+    Raises:
+        InternalError: If the edit is out of range.
+
+    Returns:
+        ParseResult: The result for the edited program.
+    """
+    old = previous.program
+    if edit.offset < 0 or edit.deleted < 0 or edit.offset + edit.deleted > len(old):
+        msg = f"Edit is out of range: {edit}"
+        raise InternalError(msg)
+
+    program = old[: edit.offset] + edit.inserted + old[edit.offset + edit.deleted :]
+    delta = len(edit.inserted) - edit.deleted
+    tokens = previous.tokens
+    # Tokens that end before the edit cannot change, since lexing restarts at every token boundary
+    first = bisect_left(tokens, edit.offset, key=_end)
+    if tokens and isinstance(tokens[-1], EofToken):
+        first = min(first, len(tokens) - 1)
+    start = _end(tokens[first - 1]) if first > 0 else 0
+    # Tokens from the end of the deleted text on move by the delta once the edit is logged
+    deleted_end = edit.offset + edit.deleted
+    tail = bisect_left(tokens, deleted_end, lo=first, key=_offset)
+
+    log = previous.log
+    log.shifts.append((deleted_end, delta))
+    log.index.reset(program)
+    lexer = _TrackingLexer(program, idx=start, log=log)
+    relexed: list[Token] = []
+    resume = len(tokens)
+    inserted_end = edit.offset + len(edit.inserted)
+    while lexer.has():
+        token = lexer.next()
+        relexed.append(token)
+        offset = _offset(token)
+        if offset >= inserted_end:
+            match = bisect_left(tokens, offset, lo=tail, key=_offset)
+            if match < len(tokens) and _same_token(tokens[match], token):
+                resume = match + 1
+                break
+    tokens[first:resume] = relexed
+    if len(log.shifts) >= _MAX_SHIFTS:
+        log.rebase(tokens)
+
+    if previous.expr is not None:
+        try:
+            expr = _reparse_chain(previous.expr, tokens, start, first + len(relexed), previous.top_level)
+        except ParseError as exc:
+            return ParseResult(program, tokens, None, exc, log.index, log)
+        if expr is not None:
+            return ParseResult(program, tokens, expr, None, log.index, log, previous.top_level)
+    return _parse_tokens(program, tokens, log)
+
+
+def _parse_tokens(program: str, tokens: list[Token], log: _EditLog) -> ParseResult:
+    try:
+        expr = Parser(tokens).parse()
+    except ParseError as exc:
+        return ParseResult(program, tokens, None, exc, log.index, log)
+    top_level = False
+    if isinstance(expr, NaryOp):
+        nesting = 0
+        for token in tokens[: _token_index(tokens, expr.ops[0])]:
+            nesting += isinstance(token, LeftParenToken) - isinstance(token, RightParenToken)
+        top_level = nesting == 0
+    return ParseResult(program, tokens, expr, None, log.index, log, top_level)
+
+
+def _reparse_chain(expr: Expr, tokens: list[Token], start: int, hi: int, top_level: bool) -> Optional[Expr]:
+    # Reparse the operands around the relexed tokens, which start at offset `start` and end before
+    # `tokens[hi]`, in the innermost operator chain that has an unchanged operator on both sides of
+    # them, or in the root chain if its operators are at the top level, where the start and end of the
+    # program bound it. Returns None if the edit changes the structure of every such chain. Errors
+    # raised while parsing the operands are the errors of a full reparse, since Parser makes the same
+    # calls from the operator on.
+    # Ancestors of the current node, each with the index of the child on the way to the edit
+    path: list[tuple[Expr, int]] = []
+    chains: list[tuple[int, NaryOp, int, int]] = []
+    node = expr
+    while True:
+        if isinstance(node, UnaryOp):
+            path.append((node, 0))
+            node = node.arg
+            continue
+        if not isinstance(node, NaryOp):
+            break
+        # The operators up to `ops[first]` and from `ops[last]` on are tokens outside the edit. Only
+        # tokens after the edit have moved, and the operators of replaced tokens are left in between.
+        first = bisect_left(node.ops, start, key=_pos_offset) - 1
+        last = bisect_left(range(len(node.ops)), True, key=partial(_is_reused, node.ops, tokens, hi))
+        if (first >= 0 and last < len(node.ops)) or (top_level and not path):
+            chains.append((len(path), node, first, last))
+        if last - first != 1:
+            break
+        path.append((node, last))
+        node = node.args[last]
+
+    for depth, chain, first, last in reversed(chains):
+        begin = 0 if first < 0 else _token_index(tokens, chain.ops[first]) + 1
+        stop = None if last == len(chain.ops) else _token_index(tokens, chain.ops[last]) - begin
+        parser = _OperandParser(_tokens_from(tokens, begin), previous=tokens[begin - 1] if begin > 0 else None)
+        run = parser.parse_operands(type(chain), stop)
+        if run is None:
+            continue
+        args = chain.args[: first + 1] + tuple(run[0]) + chain.args[last + 1 :]
+        ops = chain.ops[: first + 1] + tuple(run[1]) + chain.ops[last:]
+        if not ops:
+            # The root chain is now a single operand, which may be a chain of its own at the top level
+            return None
+        result: Expr = type(chain)(args, pos=ops[0], ops=ops)
+        for parent, idx in reversed(path[:depth]):
+            match parent:
+                case UnaryOp(kind):
+                    result = UnaryOp(kind, result, pos=parent.pos)
+                case NaryOp(parent_args, ops=parent_ops):
+                    parent_args = parent_args[:idx] + (result,) + parent_args[idx + 1 :]
+                    result = type(parent)(parent_args, pos=parent.pos, ops=parent_ops)
+        return result
+    return None
+
+
+def _tokens_from(tokens: list[Token], start: int) -> Iterator[Token]:
+    # Iterate from an index without first stepping over the tokens before it
+    return map(tokens.__getitem__, range(start, len(tokens)))
+
+
+def _token_index(tokens: list[Token], pos: PositionInfo) -> int:
+    return bisect_left(tokens, _pos_offset(pos), key=_offset)
+
+
+def _is_reused(ops: tuple[PositionInfo, ...], tokens: list[Token], hi: int, idx: int) -> bool:
+    # Replaced tokens keep stale offsets, so check that the operator is the token at its offset
+    pos = ops[idx]
+    token_idx = _token_index(tokens, pos)
+    return hi <= token_idx < len(tokens) and tokens[token_idx].pos is pos
+
+
+def _same_token(old: Token, new: Token) -> bool:
+    return (
+        type(old) is type(new)
+        and _offset(old) == _offset(new)
+        and old.pos.length == new.pos.length
+        and str(old) == str(new)
+    )
+
+
+def _pos_offset(pos: PositionInfo) -> int:
+    if pos.offset is None:
+        msg = "Incremental parsing requires tokens with offsets"
+        raise InternalError(msg)
+    return pos.offset
+
+
+def _offset(token: Token) -> int:
+    return _pos_offset(token.pos)
+
+
+def _end(token: Token) -> int:
+    return _offset(token) + token.pos.length
@@ -1,9 +1,14 @@
-from dataclasses import dataclass
-from typing import Iterator, Optional
+import re
+from dataclasses import dataclass, field
+from mmap import mmap
+from typing import Callable, Iterator, Optional, Union
 
-from markers.error import InternalError
+from markers.error import InternalError, LexLimitError
+from markers.limits import Limits, limit_or_max
+from markers.stats import Stats
 from markers.tokens import (
     AndOpToken,
+    AssignToken,
     EofToken,
     LeftParenToken,
     LitToken,
@@ -14,6 +19,48 @@ from markers.tokens import (
     RightParenToken,
     Token,
 )
+from markers.type import LineIndex
+
+_WHITESPACE = re.compile(r"\s*")
+_IDENTIFIER = re.compile(r"\w*")
+_BYTES_WHITESPACE = re.compile(rb"[\t\n\x0b\x0c\r\x1c-\x1f ]*")
+_BYTES_IDENTIFIER = re.compile(rb"[0-9A-Za-z_]*")
+_ASCII_END = 0x80
+_LEFT_PAREN = ord("(")
+_RIGHT_PAREN = ord(")")
+_ASSIGN = ord("=")
+
+
+def _is_identifier_char(c: str) -> bool:
+    return c.isalnum() or c in ("_")
+
+
+def _word_token(name: str, pos: PositionInfo) -> Token:
+    if name == "true":
+        return LitToken(True, pos=pos)
+    if name == "false":
+        return LitToken(False, pos=pos)
+    if name == "and":
+        return AndOpToken(pos=pos)
+    if name == "or":
+        return OrOpToken(pos=pos)
+    if name == "not":
+        return NotOpToken(pos=pos)
+    return NameToken(name, pos=pos)
+
+
+def _check_length(limits: Optional[Limits], length: int, pos: Callable[[int, int], PositionInfo]) -> int:
+    # Returns the token limit, so lexers compare against an int even when the limit is disabled
+    if limits is None:
+        return limit_or_max(None)
+    if limits.max_length is not None and length > limits.max_length:
+        msg = f"Input length {length} exceeds the limit of {limits.max_length}"
+        raise LexLimitError(msg, pos(limits.max_length, 1))
+    return limit_or_max(limits.max_tokens)
+
+
+def _token_limit_error(max_tokens: int, pos: PositionInfo) -> LexLimitError:
+    return LexLimitError(f"Input exceeds the limit of {max_tokens} tokens", pos)
 
 
 @dataclass
@@ -22,8 +69,16 @@ class LexerBase:
 
     text: str
     idx: int = 0
-    line_no: int = 1
-    char_no: int = 1
+    first_line: int = 1
+    limits: Optional[Limits] = field(default=None, kw_only=True)
+    index: LineIndex = field(init=False, repr=False)
+    _tokens: int = field(default=0, init=False, repr=False)
+    _max_tokens: int = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        """Initialize the line index of the text and check the length limit."""
+        self.index = LineIndex(self.text, self.first_line)
+        self._max_tokens = _check_length(self.limits, len(self.text), self._pos)
 
     def _has_char(self) -> bool:
         return self.idx < len(self.text)
@@ -31,11 +86,6 @@ class LexerBase:
     def _next_char(self) -> str:
         c = self._peek_char()
         self.idx += 1
-        if c == "\n":
-            self.line_no += 1
-            self.char_no = 1
-        else:
-            self.char_no += 1
         return c
 
     def _peek_char(self) -> str:
@@ -44,10 +94,16 @@ class LexerBase:
             raise InternalError(msg)
         return self.text[self.idx]
 
+    def _pos(self, offset: int, length: int) -> PositionInfo:
+        return PositionInfo.at(self.index, offset, length)
+
 
 @dataclass
 class Lexer(LexerBase):
-    """Boolean expression lexer."""
+    """Boolean expression lexer.
+
+    A lexer keeps a mutable cursor, so each thread must use its own lexer.
+    """
 
     curr: Optional[Token] = None
 
@@ -72,38 +128,32 @@ class Lexer(LexerBase):
             self.curr = None
             return token
 
-        while self._has_char():
-            line_no = self.line_no
-            char_no = self.char_no
-            c = self._next_char()
-            if not (c.isspace() or c == "\n"):
-                break
-        else:
-            pos = PositionInfo(line_no, char_no, 0)
-            return EofToken(pos=pos)
+        start = self.idx
+        match = _WHITESPACE.match(self.text, start)
+        assert match is not None
+        end = match.end()
+        if end == len(self.text):
+            # Trailing whitespace is reported at its last character
+            self.idx = end
+            return EofToken(pos=self._pos(max(start, end - 1), 0))
 
+        start = end
+        self._tokens += 1
+        if self._tokens > self._max_tokens:
+            raise _token_limit_error(self._max_tokens, self._pos(start, 1))
+        c = self.text[start]
+        self.idx = start + 1
         if c == "(":
-            pos = PositionInfo(line_no, char_no, 1)
-            return LeftParenToken(pos=pos)
+            return LeftParenToken(pos=self._pos(start, 1))
         if c == ")":
-            pos = PositionInfo(line_no, char_no, 1)
-            return RightParenToken(pos=pos)
+            return RightParenToken(pos=self._pos(start, 1))
+        if c == "=":
+            return AssignToken(pos=self._pos(start, 1))
         if self._is_identifier_char(c):
-            name = self._read_identifier(c)
-            pos = PositionInfo(line_no, char_no, len(name))
-            if name == "true":
-                return LitToken(True, pos=pos)
-            if name == "false":
-                return LitToken(False, pos=pos)
-            if name == "and":
-                return AndOpToken(pos=pos)
-            if name == "or":
-                return OrOpToken(pos=pos)
-            if name == "not":
-                return NotOpToken(pos=pos)
-            return NameToken(name, pos=pos)
-
-        return NameToken(c, pos=PositionInfo(line_no, char_no, 1))
+            name = self._read_identifier(start)
+            return _word_token(name, self._pos(start, len(name)))
+
+        return NameToken(c, pos=self._pos(start, 1))
 
     def has(self) -> bool:
         """Return whether the lexer has another token.
@@ -115,46 +165,260 @@ class Lexer(LexerBase):
 
     @classmethod
     def _is_identifier_char(cls, c: str) -> bool:
-        return c.isalnum() or c in ("_")
-
-    def _read_identifier(self, first_char: str) -> str:
-        name = first_char
-        while self._has_char():
-            c = self._peek_char()
-            if self._is_identifier_char(c):
-                name += self._next_char()
-            else:
-                break
-        return name
+        return _is_identifier_char(c)
+
+    def _read_identifier(self, start: int) -> str:
+        match = _IDENTIFIER.match(self.text, self.idx)
+        assert match is not None
+        self.idx = match.end()
+        return self.text[start : self.idx]
 
     @classmethod
-    def iter_tokens(cls, program: str) -> Iterator[Token]:
+    def iter_tokens(cls, program: str, limits: Optional[Limits] = None) -> Iterator[Token]:
         """Iterate over the tokens of a boolean expression.
 
         Args:
             program (str): The boolean expression program.
+            limits (Optional[Limits]): Limits on the program length and token count.
+
+        Raises:
+            LexLimitError: If the program exceeds a limit.
 
         Yields:
             Token: The next token.
         """
-        lexer = cls(program)
+        lexer = cls(program, limits=limits)
         while lexer.has():
             token = lexer.next()
             yield token
 
     @classmethod
-    def tokenize(cls, program: str) -> list[Token]:
+    def tokenize(
+        cls,
+        program: str,
+        stats: Optional[Stats] = None,
+        first_line: int = 1,
+        limits: Optional[Limits] = None,
+    ) -> list[Token]:
         """Tokenize a boolean expression.
 
         Args:
             program (str): The boolean expression program.
+            stats (Optional[Stats]): Stats to record lexing time into.
+            first_line (int): The line number of the first line of the program.
+            limits (Optional[Limits]): Limits on the program length and token count.
+
+        Raises:
+            LexLimitError: If the program exceeds a limit.
 
         Returns:
             list[Token]: The list of tokens.
         """
+        if stats is not None:
+            with stats.timer("lex"):
+                return cls.tokenize(program, first_line=first_line, limits=limits)
+
         tokens = []
-        lexer = cls(program)
+        lexer = cls(program, first_line=first_line, limits=limits)
         while lexer.has():
             token = lexer.next()
             tokens.append(token)
         return tokens
+
+
+@dataclass
+class BytesLexer:
+    """Boolean expression lexer over a UTF-8 encoded buffer such as a memory-mapped file.
+
+    ASCII input is scanned directly in the buffer. Only non-ASCII characters are decoded, one at a
+    time, and each distinct identifier is decoded once and shared by every token that spells it.
+    Token offsets count bytes, while lines and columns still count characters. A lexer keeps a
+    mutable cursor, so each thread must use its own lexer.
+
+    Positions read the buffer when their line and column are first computed. Once the lexer reaches
+    the end of the buffer or a limit, it copies the buffer into memory the positions own, so tokens
+    and ASTs outlive a memory map that is closed afterwards. A caller that stops lexing early must
+    call `detach` before closing the buffer if it keeps any of the tokens.
+    """
+
+    buffer: Union[bytes, mmap]
+    idx: int = 0
+    first_line: int = 1
+    curr: Optional[Token] = None
+    limits: Optional[Limits] = field(default=None, kw_only=True)
+    index: LineIndex = field(init=False, repr=False)
+    names: dict[bytes, str] = field(init=False, repr=False, default_factory=dict)
+    _tokens: int = field(default=0, init=False, repr=False)
+    _max_tokens: int = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        """Initialize the line index of the buffer and check the length limit, which counts bytes."""
+        self.index = LineIndex(self.buffer, self.first_line)
+        self._max_tokens = _check_length(self.limits, len(self.buffer), self._resolved_pos)
+
+    def peek(self) -> Token:
+        """Peek the next token.
+
+        Returns:
+            Token: The next token.
+        """
+        token = self.next()
+        self.curr = token
+        return token
+
+    def next(self) -> Token:  # noqa: PLR0911
+        """Get the next token.
+
+        Returns:
+            Token: The next token.
+        """
+        if self.curr is not None:
+            token = self.curr
+            self.curr = None
+            return token
+
+        start, last_space = self._skip_whitespace(self.idx)
+        if start == len(self.buffer):
+            # Trailing whitespace is reported at its last character
+            self.idx = start
+            self.detach()
+            return EofToken(pos=self._pos(last_space, 0))
+
+        self._tokens += 1
+        if self._tokens > self._max_tokens:
+            self.detach()
+            raise _token_limit_error(self._max_tokens, self._pos(start, 1))
+        c = self.buffer[start]
+        if c == _LEFT_PAREN:
+            self.idx = start + 1
+            return LeftParenToken(pos=self._pos(start, 1))
+        if c == _RIGHT_PAREN:
+            self.idx = start + 1
+            return RightParenToken(pos=self._pos(start, 1))
+        if c == _ASSIGN:
+            self.idx = start + 1
+            return AssignToken(pos=self._pos(start, 1))
+
+        char, end = self._decode_char(start)
+        if _is_identifier_char(char):
+            name = self._read_identifier(start)
+            return _word_token(name, self._pos(start, len(name)))
+
+        self.idx = end
+        return NameToken(char, pos=self._pos(start, 1))
+
+    def has(self) -> bool:
+        """Return whether the lexer has another token.
+
+        Returns:
+            bool: Whether the lexer has another token.
+        """
+        if self.idx < len(self.buffer):
+            return True
+        self.detach()
+        return False
+
+    def detach(self) -> None:
+        """Copy the buffer into memory owned by the positions of the tokens lexed from it."""
+        self.index.detach()
+
+    def _pos(self, offset: int, length: int) -> PositionInfo:
+        return PositionInfo.at(self.index, offset, length)
+
+    def _resolved_pos(self, offset: int, length: int) -> PositionInfo:
+        # Computes the line and column right away, for errors raised before the buffer is copied
+        line_no, char_no = self.index.location(offset)
+        return PositionInfo(line_no, char_no, length, offset=offset)
+
+    def _decode_char(self, idx: int) -> tuple[str, int]:
+        lead = self.buffer[idx]
+        if lead < _ASCII_END:
+            return chr(lead), idx + 1
+        size = 2 if lead < 0xE0 else 3 if lead < 0xF0 else 4  # noqa: PLR2004
+        try:
+            return self.buffer[idx : idx + size].decode("utf-8"), idx + size
+        except UnicodeDecodeError:
+            return "\ufffd", idx + 1
+
+    def _skip_whitespace(self, idx: int) -> tuple[int, int]:
+        last_space = idx
+        size = len(self.buffer)
+        while True:
+            match = _BYTES_WHITESPACE.match(self.buffer, idx)
+            assert match is not None
+            if match.end() > idx:
+                last_space = match.end() - 1
+                idx = match.end()
+            if idx == size or self.buffer[idx] < _ASCII_END:
+                return idx, last_space
+            char, end = self._decode_char(idx)
+            if not char.isspace():
+                return idx, last_space
+            last_space = idx
+            idx = end
+
+    def _read_identifier(self, start: int) -> str:
+        idx = start
+        size = len(self.buffer)
+        while True:
+            match = _BYTES_IDENTIFIER.match(self.buffer, idx)
+            assert match is not None
+            idx = match.end()
+            if idx == size or self.buffer[idx] < _ASCII_END:
+                break
+            char, end = self._decode_char(idx)
+            if not _is_identifier_char(char):
+                break
+            idx = end
+        self.idx = idx
+
+        raw = self.buffer[start:idx]
+        name = self.names.get(raw)
+        if name is None:
+            name = raw.decode("utf-8")
+            self.names[raw] = name
+        return name
+
+    @classmethod
+    def iter_tokens(cls, buffer: Union[bytes, mmap], limits: Optional[Limits] = None) -> Iterator[Token]:
+        """Iterate over the tokens of a boolean expression.
+
+        Args:
+            buffer (Union[bytes, mmap]): The UTF-8 encoded boolean expression program.
+            limits (Optional[Limits]): Limits on the program length and token count.
+
+        Raises:
+            LexLimitError: If the program exceeds a limit.
+
+        Yields:
+            Token: The next token.
+        """
+        lexer = cls(buffer, limits=limits)
+        while lexer.has():
+            token = lexer.next()
+            yield token
+
+    @classmethod
+    def tokenize(
+        cls,
+        buffer: Union[bytes, mmap],
+        stats: Optional[Stats] = None,
+        limits: Optional[Limits] = None,
+    ) -> list[Token]:
+        """Tokenize a boolean expression.
+
+        Args:
+            buffer (Union[bytes, mmap]): The UTF-8 encoded boolean expression program.
+            stats (Optional[Stats]): Stats to record lexing time into.
+            limits (Optional[Limits]): Limits on the program length and token count.
+
+        Raises:
+            LexLimitError: If the program exceeds a limit.
+
+        Returns:
+            list[Token]: The list of tokens.
+        """
+        if stats is not None:
+            with stats.timer("lex"):
+                return cls.tokenize(buffer, limits=limits)
+        return list(cls.iter_tokens(buffer, limits))
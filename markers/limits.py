@@ -0,0 +1,42 @@
+import sys
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class Limits:
+    """Resource limits for lexing, parsing, and evaluating untrusted programs.
+
+    Each limit is disabled when it is None. Limits are checked as input is consumed, so a program
+    that exceeds one fails as soon as the limit is reached, with the position where it was reached.
+    """
+
+    max_length: Optional[int] = None
+    max_tokens: Optional[int] = None
+    max_depth: Optional[int] = None
+    max_nodes: Optional[int] = None
+    max_steps: Optional[int] = None
+
+
+# Limits for programs from untrusted sources. The parser takes four interpreter frames per nested
+# paren group and the evaluator at most two per level, so a nesting depth of 100 takes about 420
+# frames of the default recursion limit of 1000, leaving more than 500 for the caller.
+UNTRUSTED_LIMITS = Limits(
+    max_length=100_000,
+    max_tokens=20_000,
+    max_depth=100,
+    max_nodes=20_000,
+    max_steps=100_000,
+)
+
+
+def limit_or_max(limit: Optional[int]) -> int:
+    """Return a limit, or the largest int so that disabled limits need no separate check.
+
+    Args:
+        limit (Optional[int]): The limit, or None if it is disabled.
+
+    Returns:
+        int: The limit to compare counters against.
+    """
+    return sys.maxsize if limit is None else limit
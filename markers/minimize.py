@@ -0,0 +1,290 @@
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from markers.error import NormalFormError
+from markers.expressions import And, Expr, Lit, Or, UnaryOp, UnaryOpKind, Var, walk
+from markers.normal_form import to_dnf
+from markers.truth_table import IncrementalEvaluator
+
+# A cube is a product of literals as (mask, value): bit i of mask is set if variable i occurs, and
+# bit i of value is its polarity
+Cube = tuple[int, int]
+
+EXACT_MAX_VARS = 12
+DNF_MAX_CLAUSES = 10_000
+# Number of truth table rows enumerated between checks of the time budget
+_ROWS_PER_CHECK = 1024
+
+
+@dataclass
+class MinimizeResult:
+    """Result of minimizing an expression."""
+
+    expr: Expr
+    literals_before: int
+    literals_after: int
+    method: str
+    complete: bool
+
+
+class _TimeoutError(Exception):
+    pass
+
+
+@dataclass
+class _Deadline:
+    at: Optional[float]
+
+    def check(self) -> None:
+        if self.at is not None and time.monotonic() > self.at:
+            raise _TimeoutError
+
+
+def minimize(
+    expr: Expr,
+    timeout: Optional[float] = None,
+    exact_max_vars: int = EXACT_MAX_VARS,
+    max_clauses: int = DNF_MAX_CLAUSES,
+) -> MinimizeResult:
+    """Minimize an expression into a sum of products.
+
+    Expressions with at most `exact_max_vars` variables are minimized with Quine-McCluskey over their
+    truth table, which finds every prime implicant and then picks the essential ones and a greedy
+    cover of the rest. Larger expressions are converted to DNF and improved with Espresso-style
+    expand and irredundant passes, which check implicants with tautology tests instead of
+    enumerating the truth table.
+
+    If the time budget or the DNF clause budget runs out, the result is the best valid cover found
+    so far, or the original expression if there is none, and `complete` is false.
+
+    Args:
+        expr (Expr): The AST expression node.
+        timeout (Optional[float]): The maximum number of seconds to spend.
+        exact_max_vars (int): The largest number of variables to minimize exactly.
+        max_clauses (int): The maximum number of DNF terms for the heuristic minimizer.
+
+    Raises:
+        InternalError: If the expression is invalid.
+
+    Returns:
+        MinimizeResult: The minimized expression along with literal counts before and after.
+    """
+    deadline = _Deadline(None if timeout is None else time.monotonic() + timeout)
+    before = count_literals(expr)
+    names = list(dict.fromkeys(node.name for node in walk(expr) if isinstance(node, Var)))
+    if len(names) <= exact_max_vars:
+        method = "quine-mccluskey"
+        try:
+            evaluator = IncrementalEvaluator(expr)
+            names = evaluator.names
+            minterms = _minterms(evaluator, deadline)
+            cover = _quine_mccluskey(minterms, len(names), deadline)
+        except _TimeoutError:
+            return MinimizeResult(expr, before, before, method, complete=False)
+        result = _to_expr(cover, names)
+        return MinimizeResult(result, before, count_literals(result), method, complete=True)
+
+    method = "espresso"
+    try:
+        terms = to_dnf(expr, max_clauses=max_clauses, timeout=timeout)
+    except NormalFormError:
+        return MinimizeResult(expr, before, before, method, complete=False)
+    names = terms.variables
+    cover = list(dict.fromkeys(_term_cube(term) for term in terms.clauses))
+    complete = _espresso(cover, deadline)
+    result = _to_expr(cover, names)
+    return MinimizeResult(result, before, count_literals(result), method, complete)
+
+
+def count_literals(expr: Expr) -> int:
+    """Return the number of variable occurrences in an expression.
+
+    Args:
+        expr (Expr): The AST expression node.
+
+    Returns:
+        int: The literal count.
+    """
+    return sum(1 for node in walk(expr) if isinstance(node, Var))
+
+
+def _minterms(evaluator: IncrementalEvaluator, deadline: _Deadline) -> list[int]:
+    minterms = []
+    for idx, row in enumerate(evaluator.iter_gray_code()):
+        if idx % _ROWS_PER_CHECK == 0:
+            deadline.check()
+        if row.result:
+            minterms.append(_minterm(row.values))
+    return minterms
+
+
+def _minterm(values: tuple[bool, ...]) -> int:
+    return sum(1 << idx for idx, value in enumerate(values) if value)
+
+
+def _term_cube(term: list[int]) -> Cube:
+    mask = value = 0
+    for literal in term:
+        bit = 1 << (abs(literal) - 1)
+        mask |= bit
+        if literal > 0:
+            value |= bit
+    return mask, value
+
+
+def _quine_mccluskey(minterms: list[int], num_vars: int, deadline: _Deadline) -> list[Cube]:
+    full = (1 << num_vars) - 1
+    # Implicants are (don't care bits, value bits), merged while they differ in exactly one bit
+    implicants = {(0, minterm) for minterm in minterms}
+    primes: list[Cube] = []
+    while implicants:
+        deadline.check()
+        merged: set[tuple[int, int]] = set()
+        used: set[tuple[int, int]] = set()
+        for dont_care, value in implicants:
+            for idx in range(num_vars):
+                bit = 1 << idx
+                if dont_care & bit or value & bit:
+                    continue
+                other = (dont_care, value | bit)
+                if other in implicants:
+                    merged.add((dont_care | bit, value))
+                    used.update([(dont_care, value), other])
+        primes.extend((full & ~dont_care, value) for dont_care, value in implicants - used)
+        implicants = merged
+    return _select_cover(primes, minterms, deadline)
+
+
+def _select_cover(primes: list[Cube], minterms: list[int], deadline: _Deadline) -> list[Cube]:
+    covering: dict[int, list[int]] = {
+        minterm: [idx for idx, (mask, value) in enumerate(primes) if minterm & mask == value] for minterm in minterms
+    }
+    chosen: list[int] = []
+    uncovered = set(minterms)
+    # Essential primes are the only cover of some minterm
+    for candidates in covering.values():
+        if len(candidates) == 1 and candidates[0] not in chosen:
+            chosen.append(candidates[0])
+    for idx in chosen:
+        mask, value = primes[idx]
+        uncovered -= {minterm for minterm in uncovered if minterm & mask == value}
+
+    while uncovered:
+        deadline.check()
+        counts: dict[int, int] = {}
+        for minterm in uncovered:
+            for idx in covering[minterm]:
+                counts[idx] = counts.get(idx, 0) + 1
+        best = max(counts, key=lambda idx: (counts[idx], -primes[idx][0].bit_count()))
+        chosen.append(best)
+        mask, value = primes[best]
+        uncovered = {minterm for minterm in uncovered if minterm & mask != value}
+    return [primes[idx] for idx in chosen]
+
+
+def _espresso(cover: list[Cube], deadline: _Deadline) -> bool:
+    # The original cover is the specification that every expanded cube is checked against
+    on_set = list(cover)
+    cost = _cost(cover)
+    try:
+        while True:
+            _expand(cover, on_set, deadline)
+            _irredundant(cover, deadline)
+            new_cost = _cost(cover)
+            if new_cost >= cost:
+                return True
+            cost = new_cost
+    except _TimeoutError:
+        return False
+
+
+def _cost(cover: list[Cube]) -> tuple[int, int]:
+    return sum(mask.bit_count() for mask, _ in cover), len(cover)
+
+
+def _expand(cover: list[Cube], on_set: list[Cube], deadline: _Deadline) -> None:
+    # Expand the cubes with the most literals first, which are the least likely to be absorbed later
+    cover.sort(key=lambda cube: cube[0].bit_count(), reverse=True)
+    idx = 0
+    while idx < len(cover):
+        mask, value = cover[idx]
+        bits = mask
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            candidate = (mask & ~bit, value & ~bit)
+            if _tautology(_cofactor(on_set, candidate), deadline):
+                mask, value = candidate
+                cover[idx] = candidate
+        # Drop the other cubes that the expanded cube now contains
+        cover[:] = [cube for pos, cube in enumerate(cover) if pos == idx or not _contains((mask, value), cube)]
+        idx = cover.index((mask, value)) + 1
+
+
+def _irredundant(cover: list[Cube], deadline: _Deadline) -> None:
+    for cube in sorted(cover, key=lambda cube: cube[0].bit_count(), reverse=True):
+        rest = [other for other in cover if other != cube]
+        if _tautology(_cofactor(rest, cube), deadline):
+            cover.remove(cube)
+
+
+def _contains(outer: Cube, inner: Cube) -> bool:
+    mask, value = outer
+    return inner[0] & mask == mask and inner[1] & mask == value
+
+
+def _cofactor(cover: list[Cube], cube: Cube) -> list[Cube]:
+    mask, value = cube
+    return [
+        (other_mask & ~mask, other_value & ~mask)
+        for other_mask, other_value in cover
+        if not (other_mask & mask & (other_value ^ value))
+    ]
+
+
+def _tautology(cover: list[Cube], deadline: _Deadline) -> bool:
+    deadline.check()
+    if any(mask == 0 for mask, _ in cover):
+        return True
+    if not cover:
+        return False
+    positive = negative = 0
+    for mask, value in cover:
+        positive |= mask & value
+        negative |= mask & ~value
+    binate = positive & negative
+    # A cover that is unate in every variable is a tautology only if it has the universal cube
+    if not binate:
+        return False
+    counts: dict[int, int] = {}
+    for mask, _ in cover:
+        bits = mask & binate
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            counts[bit] = counts.get(bit, 0) + 1
+    split = max(counts, key=counts.__getitem__)
+    return _tautology(_cofactor(cover, (split, split)), deadline) and _tautology(_cofactor(cover, (split, 0)), deadline)
+
+
+def _to_expr(cover: list[Cube], names: list[str]) -> Expr:
+    terms: list[Expr] = []
+    for mask, value in sorted(cover, key=_literal_order):
+        literals: list[Expr] = []
+        for idx, name in enumerate(names):
+            bit = 1 << idx
+            if mask & bit:
+                literals.append(Var(name) if value & bit else UnaryOp(UnaryOpKind.NOT, Var(name)))
+        if not literals:
+            return Lit(True)
+        terms.append(literals[0] if len(literals) == 1 else And(tuple(literals)))
+    if not terms:
+        return Lit(False)
+    return terms[0] if len(terms) == 1 else Or(tuple(terms))
+
+
+def _literal_order(cube: Cube) -> list[tuple[int, int]]:
+    # Order terms by their literals in variable order, positive before negative
+    mask, value = cube
+    return [(idx, 1 - (value >> idx & 1)) for idx in range(mask.bit_length()) if mask >> idx & 1]
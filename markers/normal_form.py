@@ -0,0 +1,224 @@
+import time
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Iterator, Optional
+
+from markers.error import InternalError, NormalFormError
+from markers.expressions import BinaryOp, BinaryOpKind, Expr, Lit, NaryOp, UnaryOp, UnaryOpKind, Var, fold_polarized
+
+Clause = frozenset[int]
+
+
+@dataclass
+class ClauseSet:
+    """Formula in flat clause form.
+
+    Literals are DIMACS-style ints: variable `i` is `variables[i - 1]` and `-i` is its negation.
+    Variables numbered above `len(variables)` are auxiliary variables introduced by Tseitin encoding.
+    In conjunctive form the clauses are disjunctions and in disjunctive form they are conjunctions.
+    """
+
+    clauses: list[list[int]]
+    variables: list[str]
+    num_vars: int
+    conjunctive: bool = True
+
+    def iter_dimacs(self) -> Iterator[str]:
+        """Iterate over the lines of the DIMACS representation.
+
+        Yields:
+            str: The next line, without a trailing newline.
+        """
+        for num, name in enumerate(self.variables, start=1):
+            yield f"c var {num} {name}"
+        kind = "cnf" if self.conjunctive else "dnf"
+        yield f"p {kind} {self.num_vars} {len(self.clauses)}"
+        for clause in self.clauses:
+            yield " ".join([*map(str, clause), "0"])
+
+
+@dataclass
+class _VariableTable:
+    variables: dict[str, int] = field(default_factory=dict)
+    num_vars: int = 0
+
+    def literal(self, name: str) -> int:
+        num = self.variables.get(name)
+        if num is None:
+            self.num_vars += 1
+            num = self.num_vars
+            self.variables[name] = num
+        return num
+
+    def fresh(self) -> int:
+        self.num_vars += 1
+        return self.num_vars
+
+
+@dataclass
+class _Budget:
+    max_clauses: Optional[int]
+    deadline: Optional[float]
+    expr: Expr
+
+    def check(self, clauses: int) -> None:
+        if self.max_clauses is not None and clauses > self.max_clauses:
+            msg = f"Normal form exceeds the budget of {self.max_clauses} clauses"
+            raise NormalFormError(msg, self.expr.pos)
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            msg = "Normal form exceeds its time budget"
+            raise NormalFormError(msg, self.expr.pos)
+
+
+def to_tseitin_cnf(expr: Expr) -> ClauseSet:
+    """Convert an expression to an equisatisfiable CNF using Tseitin encoding.
+
+    Every AND/OR node gets an auxiliary variable, so the output has one two-literal clause per operand
+    plus one clause over all operands per node.
+
+    Args:
+        expr (Expr): The AST expression node.
+
+    Raises:
+        InternalError: If the expression is invalid.
+
+    Returns:
+        ClauseSet: The CNF clauses.
+    """
+    table = _VariableTable()
+    # Number the original variables first so they come before the auxiliary variables
+    for node in _iter_postorder(expr):
+        if isinstance(node, Var):
+            table.literal(node.name)
+    names = list(table.variables)
+
+    clauses: list[list[int]] = []
+    literals: dict[int, int] = {}
+    for node in _iter_postorder(expr):
+        if id(node) in literals:
+            # A subexpression shared between several parents is only encoded once
+            continue
+        match node:
+            case Var(name):
+                literal = table.literal(name)
+            case Lit(val):
+                literal = table.fresh()
+                clauses.append([literal if val else -literal])
+            case UnaryOp(UnaryOpKind.NOT, arg):
+                literal = -literals[id(arg)]
+            case BinaryOp(BinaryOpKind.AND) | NaryOp() if node.kind == BinaryOpKind.AND:
+                args = [literals[id(child)] for child in node.children()]
+                literal = table.fresh()
+                clauses.extend([-literal, arg] for arg in args)
+                clauses.append([literal, *(-arg for arg in args)])
+            case BinaryOp(BinaryOpKind.OR) | NaryOp() if node.kind == BinaryOpKind.OR:
+                args = [literals[id(child)] for child in node.children()]
+                literal = table.fresh()
+                clauses.extend([literal, -arg] for arg in args)
+                clauses.append([-literal, *args])
+            case other:
+                msg = f"Normal form is not implemented for expression type: {type(other)}"
+                raise InternalError(msg)
+        literals[id(node)] = literal
+    clauses.append([literals[id(expr)]])
+    return ClauseSet(clauses, names, table.num_vars)
+
+
+def to_cnf(expr: Expr, max_clauses: Optional[int] = None, timeout: Optional[float] = None) -> ClauseSet:
+    """Convert an expression to an equivalent CNF by distributing OR over AND.
+
+    Args:
+        expr (Expr): The AST expression node.
+        max_clauses (Optional[int]): The maximum number of clauses of any intermediate result.
+        timeout (Optional[float]): The maximum number of seconds to spend.
+
+    Raises:
+        NormalFormError: If the conversion exceeds its budget.
+        InternalError: If the expression is invalid.
+
+    Returns:
+        ClauseSet: The CNF clauses.
+    """
+    return _to_exact(expr, conjunctive=True, max_clauses=max_clauses, timeout=timeout)
+
+
+def to_dnf(expr: Expr, max_clauses: Optional[int] = None, timeout: Optional[float] = None) -> ClauseSet:
+    """Convert an expression to an equivalent DNF by distributing AND over OR.
+
+    Args:
+        expr (Expr): The AST expression node.
+        max_clauses (Optional[int]): The maximum number of terms of any intermediate result.
+        timeout (Optional[float]): The maximum number of seconds to spend.
+
+    Raises:
+        NormalFormError: If the conversion exceeds its budget.
+        InternalError: If the expression is invalid.
+
+    Returns:
+        ClauseSet: The DNF terms.
+    """
+    return _to_exact(expr, conjunctive=False, max_clauses=max_clauses, timeout=timeout)
+
+
+def _to_exact(
+    expr: Expr,
+    conjunctive: bool,
+    max_clauses: Optional[int],
+    timeout: Optional[float],
+) -> ClauseSet:
+    deadline = None if timeout is None else time.monotonic() + timeout
+    budget = _Budget(max_clauses, deadline, expr)
+    table = _VariableTable()
+    leaf = partial(_exact_leaf, table, conjunctive)
+    operator = partial(_exact_operator, conjunctive, budget)
+    clauses = [sorted(clause, key=abs) for clause in fold_polarized(expr, leaf, operator)]
+    return ClauseSet(clauses, list(table.variables), table.num_vars, conjunctive)
+
+
+def _exact_leaf(table: _VariableTable, conjunctive: bool, node: Expr, negated: bool) -> list[Clause]:
+    match node:
+        case Var(name):
+            literal = table.literal(name)
+            return [frozenset([-literal if negated else literal])]
+        case Lit(val):
+            # A clause set with one empty clause is false in CNF and true in DNF
+            return [frozenset()] if (val != negated) != conjunctive else []
+        case other:
+            msg = f"Normal form is not implemented for expression type: {type(other)}"
+            raise InternalError(msg)
+
+
+def _exact_operator(conjunctive: bool, budget: _Budget, is_and: bool, children: list[list[Clause]]) -> list[Clause]:
+    result = children[0]
+    for other in children[1:]:
+        result = _union(result, other) if is_and == conjunctive else _product(result, other, budget)
+        budget.check(len(result))
+    return result
+
+
+def _union(a: list[Clause], b: list[Clause]) -> list[Clause]:
+    return list(dict.fromkeys([*a, *b]))
+
+
+def _product(a: list[Clause], b: list[Clause], budget: _Budget) -> list[Clause]:
+    budget.check(len(a) * len(b))
+    result: dict[Clause, None] = {}
+    for x in a:
+        for y in b:
+            clause = x | y
+            # Drop clauses that contain a literal and its negation
+            if not any(-literal in clause for literal in x):
+                result[clause] = None
+        budget.check(len(result))
+    return list(result)
+
+
+def _iter_postorder(expr: Expr) -> Iterator[Expr]:
+    stack: list[tuple[Expr, bool]] = [(expr, False)]
+    while stack:
+        node, visited = stack.pop()
+        if visited:
+            yield node
+            continue
+        stack.append((node, True))
+        stack.extend((child, False) for child in reversed(node.children()))
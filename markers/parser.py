@@ -1,19 +1,24 @@
-from dataclasses import dataclass
-from typing import Callable, Optional, Sequence
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional
 
-from markers.error import ParseError
+from markers.error import ParseError, ParseLimitError
 from markers.expressions import (
-    BinaryOp,
-    BinaryOpKind,
+    And,
+    Definition,
     Expr,
     Lit,
+    Or,
     PositionInfo,
     UnaryOp,
     UnaryOpKind,
     Var,
 )
+from markers.limits import Limits, limit_or_max
+from markers.stats import Stats
 from markers.tokens import (
     AndOpToken,
+    AssignToken,
+    EofToken,
     LeftParenToken,
     LitToken,
     NameToken,
@@ -26,11 +31,30 @@ from markers.tokens import (
 
 @dataclass
 class ParserBase:
-    """Boolean expression parser base class."""
+    """Boolean expression parser base class.
 
-    # TODO: Accept an iterable collection of tokens.
-    tokens: Sequence[Token]
+    Tokens are consumed from an iterable with one token of lookahead, so a lazily lexed token stream
+    never has to be materialized as a list.
+    """
+
+    tokens: Iterable[Token]
     idx: int = 0
+    _stream: Iterator[Token] = field(init=False, repr=False)
+    _curr: Optional[Token] = field(init=False, repr=False, default=None)
+    _last: Optional[Token] = field(init=False, repr=False, default=None)
+
+    def __post_init__(self) -> None:
+        """Start reading from the token stream."""
+        self._stream = iter(self.tokens)
+        self._curr = self._read()
+
+    def _read(self) -> Optional[Token]:
+        token = next(self._stream, None)
+        if isinstance(token, EofToken):
+            # Trailing whitespace ends the input, but still positions end of input errors
+            self._last = token
+            return None
+        return token
 
     def _match(self, token_type: type) -> Optional[Token]:
         if not self._has():
@@ -44,6 +68,8 @@ class ParserBase:
     def _advance(self) -> None:
         if self._has():
             self.idx += 1
+            self._last = self._curr
+            self._curr = self._read()
 
     def _next(self) -> Token:
         token = self._peek()
@@ -51,15 +77,47 @@ class ParserBase:
         return token
 
     def _peek(self) -> Token:
-        return self.tokens[self.idx]
+        if self._curr is None:
+            msg = "No more tokens"
+            raise IndexError(msg)
+        return self._curr
 
     def _has(self) -> bool:
-        return self.idx < len(self.tokens)
+        return self._curr is not None
+
+    def _last_token(self) -> Optional[Token]:
+        # Only used to report errors, so draining the rest of the stream is acceptable
+        last = self._curr if self._curr is not None else self._last
+        for token in self._stream:
+            last = token
+        return last
 
 
 @dataclass
 class Parser(ParserBase):
-    """Boolean expression parser."""
+    """Boolean expression parser.
+
+    Chains of AND/OR operators are parsed into single n-ary And/Or nodes, so long chains do not
+    nest. A parser keeps a mutable cursor, so each thread must use its own parser. The expressions
+    it returns are immutable and can be shared across threads.
+
+    With limits, nesting of parens and NOT operators beyond the depth limit and expressions with
+    more nodes than the node limit fail with a ParseLimitError at the token that exceeded the limit.
+    """
+
+    stats: Optional[Stats] = None
+    limits: Optional[Limits] = None
+    _nesting: int = field(default=0, init=False, repr=False)
+    _nodes: int = field(default=0, init=False, repr=False)
+    _max_depth: int = field(init=False, repr=False)
+    _max_nodes: int = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        """Start reading from the token stream and resolve the limits."""
+        super().__post_init__()
+        limits = self.limits or Limits()
+        self._max_depth = limit_or_max(limits.max_depth)
+        self._max_nodes = limit_or_max(limits.max_nodes)
 
     def parse(self) -> Expr:
         """Parse the boolean expression.
@@ -70,6 +128,12 @@ class Parser(ParserBase):
         Returns:
             Expr: The AST expression node.
         """
+        if self.stats is not None:
+            with self.stats.timer("parse"):
+                return self._parse()
+        return self._parse()
+
+    def _parse(self) -> Expr:
         result = self._first_fn()
         if self._has():
             token = self._peek()
@@ -77,61 +141,86 @@ class Parser(ParserBase):
             raise ParseError(msg, token.pos)
         return result
 
-    def _get_table(
-        self,
-    ) -> list[Callable[[], Expr]]:
-        return [
-            self._or,
-            self._and,
-            self._not,
-            self._paren,
-            self._lit,
-            self._var,
-            self._default,
-        ]
+    def parse_definitions(self) -> list[Definition]:
+        """Parse a sequence of named definitions of the form `name = expr`.
 
-    def _first_fn(self) -> Expr:
-        return self._get_table()[0]()
+        Raises:
+            ParseError: If a definition is invalid.
+
+        Returns:
+            list[Definition]: The definitions in program order.
+        """
+        definitions = []
+        while self._has():
+            definitions.append(self._definition())
+        return definitions
+
+    def _definition(self) -> Definition:
+        token = self._next()
+        if not isinstance(token, NameToken) or not token.value.isidentifier():
+            msg = f'Expected definition name, found "{token!s}"'
+            raise ParseError(msg, token.pos)
+        if not self._match(AssignToken):
+            msg = f'Expected "=" after definition name "{token.value}"'
+            raise ParseError(msg, token.pos)
+        expr = self._first_fn()
+        return Definition(token.value, expr, pos=token.pos)
 
-    def _next_fn(self, fn: Callable[[], Expr]) -> Expr:
-        table = self._get_table()
-        precedence = table.index(fn)
-        return table[precedence + 1]()
+    # Each precedence level calls the next one directly, so that every level of nesting costs as few
+    # interpreter frames as possible: a paren group takes four frames and a NOT operator one.
+    def _first_fn(self) -> Expr:
+        return self._or()
 
     def _or(self) -> Expr:
-        left = self._next_fn(self._or)
+        first = self._and()
+        args = [first]
+        ops: list[PositionInfo] = []
         while token := self._match(OrOpToken):
-            right = self._next_fn(self._or)
-            left = BinaryOp(BinaryOpKind.OR, left, right, pos=token.pos)
-        return left
+            ops.append(token.pos)
+            args.append(self._and())
+        if not ops:
+            return first
+        self._count_node(ops[0])
+        return Or(tuple(args), pos=ops[0], ops=tuple(ops))
 
     def _and(self) -> Expr:
-        left = self._next_fn(self._and)
+        first = self._not()
+        args = [first]
+        ops: list[PositionInfo] = []
         while token := self._match(AndOpToken):
-            right = self._next_fn(self._and)
-            left = BinaryOp(BinaryOpKind.AND, left, right, pos=token.pos)
-        return left
+            ops.append(token.pos)
+            args.append(self._not())
+        if not ops:
+            return first
+        self._count_node(ops[0])
+        return And(tuple(args), pos=ops[0], ops=tuple(ops))
 
     def _not(self) -> Expr:
         if token := self._match(NotOpToken):
+            self._enter(token.pos)
             arg = self._not()
+            self._nesting -= 1
+            self._count_node(token.pos)
             return UnaryOp(UnaryOpKind.NOT, arg, pos=token.pos)
-        return self._next_fn(self._not)
+        return self._paren()
 
     def _paren(self) -> Expr:
         if token := self._match(LeftParenToken):
-            result = self._first_fn()
+            self._enter(token.pos)
+            result = self._or()
+            self._nesting -= 1
             if not self._match(RightParenToken):
                 msg = "Expected closing paren matching opening"
                 raise ParseError(msg, token.pos)
             return result
-        return self._next_fn(self._paren)
+        return self._lit()
 
     def _lit(self) -> Expr:
         if token := self._match(LitToken):
             assert isinstance(token, LitToken)
+            self._count_node(token.pos)
             return Lit(token.value, pos=token.pos)
-        return self._next_fn(self._lit)
+        return self._var()
 
     def _var(self) -> Expr:
         if token := self._match(NameToken):
@@ -139,15 +228,112 @@ class Parser(ParserBase):
             if not token.value.isidentifier():
                 msg = f'Unexpected token "{token.value}"'
                 raise ParseError(msg, token.pos)
+            self._count_node(token.pos)
             return Var(token.value, pos=token.pos)
-        return self._next_fn(self._var)
+        return self._default()
+
+    def _enter(self, pos: PositionInfo) -> None:
+        self._nesting += 1
+        if self._nesting > self._max_depth:
+            msg = f"Nesting depth exceeds the limit of {self._max_depth}"
+            raise ParseLimitError(msg, pos)
+
+    def _count_node(self, pos: PositionInfo) -> None:
+        self._nodes += 1
+        if self._nodes > self._max_nodes:
+            msg = f"Expression exceeds the limit of {self._max_nodes} nodes"
+            raise ParseLimitError(msg, pos)
 
     def _default(self) -> Expr:
-        if len(self.tokens) == 0:
+        token = self._last_token()
+        if token is None:
             msg = "Unexpected end of input"
             raise ParseError(msg, PositionInfo(0, 0, 0))
 
-        # TODO: Avoid accessing tokens directly
-        token = self.tokens[-1]
         msg = "Unexpected end of input"
         raise ParseError(msg, token.pos)
+
+
+@dataclass
+class RecoveringParser(Parser):
+    """Boolean expression parser that recovers from errors to report every error in a program.
+
+    Instead of stopping at the first error, the parser records it and resynchronizes: a missing
+    operand is replaced by a placeholder, a group with unexpected tokens is skipped up to its
+    closing paren, and an unexpected token after a complete expression is skipped along with any
+    operators that follow it. Errors are reported at the offending token, so the first error can
+    differ from the one Parser reports.
+    """
+
+    errors: list[ParseError] = field(default_factory=list)
+    _depth: int = field(default=0, init=False, repr=False)
+
+    def _parse(self) -> Expr:
+        result = self._first_fn()
+        while self._has():
+            token = self._next()
+            self._error(f'Unexpected token "{token!s}"', token.pos)
+            while self._match(AndOpToken) or self._match(OrOpToken):
+                pass
+            if self._has():
+                self._first_fn()
+        if self.errors:
+            raise self.errors[0]
+        return result
+
+    def _error(self, message: str, pos: PositionInfo) -> None:
+        self.errors.append(ParseError(message, pos))
+
+    def _paren(self) -> Expr:
+        token = self._match(LeftParenToken)
+        if token is None:
+            return self._lit()
+        self._enter(token.pos)
+        self._depth += 1
+        result = self._or()
+        self._depth -= 1
+        self._nesting -= 1
+        if self._match(RightParenToken):
+            return result
+        if self._has():
+            unexpected = self._peek()
+            self._error(f'Unexpected token "{unexpected!s}"', unexpected.pos)
+            if self._skip_group():
+                return result
+        self._error("Expected closing paren matching opening", token.pos)
+        return result
+
+    def _skip_group(self) -> bool:
+        # Skip to the closing paren of the current group, returning whether there is one
+        nesting = 0
+        while self._has():
+            token = self._next()
+            if isinstance(token, LeftParenToken):
+                nesting += 1
+            elif isinstance(token, RightParenToken):
+                if nesting == 0:
+                    return True
+                nesting -= 1
+        return False
+
+    def _var(self) -> Expr:
+        if token := self._match(NameToken):
+            assert isinstance(token, NameToken)
+            if not token.value.isidentifier():
+                self._error(f'Unexpected token "{token.value}"', token.pos)
+            self._count_node(token.pos)
+            return Var(token.value, pos=token.pos)
+        return self._default()
+
+    def _default(self) -> Expr:
+        if not self._has():
+            self._error("Unexpected end of input", PositionInfo(0, 0, 0) if self._last is None else self._last.pos)
+            return Lit(False)
+        token = self._peek()
+        self._error(f'Unexpected token "{token!s}"', token.pos)
+        # Operators continue the enclosing chain and a closing paren ends the enclosing group, so
+        # leave them for the caller to resynchronize on
+        closes_group = isinstance(token, RightParenToken) and self._depth > 0
+        if not (closes_group or isinstance(token, (AndOpToken, OrOpToken))):
+            self._advance()
+        return Lit(False, pos=token.pos)
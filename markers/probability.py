@@ -0,0 +1,369 @@
+import math
+import random
+from dataclasses import dataclass, field
+from typing import Mapping, Optional
+
+from markers.bitmap_index import evaluate_bits
+from markers.error import EvaluateError, InternalError
+from markers.expressions import BinaryOp, BinaryOpKind, Expr, Lit, NaryOp, UnaryOp, UnaryOpKind, Var, walk
+
+MAX_BDD_NODES = 100_000
+MAX_BDD_CACHE_SIZE = 1_000_000
+MAX_BDD_VARS = 500
+MONTE_CARLO_SAMPLES = 100_000
+# Number of random bits per sampled value, which bounds the precision of sampled probabilities
+_SAMPLE_PRECISION = 32
+
+_FALSE = 0
+_TRUE = 1
+
+
+@dataclass
+class ProbabilityResult:
+    """Probability that an expression is true.
+
+    The method is "independent" when the operands of every AND/OR share no variables, "bdd" when
+    some operands were combined in a decision diagram, and "monte-carlo" when the exact methods ran
+    over budget. Estimates have a standard error, which is zero for exact results.
+    """
+
+    value: float
+    method: str
+    exact: bool
+    std_error: float = 0.0
+
+
+class _BddLimitError(Exception):
+    pass
+
+
+@dataclass
+class _Bdd:
+    """Reduced ordered binary decision diagram manager, shared by every formula of a model.
+
+    Nodes are ids into `nodes`, where 0 and 1 are the terminals and every other node is
+    (level, low, high). Variables get levels in order of first use, and the unique table and the
+    operation caches persist across formulas so that shared subformulas are only built once.
+    """
+
+    levels: dict[str, int] = field(default_factory=dict)
+    names: list[str] = field(default_factory=list)
+    nodes: list[tuple[int, int, int]] = field(default_factory=lambda: [(-1, 0, 0), (-1, 1, 1)])
+    unique: dict[tuple[int, int, int], int] = field(default_factory=dict)
+    and_cache: dict[tuple[int, int], int] = field(default_factory=dict)
+    or_cache: dict[tuple[int, int], int] = field(default_factory=dict)
+    not_cache: dict[int, int] = field(default_factory=dict)
+    limit: int = 0
+
+    def size(self) -> int:
+        return len(self.nodes) + len(self.and_cache) + len(self.or_cache) + len(self.not_cache)
+
+    def var(self, name: str) -> int:
+        level = self.levels.get(name)
+        if level is None:
+            level = self.levels[name] = len(self.names)
+            self.names.append(name)
+        return self._node(level, _FALSE, _TRUE)
+
+    def _node(self, level: int, low: int, high: int) -> int:
+        if low == high:
+            return low
+        key = (level, low, high)
+        node = self.unique.get(key)
+        if node is None:
+            if len(self.nodes) >= self.limit:
+                raise _BddLimitError
+            node = self.unique[key] = len(self.nodes)
+            self.nodes.append(key)
+        return node
+
+    def negate(self, u: int) -> int:
+        if u <= _TRUE:
+            return 1 - u
+        result = self.not_cache.get(u)
+        if result is None:
+            level, low, high = self.nodes[u]
+            result = self.not_cache[u] = self._node(level, self.negate(low), self.negate(high))
+        return result
+
+    def apply(self, kind: BinaryOpKind, u: int, v: int) -> int:
+        # The value that decides the result on its own, and the value that leaves the other operand
+        absorbing, identity = (_FALSE, _TRUE) if kind == BinaryOpKind.AND else (_TRUE, _FALSE)
+        if absorbing in (u, v):
+            return absorbing
+        if u in (identity, v):
+            return v
+        if v == identity:
+            return u
+        cache = self.and_cache if kind == BinaryOpKind.AND else self.or_cache
+        key = (u, v) if u < v else (v, u)
+        result = cache.get(key)
+        if result is None:
+            u_level, u_low, u_high = self.nodes[u]
+            v_level, v_low, v_high = self.nodes[v]
+            level = min(u_level, v_level)
+            if u_level != level:
+                u_low = u_high = u
+            if v_level != level:
+                v_low = v_high = v
+            low = self.apply(kind, u_low, v_low)
+            high = self.apply(kind, u_high, v_high)
+            result = cache[key] = self._node(level, low, high)
+        return result
+
+
+@dataclass
+class ProbabilityModel:
+    """Probabilities of independent variables, for computing the probability of formulas.
+
+    Exact probabilities are computed bottom-up over the expression tree. Operands of an AND/OR that
+    share no variables are independent, so their probabilities are combined with products. Operands
+    that share variables are grouped, and each group is compiled into a decision diagram whose
+    probability is computed in one pass over its nodes. The decision diagram and its caches are
+    shared by every formula of the model, so a corpus of formulas that reuse subformulas builds them
+    once. Once they hold more than `max_bdd_cache_size` nodes and cache entries, they are dropped
+    before the next formula, so memory stays bounded over any corpus. If a formula needs more
+    decision diagram nodes than the budget, its probability is estimated by Monte Carlo sampling
+    instead, evaluating every sample at once with one bit per sample.
+
+    A model caches state on every call, so it must only be used by one thread at a time.
+    """
+
+    probabilities: Mapping[str, float]
+    max_bdd_nodes: int = MAX_BDD_NODES
+    samples: int = MONTE_CARLO_SAMPLES
+    seed: Optional[int] = None
+    max_bdd_cache_size: int = MAX_BDD_CACHE_SIZE
+    _bdd: _Bdd = field(default_factory=_Bdd, init=False, repr=False)
+    _bdd_probabilities: dict[int, float] = field(default_factory=dict, init=False, repr=False)
+    _rng: random.Random = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        """Initialize the random number generator for sampling."""
+        self._rng = random.Random(self.seed)
+
+    def probability(self, expr: Expr) -> ProbabilityResult:
+        """Return the probability that an expression is true.
+
+        Args:
+            expr (Expr): The AST expression node.
+
+        Raises:
+            EvaluateError: If a variable is unknown or its probability is not between 0 and 1.
+            InternalError: If the expression is invalid.
+
+        Returns:
+            ProbabilityResult: The exact probability, or an estimate if the exact methods are over budget.
+        """
+        for node in walk(expr):
+            if isinstance(node, Var):
+                self._variable(node)
+        try:
+            return self._exact(expr)
+        except _BddLimitError:
+            return self.estimate(expr)
+
+    @property
+    def cache_size(self) -> int:
+        """Return the number of decision diagram nodes and cache entries the model holds."""
+        return self._bdd.size()
+
+    def estimate(self, expr: Expr, samples: Optional[int] = None) -> ProbabilityResult:
+        """Estimate the probability that an expression is true by Monte Carlo sampling.
+
+        Args:
+            expr (Expr): The AST expression node.
+            samples (Optional[int]): The number of samples, defaulting to the model's sample count.
+
+        Raises:
+            EvaluateError: If a variable is unknown or its probability is not between 0 and 1.
+            InternalError: If the expression is invalid.
+
+        Returns:
+            ProbabilityResult: The estimated probability and its standard error.
+        """
+        num_samples = self.samples if samples is None else samples
+        if num_samples < 1:
+            msg = f"Sample count must be positive, found {num_samples}"
+            raise InternalError(msg)
+        columns: dict[str, int] = {}
+        for node in walk(expr):
+            if isinstance(node, Var) and node.name not in columns:
+                columns[node.name] = self._sample(self._variable(node), num_samples)
+        count = evaluate_bits(expr, columns.__getitem__, num_samples).bit_count()
+        value = count / num_samples
+        std_error = math.sqrt(value * (1 - value) / num_samples)
+        return ProbabilityResult(value, "monte-carlo", exact=False, std_error=std_error)
+
+    def _variable(self, node: Var) -> float:
+        if node.name not in self.probabilities:
+            msg = f'Unknown variable: "{node.name}"'
+            raise EvaluateError(msg, node.pos)
+        value = self.probabilities[node.name]
+        if not 0 <= value <= 1:
+            msg = f'Probability of "{node.name}" must be between 0 and 1, found {value}'
+            raise EvaluateError(msg, node.pos)
+        return value
+
+    def _sample(self, p: float, num_samples: int) -> int:
+        # Build bits that are set with probability p from fair random bits, one binary digit of p at
+        # a time from the least significant: OR with fresh bits halves the distance to 1, AND halves it to 0
+        numerator = round(p * (1 << _SAMPLE_PRECISION))
+        if numerator >= 1 << _SAMPLE_PRECISION:
+            return (1 << num_samples) - 1
+        bits = 0
+        for digit in range(_SAMPLE_PRECISION):
+            if numerator >> digit & 1:
+                bits |= self._rng.getrandbits(num_samples)
+            elif bits:
+                bits &= self._rng.getrandbits(num_samples)
+        return bits
+
+    def _exact(self, expr: Expr) -> ProbabilityResult:
+        if self._bdd.size() > self.max_bdd_cache_size:
+            self._bdd = _Bdd()
+            self._bdd_probabilities.clear()
+        self._bdd.limit = len(self._bdd.nodes) + self.max_bdd_nodes
+        probabilities: dict[int, float] = {}
+        scopes: dict[int, frozenset[str]] = {}
+        bdds: dict[int, int] = {}
+        used_bdd = False
+        scope: frozenset[str]
+        stack: list[tuple[Expr, bool]] = [(expr, False)]
+        while stack:
+            node, visited = stack.pop()
+            children = node.children()
+            if children and not visited:
+                stack.append((node, True))
+                stack.extend((child, False) for child in children)
+                continue
+            match node:
+                case Lit(val):
+                    probability, scope = float(val), frozenset()
+                case Var(name):
+                    probability, scope = self.probabilities[name], frozenset([name])
+                case UnaryOp(UnaryOpKind.NOT, arg):
+                    probability, scope = 1 - probabilities[id(arg)], scopes[id(arg)]
+                case BinaryOp(BinaryOpKind.AND | BinaryOpKind.OR as kind) | NaryOp(kind=kind):
+                    factors = []
+                    for group in _independent_groups(children, scopes):
+                        if len(group) == 1:
+                            factor = probabilities[id(group[0])]
+                        else:
+                            used_bdd = True
+                            factor = self._group_probability(kind, group, scopes, bdds)
+                        # OR is true unless every independent group is false
+                        factors.append(factor if kind == BinaryOpKind.AND else 1 - factor)
+                    product = math.prod(factors)
+                    probability = product if kind == BinaryOpKind.AND else 1 - product
+                    scope = frozenset().union(*(scopes[id(child)] for child in children))
+                case other:
+                    msg = f"Probability is not implemented for expression type: {type(other)}"
+                    raise InternalError(msg)
+            probabilities[id(node)] = probability
+            scopes[id(node)] = scope
+        return ProbabilityResult(probabilities[id(expr)], "bdd" if used_bdd else "independent", exact=True)
+
+    def _group_probability(
+        self,
+        kind: BinaryOpKind,
+        group: list[Expr],
+        scopes: dict[int, frozenset[str]],
+        bdds: dict[int, int],
+    ) -> float:
+        if len(frozenset().union(*(scopes[id(child)] for child in group))) > MAX_BDD_VARS:
+            # Applying decision diagrams recurses once per variable
+            raise _BddLimitError
+        result = self._build(group[0], bdds)
+        for child in group[1:]:
+            result = self._bdd.apply(kind, result, self._build(child, bdds))
+        return self._node_probability(result)
+
+    def _build(self, expr: Expr, bdds: dict[int, int]) -> int:
+        bdd = self._bdd
+        stack: list[tuple[Expr, bool]] = [(expr, False)]
+        while stack:
+            node, visited = stack.pop()
+            if id(node) in bdds:
+                continue
+            children = node.children()
+            if children and not visited:
+                stack.append((node, True))
+                stack.extend((child, False) for child in children)
+                continue
+            match node:
+                case Lit(val):
+                    result = _TRUE if val else _FALSE
+                case Var(name):
+                    result = bdd.var(name)
+                case UnaryOp(UnaryOpKind.NOT, arg):
+                    result = bdd.negate(bdds[id(arg)])
+                case BinaryOp(BinaryOpKind.AND | BinaryOpKind.OR as kind) | NaryOp(kind=kind):
+                    result = bdds[id(children[0])]
+                    for child in children[1:]:
+                        result = bdd.apply(kind, result, bdds[id(child)])
+                case other:
+                    msg = f"Probability is not implemented for expression type: {type(other)}"
+                    raise InternalError(msg)
+            bdds[id(node)] = result
+        return bdds[id(expr)]
+
+    def _node_probability(self, u: int) -> float:
+        if u <= _TRUE:
+            return float(u)
+        probability = self._bdd_probabilities.get(u)
+        if probability is None:
+            level, low, high = self._bdd.nodes[u]
+            p = self.probabilities[self._bdd.names[level]]
+            probability = (1 - p) * self._node_probability(low) + p * self._node_probability(high)
+            self._bdd_probabilities[u] = probability
+        return probability
+
+
+def probability(
+    expr: Expr,
+    probabilities: Mapping[str, float],
+    max_bdd_nodes: int = MAX_BDD_NODES,
+    samples: int = MONTE_CARLO_SAMPLES,
+    seed: Optional[int] = None,
+) -> ProbabilityResult:
+    """Return the probability that an expression is true, given independent variable probabilities.
+
+    Use a ProbabilityModel to compute the probabilities of many formulas with shared caches.
+
+    Args:
+        expr (Expr): The AST expression node.
+        probabilities (Mapping[str, float]): The probability that each variable is true.
+        max_bdd_nodes (int): The decision diagram node budget before falling back to sampling.
+        samples (int): The number of Monte Carlo samples for the fallback.
+        seed (Optional[int]): The seed for sampling.
+
+    Raises:
+        EvaluateError: If a variable is unknown or its probability is not between 0 and 1.
+        InternalError: If the expression is invalid.
+
+    Returns:
+        ProbabilityResult: The exact probability, or an estimate if the exact methods are over budget.
+    """
+    return ProbabilityModel(probabilities, max_bdd_nodes, samples, seed).probability(expr)
+
+
+def _independent_groups(children: tuple[Expr, ...], scopes: dict[int, frozenset[str]]) -> list[list[Expr]]:
+    # Union-find over operands, joining operands that share a variable
+    parents = list(range(len(children)))
+
+    def find(idx: int) -> int:
+        while parents[idx] != idx:
+            parents[idx] = parents[parents[idx]]
+            idx = parents[idx]
+        return idx
+
+    owners: dict[str, int] = {}
+    for idx, child in enumerate(children):
+        for name in scopes[id(child)]:
+            owner = owners.setdefault(name, idx)
+            parents[find(owner)] = find(idx)
+    groups: dict[int, list[Expr]] = {}
+    for idx, child in enumerate(children):
+        groups.setdefault(find(idx), []).append(child)
+    return list(groups.values())
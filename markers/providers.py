@@ -0,0 +1,239 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Iterator, Mapping
+
+from markers.error import EvaluateError, InternalError
+from markers.expressions import BinaryOp, BinaryOpKind, Expr, Lit, NaryOp, UnaryOp, UnaryOpKind, Var, variables
+from markers.type import AsyncProvider, Env, PositionInfo, Provider
+
+
+@dataclass
+class ProviderResult:
+    """Result of evaluating an expression against a variable provider."""
+
+    value: bool
+    resolved: int
+    skipped: int
+
+
+@dataclass
+class TracedResult:
+    """Result of evaluating an expression while recording the variables it read."""
+
+    value: bool
+    reads: tuple[tuple[str, bool], ...]
+
+
+class TracingEnv(Mapping[str, bool]):
+    """Environment that records which variables are read, in the order of their first read.
+
+    Short-circuiting means an evaluation usually reads only a few of the variables in the
+    environment, and the recorded reads are the ones that decided the result.
+    """
+
+    def __init__(self, env: Env):
+        """Initialize a TracingEnv.
+
+        Args:
+            env (Env): The environment to read variables from.
+        """
+        self.env = env
+        self.reads: dict[str, bool] = {}
+
+    def __getitem__(self, name: str) -> bool:
+        """Return the value of a variable and record the read."""
+        value = self.env[name]
+        self.reads.setdefault(name, value)
+        return value
+
+    def __contains__(self, name: object) -> bool:
+        """Return whether the environment has a variable."""
+        return name in self.env
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the variable names of the environment."""
+        return iter(self.env)
+
+    def __len__(self) -> int:
+        """Return the number of variables in the environment."""
+        return len(self.env)
+
+
+class LazyEnv(Mapping[str, bool]):
+    """Environment that resolves variables from a provider on first access and memoizes them.
+
+    The provider raises KeyError for unknown variables. Iterating the environment only yields the
+    variables resolved so far.
+    """
+
+    def __init__(self, provider: Provider):
+        """Initialize a LazyEnv.
+
+        Args:
+            provider (Provider): The function that resolves a variable name to its value.
+        """
+        self.provider = provider
+        self.cache: dict[str, bool] = {}
+        self.unknown: set[str] = set()
+
+    def __getitem__(self, name: str) -> bool:
+        """Return the value of a variable, resolving it if needed."""
+        if name in self.cache:
+            return self.cache[name]
+        if name in self.unknown:
+            raise KeyError(name)
+        try:
+            value = self.provider(name)
+        except KeyError:
+            self.unknown.add(name)
+            raise
+        self.cache[name] = value
+        return value
+
+    def __contains__(self, name: object) -> bool:
+        """Return whether the provider knows a variable, resolving it if needed."""
+        if not isinstance(name, str):
+            return False
+        try:
+            self[name]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the resolved variable names."""
+        return iter(self.cache)
+
+    def __len__(self) -> int:
+        """Return the number of resolved variables."""
+        return len(self.cache)
+
+
+@dataclass
+class _AsyncResolutions:
+    provider: AsyncProvider
+    max_speculative: int
+    futures: dict[str, "asyncio.Future[bool]"] = field(default_factory=dict)
+    speculative: int = 0
+
+    def speculate(self) -> bool:
+        # Reserve room for an operand started before it is known to be needed
+        if self.speculative >= self.max_speculative:
+            return False
+        self.speculative += 1
+        return True
+
+    def release(self, _: object) -> None:
+        self.speculative -= 1
+
+    async def resolve(self, name: str, pos: PositionInfo) -> bool:
+        future = self.futures.get(name)
+        if future is None:
+            future = asyncio.ensure_future(self.provider(name))
+            self.futures[name] = future
+        try:
+            # Shield so cancelling one speculative reader does not cancel a resolution other readers share
+            return await asyncio.shield(future)
+        except KeyError:
+            msg = f'Unknown variable: "{name}"'
+            raise EvaluateError(msg, pos) from None
+
+    def resolved(self) -> int:
+        # Every provider call that started counts, including speculative ones cancelled later
+        return len(self.futures)
+
+    def close(self) -> None:
+        for future in self.futures.values():
+            _discard(future)
+
+
+def _discard(future: "asyncio.Future[bool]") -> None:
+    if future.done():
+        if not future.cancelled():
+            # Retrieve the exception so asyncio does not log it as unhandled
+            future.exception()
+    else:
+        future.cancel()
+
+
+@dataclass
+class AsyncEvaluator:
+    """Boolean expression evaluator that resolves variables from an async provider.
+
+    Each variable is resolved at most once per evaluation. In concurrent mode the later operands of
+    an AND/OR are started speculatively while an earlier one is awaited, so they resolve in parallel
+    when they are needed, and are cancelled as soon as an operand short-circuits. At most
+    `max_speculative` operands run ahead at a time across the whole evaluation, which bounds the
+    provider calls that short-circuiting makes unnecessary. Every provider call that started counts
+    as resolved. The result is always the same as sequential evaluation, including which unknown
+    variable is reported.
+    """
+
+    concurrent: bool = True
+    max_speculative: int = 1
+
+    async def evaluate(self, expr: Expr, provider: AsyncProvider) -> ProviderResult:
+        """Evaluate the boolean expression.
+
+        Args:
+            expr (Expr): The AST expression node to evaluate.
+            provider (AsyncProvider): The coroutine function that resolves a variable name to its value.
+
+        Raises:
+            EvaluateError: If a variable is unknown.
+            InternalError: If the expression is invalid.
+
+        Returns:
+            ProviderResult: The value along with the number of resolved and skipped variables.
+        """
+        resolutions = _AsyncResolutions(provider, self.max_speculative if self.concurrent else 0)
+        try:
+            value = await self._evaluate(expr, resolutions)
+            resolved = resolutions.resolved()
+        finally:
+            resolutions.close()
+        return ProviderResult(value, resolved, len(variables(expr)) - resolved)
+
+    async def _evaluate(self, expr: Expr, resolutions: _AsyncResolutions) -> bool:
+        match expr:
+            case Lit(val):
+                return val
+            case Var(name, pos=pos):
+                return await resolutions.resolve(name, pos)
+            case UnaryOp(UnaryOpKind.NOT, arg):
+                return not await self._evaluate(arg, resolutions)
+            case BinaryOp(BinaryOpKind.AND | BinaryOpKind.OR as kind, left, right):
+                return await self._evaluate_operands(kind, (left, right), resolutions)
+            case NaryOp(args):
+                return await self._evaluate_operands(expr.kind, args, resolutions)
+            case other:
+                msg = f"Evaluate is not implement for expression type: {type(other)}"
+                raise InternalError(msg)
+
+    async def _evaluate_operands(
+        self,
+        kind: BinaryOpKind,
+        args: tuple[Expr, ...],
+        resolutions: _AsyncResolutions,
+    ) -> bool:
+        short_circuit = kind == BinaryOpKind.OR
+        # Later operands started ahead of the one being awaited, by index
+        tasks: dict[int, asyncio.Future[bool]] = {}
+        started = 0
+        try:
+            for idx, arg in enumerate(args):
+                started = max(started, idx + 1)
+                while started < len(args) and resolutions.speculate():
+                    task = asyncio.ensure_future(self._evaluate(args[started], resolutions))
+                    task.add_done_callback(resolutions.release)
+                    tasks[started] = task
+                    started += 1
+                ahead = tasks.pop(idx, None)
+                value = await (self._evaluate(arg, resolutions) if ahead is None else ahead)
+                if value == short_circuit:
+                    return short_circuit
+        finally:
+            # Cancel the operands that short-circuiting or an error made irrelevant
+            for pending in tasks.values():
+                _discard(pending)
+        return not short_circuit
@@ -0,0 +1,119 @@
+import io
+from typing import TextIO, Union
+
+from markers.error import InternalError
+from markers.expressions import BinaryOp, BinaryOpKind, Expr, Lit, NaryOp, UnaryOp, UnaryOpKind, Var
+from markers.tokens import AndOpToken, LitToken, NotOpToken, OrOpToken, Token
+
+DEFAULT_BUFFER_SIZE = 65536
+
+_OPERATOR_TOKENS: dict[BinaryOpKind, Token] = {BinaryOpKind.AND: AndOpToken(), BinaryOpKind.OR: OrOpToken()}
+_NOT_TOKEN = NotOpToken()
+_LIT_TEXT = {value: str(LitToken(value)) for value in (False, True)}
+# Variables and literals never need parentheses
+_ATOM_PRECEDENCE = 0
+
+
+def dump(expr: Expr, stream: TextIO, buffer_size: int = DEFAULT_BUFFER_SIZE) -> None:
+    """Write an expression as program text, without recursion and with minimal parentheses.
+
+    Parentheses are only written where the operator precedence in `markers.tokens` requires them,
+    and around n-ary operands of the same operator so that their grouping is kept. Parsing the
+    output gives the same expression as `to_nary`. Text is written in chunks of about
+    `buffer_size` characters, so the whole output is never held in memory.
+
+    Args:
+        expr (Expr): The root expression node.
+        stream (TextIO): The text stream to write to.
+        buffer_size (int): The number of characters to collect before each write.
+
+    Raises:
+        InternalError: If the expression is invalid.
+    """
+    parts: list[str] = []
+    size = 0
+    # Entries are either literal text to write or expression nodes to render
+    stack: list[Union[str, Expr]] = [expr]
+    while stack:
+        item = stack.pop()
+        text = item if isinstance(item, str) else _render(item, stack)
+        if text:
+            parts.append(text)
+            size += len(text)
+            if size >= buffer_size:
+                stream.write("".join(parts))
+                parts.clear()
+                size = 0
+    stream.write("".join(parts))
+
+
+def dumps(expr: Expr) -> str:
+    """Return an expression as program text, with minimal parentheses.
+
+    Args:
+        expr (Expr): The root expression node.
+
+    Raises:
+        InternalError: If the expression is invalid.
+
+    Returns:
+        str: The program text.
+    """
+    stream = io.StringIO()
+    dump(expr, stream)
+    return stream.getvalue()
+
+
+def _render(expr: Expr, stack: list[Union[str, Expr]]) -> str:
+    # Return the text that starts the node, and push the rest of the node in reverse order
+    match expr:
+        case Lit(val):
+            return _LIT_TEXT[val]
+        case Var(name):
+            return name
+        case UnaryOp(UnaryOpKind.NOT, arg):
+            _push_operand(arg, expr, stack)
+            return f"{_NOT_TOKEN} "
+        case BinaryOp(kind, left, right):
+            separator = f" {_OPERATOR_TOKENS[kind]} "
+            _push_operand(right, expr, stack)
+            stack.append(separator)
+            _push_operand(left, expr, stack)
+            return ""
+        case NaryOp(args=args):
+            separator = f" {_OPERATOR_TOKENS[expr.kind]} "
+            for idx in range(len(args) - 1, -1, -1):
+                _push_operand(args[idx], expr, stack)
+                if idx > 0:
+                    stack.append(separator)
+            return ""
+        case other:
+            msg = f"Serialize is not implemented for expression type: {type(other)}"
+            raise InternalError(msg)
+
+
+def _push_operand(operand: Expr, parent: Expr, stack: list[Union[str, Expr]]) -> None:
+    if _needs_parens(operand, parent):
+        stack.extend([")", operand, "("])
+    else:
+        stack.append(operand)
+
+
+def _needs_parens(operand: Expr, parent: Expr) -> bool:
+    operand_precedence = _precedence(operand)
+    parent_precedence = _precedence(parent)
+    if operand_precedence != parent_precedence:
+        return operand_precedence > parent_precedence
+    # Equal precedence means the same operator. Nested `not` and chains of binary nodes read the same
+    # without parentheses, but nested n-ary nodes would be merged into one node when parsed.
+    return isinstance(operand, NaryOp) or isinstance(parent, NaryOp)
+
+
+def _precedence(expr: Expr) -> int:
+    match expr:
+        case UnaryOp():
+            return _NOT_TOKEN.precedence
+        case BinaryOp(kind) | NaryOp(kind=kind):
+            return _OPERATOR_TOKENS[kind].precedence
+        case _:
+            return _ATOM_PRECEDENCE
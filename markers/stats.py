@@ -0,0 +1,54 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Generator
+
+
+@dataclass
+class Stats:
+    """Instrumentation counters collected while lexing, parsing, and evaluating.
+
+    A Stats object is opt-in. Components only record into it when one is passed in, so leaving
+    instrumentation compiled in costs a single `is None` check per call when it is disabled.
+    """
+
+    lex_seconds: float = 0.0
+    parse_seconds: float = 0.0
+    eval_seconds: float = 0.0
+    node_visits: int = 0
+    short_circuits: int = 0
+    var_lookups: Counter[str] = field(default_factory=Counter)
+
+    @contextmanager
+    def timer(self, phase: str) -> Generator[None, None, None]:
+        """Accumulate the wall time of a block into the given phase.
+
+        Args:
+            phase (str): The phase name, one of "lex", "parse", or "eval".
+
+        Yields:
+            None: Control to the timed block.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            attr = f"{phase}_seconds"
+            setattr(self, attr, getattr(self, attr) + elapsed)
+
+    def to_dict(self) -> dict[str, object]:
+        """Return the stats as a plain dictionary.
+
+        Returns:
+            dict[str, object]: The stats keyed by name.
+        """
+        return {
+            "lex_seconds": self.lex_seconds,
+            "parse_seconds": self.parse_seconds,
+            "eval_seconds": self.eval_seconds,
+            "node_visits": self.node_visits,
+            "short_circuits": self.short_circuits,
+            "var_lookups": dict(self.var_lookups),
+        }
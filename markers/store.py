@@ -0,0 +1,334 @@
+import mmap
+import os
+import tempfile
+from array import array
+from pathlib import Path
+from types import TracebackType
+from typing import Iterable, Iterator, Optional, Union
+
+from markers.definitions import DefinitionGraph
+from markers.error import EvaluateError, InternalError
+from markers.expressions import BinaryOp, BinaryOpKind, Definition, Expr, Lit, NaryOp, UnaryOp, UnaryOpKind, Var
+from markers.type import Env, PositionInfo
+
+_MAGIC = 0x4D4B5253
+_VERSION = 3
+_HEADER_WORDS = 5
+_INDEX_WORDS = 3
+_WORD_SIZE = 4
+
+# Each instruction is one word, with the opcode in the low bits and its argument in the rest
+_OP_BITS = 3
+_OP_MASK = (1 << _OP_BITS) - 1
+_MAX_ARG = (1 << (32 - _OP_BITS)) - 1
+_OP_VAR = 0
+_OP_LIT = 1
+_OP_NOT = 2
+# Jumps between the operands of a chain, forward by their argument if the value on top of the stack
+# decides the chain, which keeps it as the value of the chain, and otherwise pop it
+_OP_AND = 3
+_OP_OR = 4
+# Reference to another formula of the store, by index
+_OP_REF = 5
+
+
+class FormulaStore:
+    """Read-only view of compiled formulas in a memory-mapped store file.
+
+    Formulas are compiled once by `build_store` into stack bytecode over an interned string table,
+    with jumps that short-circuit `and` and `or` like the Evaluator and references to other formulas
+    compiled to calls, and are evaluated straight from the mapping,
+    so attaching to a store does no parsing and every process that maps the same file shares one copy
+    of it in the page cache. Stores are replaced atomically, and `reload` switches an open store to
+    the latest version. Evaluation only reads the mapping, so threads can share a store, but `reload`
+    and `close` must not run concurrently with evaluation.
+
+    The file layout is a sequence of native-endian 32-bit words followed by a padded UTF-8 string
+    blob:
+
+    - header: magic, version, formula count, string count, code length
+    - index: (name string, code start, code end) per formula, sorted by name
+    - string offsets: byte offset of each string in the blob, plus the end offset
+    - code: instructions of every formula
+    """
+
+    __slots__ = ("_blob_start", "_mmap", "_num_formulas", "_path", "_stat", "_strings", "_strings_start", "_words")
+
+    def __init__(self, path: Path):
+        """Initialize a FormulaStore by mapping a store file.
+
+        Args:
+            path (Path): The path to the store file.
+
+        Raises:
+            InternalError: If the file is not a store.
+        """
+        self._path = path
+        self._strings: dict[int, str] = {}
+        self._attach()
+
+    def _attach(self) -> None:
+        with self._path.open("rb") as file:
+            self._stat = os.fstat(file.fileno())
+            if self._stat.st_size < _HEADER_WORDS * _WORD_SIZE:
+                msg = f"Not a formula store: {self._path}"
+                raise InternalError(msg)
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._words = memoryview(self._mmap).cast("I")
+        magic, version, num_formulas, num_strings, code_len = self._words[:_HEADER_WORDS]
+        if magic != _MAGIC or version != _VERSION:
+            self.close()
+            msg = f"Not a formula store: {self._path}"
+            raise InternalError(msg)
+        self._num_formulas = num_formulas
+        self._strings_start = _HEADER_WORDS + _INDEX_WORDS * num_formulas
+        self._blob_start = (self._strings_start + num_strings + 1 + code_len) * _WORD_SIZE
+
+    def close(self) -> None:
+        """Unmap the store file."""
+        self._words.release()
+        self._mmap.close()
+        self._strings.clear()
+
+    def reload(self) -> bool:
+        """Switch to the latest version of the store file if it was replaced.
+
+        Returns:
+            bool: Whether a new version was mapped.
+        """
+        stat = self._path.stat()
+        if (stat.st_ino, stat.st_mtime_ns) == (self._stat.st_ino, self._stat.st_mtime_ns):
+            return False
+        self.close()
+        self._attach()
+        return True
+
+    def __enter__(self) -> "FormulaStore":
+        """Return the store."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        """Unmap the store file."""
+        self.close()
+
+    def __len__(self) -> int:
+        """Return the number of formulas."""
+        return self._num_formulas
+
+    def __contains__(self, name: str) -> bool:
+        """Return whether the store has a formula."""
+        return self._find(name) is not None
+
+    def names(self) -> Iterator[str]:
+        """Iterate over the formula names in sorted order.
+
+        Yields:
+            str: The next formula name.
+        """
+        for idx in range(self._num_formulas):
+            yield self._string(self._words[_HEADER_WORDS + _INDEX_WORDS * idx])
+
+    def evaluate(self, name: str, env: Env) -> bool:
+        """Evaluate a formula, short-circuiting like the Evaluator.
+
+        Only the variables and referenced formulas that decide the result are read, and each referenced
+        formula is evaluated at most once.
+
+        Args:
+            name (str): The formula name.
+            env (Env): The environment with variable assignments.
+
+        Raises:
+            KeyError: If the store has no formula with the name.
+            EvaluateError: If a variable that is read is unknown.
+
+        Returns:
+            bool: Whether the formula evaluates to true.
+        """
+        idx = self._find(name)
+        if idx is None:
+            raise KeyError(name)
+        words = self._words
+        values: dict[int, bool] = {}
+        # Frames of formulas being evaluated, as (formula index, next instruction, operand stack)
+        frames: list[tuple[int, int, list[bool]]] = [(idx, words[self._entry(idx) + 1], [])]
+        while frames:
+            formula, pc, stack = frames.pop()
+            end = words[self._entry(formula) + 2]
+            while pc < end:
+                word = words[pc]
+                op, arg = word & _OP_MASK, word >> _OP_BITS
+                if op == _OP_VAR:
+                    var = self._string(arg)
+                    if var not in env:
+                        formula_name = self._string(words[self._entry(formula)])
+                        msg = f'Unknown variable: "{var}" in formula "{formula_name}"'
+                        raise EvaluateError(msg, PositionInfo(0, 0, 0))
+                    stack.append(env[var])
+                elif op == _OP_LIT:
+                    stack.append(bool(arg))
+                elif op == _OP_NOT:
+                    stack[-1] = not stack[-1]
+                elif op == _OP_REF:
+                    value = values.get(arg)
+                    if value is None:
+                        # Evaluate the referenced formula first, then resume at this instruction
+                        frames.append((formula, pc, stack))
+                        frames.append((arg, words[self._entry(arg) + 1], []))
+                        break
+                    stack.append(value)
+                elif stack[-1] == (op == _OP_OR):
+                    pc += arg
+                else:
+                    stack.pop()
+                pc += 1
+            else:
+                values[formula] = stack[0]
+        return values[idx]
+
+    @staticmethod
+    def _entry(idx: int) -> int:
+        return _HEADER_WORDS + _INDEX_WORDS * idx
+
+    def _find(self, name: str) -> Optional[int]:
+        # Binary search the sorted index, comparing encoded names in the mapping
+        key = name.encode()
+        words = self._words
+        lo, hi = 0, self._num_formulas
+        while lo < hi:
+            mid = (lo + hi) // 2
+            candidate = self._string_bytes(words[_HEADER_WORDS + _INDEX_WORDS * mid])
+            if candidate == key:
+                return mid
+            if candidate < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def _string(self, string_id: int) -> str:
+        string = self._strings.get(string_id)
+        if string is None:
+            string = self._strings[string_id] = self._string_bytes(string_id).decode()
+        return string
+
+    def _string_bytes(self, string_id: int) -> bytes:
+        start = self._words[self._strings_start + string_id]
+        end = self._words[self._strings_start + string_id + 1]
+        return self._mmap[self._blob_start + start : self._blob_start + end]
+
+
+def build_store(path: Path, definitions: Iterable[Definition]) -> None:
+    """Compile definitions into a store file, atomically replacing any previous version.
+
+    Definitions are resolved like in a DefinitionGraph: a variable named after another definition
+    refers to that definition, and is compiled to a call so that shared definitions are stored once.
+    The store is written to a temporary file next to the destination and renamed over it, so
+    processes that have the previous version mapped keep reading it until they reload.
+
+    Args:
+        path (Path): The path to the store file.
+        definitions (Iterable[Definition]): The named formulas.
+
+    Raises:
+        DefinitionError: If two definitions have the same name or reference each other cyclically.
+        InternalError: If an expression is invalid.
+    """
+    graph = DefinitionGraph.build(definitions)
+    names = sorted(graph.definitions, key=str.encode)
+    indexes = {name: idx for idx, name in enumerate(names)}
+    strings: dict[str, int] = {}
+    code = array("I")
+    entries: dict[str, tuple[int, int]] = {}
+    for name in graph.order:
+        start = len(code)
+        _compile(graph.definitions[name].expr, code, strings, indexes)
+        entries[name] = (start, len(code))
+        _intern(name, strings)
+
+    strings_start = _HEADER_WORDS + _INDEX_WORDS * len(names)
+    code_start = strings_start + len(strings) + 1
+    words = array("I", [_MAGIC, _VERSION, len(names), len(strings), len(code)])
+    for name in names:
+        start, end = entries[name]
+        words.extend([strings[name], code_start + start, code_start + end])
+
+    blob = bytearray()
+    for string in strings:
+        words.append(len(blob))
+        blob.extend(string.encode())
+    words.append(len(blob))
+    words.extend(code)
+    # Pad the blob so the file is a whole number of words and can be mapped as one word array
+    blob.extend(bytes(-len(blob) % _WORD_SIZE))
+
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{path.name}.", delete=False) as file:
+        try:
+            file.write(words.tobytes())
+            file.write(blob)
+            file.flush()
+            os.fsync(file.fileno())
+        except BaseException:
+            Path(file.name).unlink()
+            raise
+    Path(file.name).replace(path)
+
+
+def _intern(string: str, strings: dict[str, int]) -> int:
+    string_id = strings.get(string)
+    if string_id is None:
+        string_id = strings[string] = len(strings)
+    return string_id
+
+
+def _compile(expr: Expr, code: "array[int]", strings: dict[str, int], indexes: dict[str, int]) -> None:
+    # Work items are nodes to compile, a NOT to emit, a jump to emit with the jumps of its chain, or the
+    # jumps of a chain to point past its last operand once that is compiled
+    stack: list[Union[Expr, int, tuple[int, list[int]], list[int]]] = [expr]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, int):
+            code.append(_instruction(item, 0))
+            continue
+        if isinstance(item, tuple):
+            # Jumps are emitted with a zero offset and patched at the end of their chain
+            op, jumps = item
+            jumps.append(len(code))
+            code.append(_instruction(op, 0))
+            continue
+        if isinstance(item, list):
+            for jump in item:
+                code[jump] = _instruction(code[jump] & _OP_MASK, len(code) - jump - 1)
+            continue
+        match item:
+            case Var(name) if name in indexes:
+                code.append(_instruction(_OP_REF, indexes[name]))
+            case Var(name):
+                code.append(_instruction(_OP_VAR, _intern(name, strings)))
+            case Lit(val):
+                code.append(_instruction(_OP_LIT, int(val)))
+            case UnaryOp(UnaryOpKind.NOT, arg):
+                stack.extend((_OP_NOT, arg))
+            case BinaryOp(BinaryOpKind.AND | BinaryOpKind.OR) | NaryOp():
+                op = _OP_AND if item.kind == BinaryOpKind.AND else _OP_OR
+                children = item.children()
+                chain_jumps: list[int] = []
+                stack.append(chain_jumps)
+                for child in reversed(children[1:]):
+                    stack.extend((child, (op, chain_jumps)))
+                stack.append(children[0])
+            case other:
+                msg = f"Store is not implemented for expression type: {type(other)}"
+                raise InternalError(msg)
+
+
+def _instruction(op: int, arg: int) -> int:
+    if arg > _MAX_ARG:
+        msg = f"Store instruction argument is too large: {arg}"
+        raise InternalError(msg)
+    return op | (arg << _OP_BITS)
@@ -133,6 +133,20 @@ class RightParenToken(Token):
         return ")"
 
 
+@dataclass
+class AssignToken(Token):
+    """Definition assignment token."""
+
+    @property
+    def precedence(self) -> int:
+        """Return the precedence of the token."""
+        return 7
+
+    def __str__(self) -> str:
+        """Return the string representation of the token."""
+        return "="
+
+
 @dataclass
 class EofToken(Token):
     """End of file token."""
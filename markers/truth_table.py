@@ -0,0 +1,168 @@
+from dataclasses import dataclass
+from typing import Iterator
+
+from markers.error import InternalError
+from markers.expressions import And, BinaryOp, BinaryOpKind, Expr, Lit, Or, UnaryOp, UnaryOpKind, Var, walk
+
+_LIT = 0
+_VAR = 1
+_NOT = 2
+_AND = 3
+_OR = 4
+
+
+@dataclass
+class TableRow:
+    """Row of a truth table."""
+
+    values: tuple[bool, ...]
+    result: bool
+
+
+class IncrementalEvaluator:
+    """Evaluator that keeps the value of every subexpression and updates them as variables flip.
+
+    The expression is flattened into arrays indexed by node, with parent pointers, and AND/OR nodes
+    count their true operands. Flipping a variable walks up from each of its occurrences and stops
+    as soon as a subexpression keeps its value, so each flip only revisits the affected nodes.
+    All variables start out false.
+    """
+
+    __slots__ = ("_counts", "_kinds", "_occurrences", "_parents", "_sizes", "_values", "assignment", "names")
+
+    def __init__(self, expr: Expr):
+        """Initialize an IncrementalEvaluator.
+
+        Args:
+            expr (Expr): The AST expression node to evaluate.
+
+        Raises:
+            InternalError: If the expression is invalid.
+        """
+        self.names = list(dict.fromkeys(node.name for node in walk(expr) if isinstance(node, Var)))
+        self.assignment = [False] * len(self.names)
+        slots = {name: slot for slot, name in enumerate(self.names)}
+
+        self._kinds: list[int] = []
+        self._parents: list[int] = []
+        self._sizes: list[int] = []
+        self._values: list[bool] = []
+        self._counts: list[int] = []
+        self._occurrences: list[list[int]] = [[] for _ in self.names]
+
+        # Number the nodes in preorder, so every child has a larger index than its parent
+        stack: list[tuple[Expr, int]] = [(expr, -1)]
+        while stack:
+            node, parent = stack.pop()
+            idx = len(self._kinds)
+            self._parents.append(parent)
+            self._values.append(False)
+            self._counts.append(0)
+            children = node.children()
+            self._sizes.append(len(children))
+            self._kinds.append(_kind(node))
+            match node:
+                case Lit(val):
+                    self._values[idx] = val
+                case Var(name):
+                    self._occurrences[slots[name]].append(idx)
+            stack.extend((child, idx) for child in reversed(children))
+
+        for idx in reversed(range(len(self._kinds))):
+            self._values[idx] = self._compute(idx)
+            parent = self._parents[idx]
+            if parent != -1 and self._values[idx]:
+                self._counts[parent] += 1
+
+    @property
+    def result(self) -> bool:
+        """Return the value of the whole expression."""
+        return self._values[0]
+
+    def flip(self, slot: int) -> bool:
+        """Negate the value of one variable and update the affected subexpressions.
+
+        Args:
+            slot (int): The index of the variable in `names`.
+
+        Returns:
+            bool: The new value of the whole expression.
+        """
+        value = not self.assignment[slot]
+        self.assignment[slot] = value
+        values, parents, counts = self._values, self._parents, self._counts
+        for leaf in self._occurrences[slot]:
+            values[leaf] = value
+            node = leaf
+            parent = parents[node]
+            while parent != -1:
+                if self._kinds[parent] != _NOT:
+                    counts[parent] += 1 if values[node] else -1
+                parent_value = self._compute(parent)
+                if parent_value == values[parent]:
+                    break
+                values[parent] = parent_value
+                node = parent
+                parent = parents[node]
+        return values[0]
+
+    def iter_gray_code(self) -> Iterator[TableRow]:
+        """Iterate over every assignment in Gray code order, starting from the current one.
+
+        Consecutive rows differ in exactly one variable, and each row only re-evaluates the
+        subexpressions that depend on it. Rows are generated lazily, so memory use does not grow
+        with the number of rows. The last variable changes most often.
+
+        Yields:
+            TableRow: The variable values, in the order of `names`, and the result of each row.
+        """
+        assignment = self.assignment
+        num_vars = len(assignment)
+        yield TableRow(tuple(assignment), self.result)
+        for row in range(1, 1 << num_vars):
+            # The Gray codes of consecutive rows differ in the lowest set bit of the row number
+            bit = (row & -row).bit_length() - 1
+            result = self.flip(num_vars - 1 - bit)
+            yield TableRow(tuple(assignment), result)
+
+    def _compute(self, idx: int) -> bool:
+        kind = self._kinds[idx]
+        if kind == _AND:
+            return self._counts[idx] == self._sizes[idx]
+        if kind == _OR:
+            return self._counts[idx] > 0
+        if kind == _NOT:
+            return not self._values[idx + 1]
+        return self._values[idx]
+
+
+def iter_truth_table(expr: Expr) -> Iterator[TableRow]:
+    """Iterate over the truth table of an expression in Gray code order.
+
+    Args:
+        expr (Expr): The AST expression node.
+
+    Raises:
+        InternalError: If the expression is invalid.
+
+    Yields:
+        TableRow: The variable values, in order of first occurrence, and the result of each row.
+    """
+    return IncrementalEvaluator(expr).iter_gray_code()
+
+
+def _kind(node: Expr) -> int:
+    match node:
+        case Lit():
+            return _LIT
+        case Var():
+            return _VAR
+        case UnaryOp(UnaryOpKind.NOT):
+            return _NOT
+        case And() | BinaryOp(BinaryOpKind.AND):
+            return _AND
+        case Or() | BinaryOp(BinaryOpKind.OR):
+            return _OR
+        case other:
+            msg = f"Truth table is not implemented for expression type: {type(other)}"
+            raise InternalError(msg)
@@ -1,16 +1,193 @@
-from dataclasses import dataclass
+from bisect import bisect_right
 from enum import StrEnum, auto
+from mmap import mmap
+from typing import Awaitable, Callable, Mapping, Optional, Sequence, Union
 
-Env = dict[str, bool]
+Source = Union[str, bytes, mmap]
+Env = Mapping[str, bool]
+Provider = Callable[[str], bool]
+AsyncProvider = Callable[[str], Awaitable[bool]]
+SlotValues = Union[Sequence[bool], bytes, bytearray]
+
+
+class LineIndex:
+    """Index of line start offsets in a program, built lazily on first lookup.
+
+    The program is either text, where offsets count characters, or a UTF-8 encoded buffer, where
+    offsets count bytes and columns are computed by decoding only the line prefix.
+    """
+
+    __slots__ = ("_starts", "first_line", "text")
+
+    def __init__(self, text: Source, first_line: int = 1):
+        """Initialize a LineIndex.
+
+        Args:
+            text (Source): The program text or UTF-8 encoded buffer.
+            first_line (int): The line number of the first line of the text.
+        """
+        self.text = text
+        self.first_line = first_line
+        self._starts: Optional[list[int]] = None
+
+    def reset(self, text: Source) -> None:
+        """Point the index at a new version of the program.
+
+        Args:
+            text (Source): The new program text or UTF-8 encoded buffer.
+        """
+        self.text = text
+        self._starts = None
+
+    def detach(self) -> None:
+        """Copy a buffer the index does not own, such as a memory map, into owned memory.
+
+        Positions compute their line and column through the index when first read, so until then
+        they keep the buffer alive and fail once it is closed. Detaching lets them outlive it.
+        """
+        if isinstance(self.text, (str, bytes)):
+            return
+        self.text = bytes(self.text)
+
+    def _line_starts(self) -> list[int]:
+        if self._starts is None:
+            starts = [0]
+            text = self.text
+            newline = "\n" if isinstance(text, str) else b"\n"
+            idx = text.find(newline)  # type: ignore[arg-type]
+            while idx != -1:
+                starts.append(idx + 1)
+                idx = text.find(newline, idx + 1)  # type: ignore[arg-type]
+            self._starts = starts
+        return self._starts
+
+    def location(self, offset: int) -> tuple[int, int]:
+        """Return the one-based line and column of an offset.
+
+        Args:
+            offset (int): The zero-based offset.
+
+        Returns:
+            tuple[int, int]: The line number and column number.
+        """
+        starts = self._line_starts()
+        line_idx = bisect_right(starts, offset) - 1
+        start = starts[line_idx]
+        if isinstance(self.text, str):
+            return line_idx + self.first_line, offset - start + 1
+        prefix = self.text[start:offset].decode("utf-8", "replace")
+        return line_idx + self.first_line, len(prefix) + 1
+
+    def line(self, line_no: int) -> str:
+        """Return the text of a line, without its newline.
+
+        Args:
+            line_no (int): The one-based line number.
+
+        Returns:
+            str: The line text.
+        """
+        starts = self._line_starts()
+        line_idx = line_no - self.first_line
+        start = starts[line_idx]
+        end = starts[line_idx + 1] - 1 if line_idx + 1 < len(starts) else len(self.text)
+        line = self.text[start:end]
+        if isinstance(line, str):
+            return line
+        return line.decode("utf-8", "replace")
 
 
-@dataclass
 class PositionInfo:
-    """Position information in a program."""
+    """Position information in a program.
+
+    Positions created by the lexer only store a character offset and defer computing the line and
+    column until they are read, which is usually only when an error is rendered. Positions are
+    read-only and resolving them is idempotent, so they are safe to share across threads.
+    """
+
+    __slots__ = ("_char_no", "_index", "_length", "_line_no", "_offset")
+
+    def __init__(
+        self,
+        line_no: int,
+        char_no: int,
+        length: int,
+        *,
+        offset: Optional[int] = None,
+        index: Optional[LineIndex] = None,
+    ):
+        """Initialize a PositionInfo.
+
+        Args:
+            line_no (int): The one-based line number.
+            char_no (int): The one-based column number.
+            length (int): The length of the span in characters.
+            offset (Optional[int]): The zero-based character offset of the span, if known.
+            index (Optional[LineIndex]): The line index to compute the line and column from lazily.
+        """
+        self._line_no = line_no
+        self._char_no = char_no
+        self._length = length
+        self._offset = offset
+        self._index = index
+
+    @classmethod
+    def at(cls, index: LineIndex, offset: int, length: int) -> "PositionInfo":
+        """Create a position whose line and column are computed on demand.
+
+        Args:
+            index (LineIndex): The line index of the program.
+            offset (int): The zero-based character offset of the span.
+            length (int): The length of the span in characters.
+
+        Returns:
+            PositionInfo: The position.
+        """
+        return cls(0, 0, length, offset=offset, index=index)
+
+    def _resolve(self) -> None:
+        index = self._index
+        if index is not None:
+            assert self._offset is not None
+            # The index is cleared last, so a concurrent reader either resolves again or sees both values
+            self._line_no, self._char_no = index.location(self._offset)
+            self._index = None
+
+    @property
+    def length(self) -> int:
+        """Return the length of the span in characters."""
+        return self._length
+
+    @property
+    def offset(self) -> Optional[int]:
+        """Return the zero-based character offset of the span, if known."""
+        return self._offset
+
+    @property
+    def line_no(self) -> int:
+        """Return the one-based line number."""
+        self._resolve()
+        return self._line_no
+
+    @property
+    def char_no(self) -> int:
+        """Return the one-based column number."""
+        self._resolve()
+        return self._char_no
+
+    def __eq__(self, other: object) -> bool:
+        """Return whether two positions refer to the same span."""
+        if not isinstance(other, PositionInfo):
+            return NotImplemented
+        return (self.line_no, self.char_no, self.length) == (other.line_no, other.char_no, other.length)
+
+    def __hash__(self) -> int:
+        """Return the hash of the position."""
+        return hash((self.line_no, self.char_no, self.length))
 
-    line_no: int
-    char_no: int
-    length: int
+    def __repr__(self) -> str:
+        """Return the representation of the position."""
+        return f"PositionInfo(line_no={self.line_no}, char_no={self.char_no}, length={self.length})"
 
 
 class Associativity(StrEnum):
@@ -0,0 +1,7 @@
+from markers.expressions import Expr
+from markers.lexer import Lexer
+from markers.parser import Parser
+
+
+def parse(program: str) -> Expr:
+    return Parser(Lexer.tokenize(program)).parse()
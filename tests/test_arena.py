@@ -0,0 +1,90 @@
+import itertools
+
+import pytest
+from markers import Evaluator
+from markers.arena import ArenaParser, NodeView
+from markers.error import EvaluateError, ParseError
+from markers.lexer import Lexer
+from markers.parser import Parser
+from markers.type import LineIndex, PositionInfo
+
+
+def parse_arena(program: str) -> ArenaParser:
+    return ArenaParser(Lexer.tokenize(program), index=LineIndex(program))
+
+
+class TestArena:
+    def test_parse_interns_names(self) -> None:
+        arena = parse_arena("a and (b or not a)").parse()
+        assert arena.names == ["a", "b"]
+        assert len(arena) == 6
+        assert [view.name for view in arena.view().walk() if view.kind == "var"] == ["a", "b", "a"]
+
+    @pytest.mark.parametrize(
+        "program",
+        ["a", "true", "not not a", "a and b or not c", "a or b or c and d", "not (a or b) and c", "(a) and (b)"],
+    )
+    def test_evaluate_matches_evaluator(self, program: str) -> None:
+        expr = Parser(Lexer.tokenize(program)).parse()
+        arena = parse_arena(program).parse()
+        for values in itertools.product([False, True], repeat=4):
+            env = dict(zip("abcd", values, strict=True))
+            assert arena.evaluate(env) == Evaluator().evaluate(expr, env)
+
+    @pytest.mark.parametrize(
+        "program",
+        [
+            "not a",
+            "a and b and c",
+            "a or b and not c or d",
+            "(true or false)",
+            "(a and b) and c",
+            "a and (b and c)",
+            "(a or b) or c or (d or a)",
+            "((a and b)) and c and (d and (a and b))",
+        ],
+    )
+    def test_to_string_matches_expressions(self, program: str) -> None:
+        expr = Parser(Lexer.tokenize(program)).parse()
+        assert str(parse_arena(program).parse()) == str(expr)
+
+    def test_evaluate_short_circuits(self) -> None:
+        arena = parse_arena("a or b and missing").parse()
+        assert arena.evaluate({"a": True}) is True
+        assert arena.evaluate({"a": False, "b": False}) is False
+
+    def test_evaluate_reports_unknown_variable_position(self) -> None:
+        arena = parse_arena("a and\n  b").parse()
+        with pytest.raises(EvaluateError, match='Unknown variable: "b"') as exc:
+            arena.evaluate({"a": True})
+        assert exc.value.pos == PositionInfo(2, 3, 1)
+
+    @pytest.mark.parametrize("program", ["", "a and", "(a or b", "a b", "a and )", "1x"])
+    def test_parse_errors_match_parser(self, program: str) -> None:
+        with pytest.raises(ParseError) as expected:
+            Parser(Lexer.tokenize(program)).parse()
+        with pytest.raises(ParseError) as actual:
+            parse_arena(program).parse()
+        assert (actual.value.message, actual.value.pos) == (expected.value.message, expected.value.pos)
+
+    def test_deep_chain_does_not_recurse(self) -> None:
+        program = " and ".join(f"v{idx}" for idx in range(5000))
+        arena = parse_arena(program).parse()
+        env = {f"v{idx}": True for idx in range(5000)}
+        assert arena.evaluate(env) is True
+        assert str(arena) == f"({program})"
+
+    def test_node_views(self) -> None:
+        arena = parse_arena("not a or true").parse()
+        root = arena.view()
+        assert root.kind == "or"
+        assert root.pos == PositionInfo(1, 7, 2)
+        left, right = root.children()
+        assert left.kind == "not"
+        assert str(left) == "(not a)"
+        assert left.evaluate({"a": False}) is True
+        assert right.value is True
+        assert left.children()[0].name == "a"
+        assert root == NodeView(arena, arena.root)
+        with pytest.raises(TypeError, match="is not a variable"):
+            _ = root.name
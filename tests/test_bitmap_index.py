@@ -0,0 +1,85 @@
+import random
+from pathlib import Path
+
+import pytest
+from markers import Evaluator
+from markers.bitmap_index import CHUNK_ROWS, BitmapIndex
+from markers.error import EvaluateError, InternalError
+from markers.expressions import Expr
+from markers.type import Env, PositionInfo
+
+from tests.conftest import parse
+
+
+def expected_ids(expr: Expr, envs: list[Env]) -> list[int]:
+    return [row for row, env in enumerate(envs) if Evaluator().evaluate(expr, {"a": False, "b": False, **env})]
+
+
+def random_envs(num_rows: int, seed: int) -> list[Env]:
+    rng = random.Random(seed)
+    # "a" is dense and "b" is sparse, so chunks get both bitmap and array containers
+    return [{"a": rng.random() < 0.5, "b": rng.random() < 0.01} for _ in range(num_rows)]
+
+
+class TestBitmapIndex:
+    @pytest.mark.parametrize("program", ["a", "not a", "a and b", "a or b", "not (a or b)", "a and not b or true"])
+    def test_query_matches_evaluator(self, program: str) -> None:
+        envs = random_envs(CHUNK_ROWS + 1000, seed=0)
+        index = BitmapIndex()
+        index.append(envs)
+        expr = parse(program)
+        ids = expected_ids(expr, envs)
+        assert list(index.iter_ids(expr)) == ids
+        assert index.count(expr) == len(ids)
+
+    def test_missing_variables_are_false(self) -> None:
+        index = BitmapIndex()
+        index.append([{"a": True}, {"b": True}, {}])
+        assert list(index.iter_ids(parse("not a"))) == [1, 2]
+        assert index.names == ["a", "b"]
+
+    def test_unknown_variable_raises_evaluate_error(self) -> None:
+        index = BitmapIndex()
+        index.append([{"a": True}])
+        with pytest.raises(EvaluateError, match='Unknown variable: "c"') as exc:
+            index.count(parse("a or c"))
+        assert exc.value.pos == PositionInfo(1, 6, 1)
+
+    def test_append_fills_partial_chunk(self) -> None:
+        envs = random_envs(3 * CHUNK_ROWS // 2, seed=1)
+        index = BitmapIndex()
+        for start in range(0, len(envs), 40_000):
+            index.append(envs[start : start + 40_000])
+        assert len(index) == len(envs)
+        expr = parse("a and not b")
+        assert list(index.iter_ids(expr)) == expected_ids(expr, envs)
+
+    def test_persists_and_appends(self, tmp_path: Path) -> None:
+        path = tmp_path / "users.index"
+        envs = random_envs(CHUNK_ROWS + 10, seed=2)
+        BitmapIndex(path).append(envs[:100])
+        index = BitmapIndex(path)
+        assert len(index) == 100
+        index.append(envs[100:])
+        index.append([{"c": True}])
+
+        reloaded = BitmapIndex(path)
+        assert len(reloaded) == len(envs) + 1
+        assert reloaded.names == ["a", "b", "c"]
+        expr = parse("a or b")
+        assert list(reloaded.iter_ids(expr)) == expected_ids(expr, envs)
+        assert list(reloaded.iter_ids(parse("c"))) == [len(envs)]
+
+    def test_append_bitmaps(self) -> None:
+        index = BitmapIndex()
+        index.append([{"a": True}])
+        index.append_bitmaps(10, {"a": bytes([0b0000_0101, 0b10]), "b": bytes(2)})
+        assert list(index.iter_ids(parse("a"))) == [0, 1, 3, 10]
+        with pytest.raises(InternalError, match='Expected 2 bitmap bytes for "a", found 1'):
+            index.append_bitmaps(9, {"a": bytes(1)})
+
+    def test_rejects_other_files(self, tmp_path: Path) -> None:
+        path = tmp_path / "other"
+        path.write_bytes(b"not an index")
+        with pytest.raises(InternalError, match="Not a bitmap index"):
+            BitmapIndex(path)
@@ -0,0 +1,78 @@
+import itertools
+
+import pytest
+from markers import Evaluator
+from markers.cache import ResultCache
+from markers.error import EvaluateError, InternalError
+from markers.type import PositionInfo
+
+from tests.conftest import parse
+
+
+class TestResultCache:
+    def test_evaluate_traced_records_decisive_reads(self) -> None:
+        expr = parse("a and b or c")
+        result = Evaluator().evaluate_traced(expr, {"a": False, "b": True, "c": True, "d": False})
+        assert result.value is True
+        assert result.reads == (("a", False), ("c", True))
+
+    def test_evaluate_traced_records_repeated_variable_once(self) -> None:
+        result = Evaluator().evaluate_traced(parse("a and (not a or b)"), {"a": True, "b": False})
+        assert result.reads == (("a", True), ("b", False))
+
+    def test_hits_on_environments_that_agree_on_decisive_variables(self) -> None:
+        cache = ResultCache(parse("a and b or c"))
+        assert cache.evaluate({"a": False, "b": True, "c": True, "x": True}) is True
+        assert cache.evaluate({"a": False, "b": False, "c": True, "x": False}) is True
+        assert cache.evaluate({"a": True, "b": True, "c": False}) is True
+        assert (cache.stats.hits, cache.stats.misses) == (1, 2)
+        assert cache.stats.hit_rate == pytest.approx(1 / 3)
+        assert len(cache) == 2
+
+    def test_matches_evaluator_for_every_assignment(self) -> None:
+        expr = parse("(a or not b) and (c or d and not a) or false")
+        cache = ResultCache(expr)
+        for _ in range(2):
+            for values in itertools.product([False, True], repeat=4):
+                env = dict(zip("abcd", values, strict=True))
+                assert cache.evaluate(env) == Evaluator().evaluate(expr, env)
+        assert cache.stats.misses == len(cache)
+        assert cache.stats.hits == 32 - len(cache)
+
+    def test_constant_expression_is_cached_without_reads(self) -> None:
+        cache = ResultCache(parse("true or a"))
+        assert cache.evaluate({}) is True
+        assert cache.evaluate({"a": False}) is True
+        assert cache.stats.hits == 1
+
+    def test_evicts_least_recently_used(self) -> None:
+        cache = ResultCache(parse("a and b"), max_entries=2)
+        cache.evaluate({"a": False})
+        cache.evaluate({"a": True, "b": False})
+        cache.evaluate({"a": False})
+        cache.evaluate({"a": True, "b": True})
+        assert cache.stats.evictions == 1
+        assert len(cache) == 2
+        cache.evaluate({"a": False})
+        assert cache.stats.hits == 2
+        cache.evaluate({"a": True, "b": False})
+        assert cache.stats.misses == 4
+
+    def test_evicting_last_entry_empties_trie(self) -> None:
+        cache = ResultCache(parse("a and b"), max_entries=1)
+        cache.evaluate({"a": True, "b": True})
+        cache.evaluate({"a": False})
+        assert len(cache) == 1
+        cache.evaluate({"a": False})
+        assert cache.stats.hits == 1
+
+    def test_unknown_variable_raises_evaluate_error(self) -> None:
+        cache = ResultCache(parse("a or b"))
+        cache.evaluate({"a": False, "b": True})
+        with pytest.raises(EvaluateError, match='Unknown variable: "b"') as exc:
+            cache.evaluate({"a": False})
+        assert exc.value.pos == PositionInfo(1, 6, 1)
+
+    def test_rejects_non_positive_size(self) -> None:
+        with pytest.raises(InternalError, match="must be positive"):
+            ResultCache(parse("a"), max_entries=0)
@@ -0,0 +1,63 @@
+import pytest
+from markers.canonical import Deduplicator, canonicalize, structural_hash
+from markers.expressions import And, Or, UnaryOp, UnaryOpKind, Var, walk
+from markers.normal_form import to_cnf
+
+from tests.conftest import parse
+
+
+class TestCanonical:
+    @pytest.mark.parametrize(
+        ("program_a", "program_b"),
+        [
+            ("b and a", "(a and b)"),
+            ("a and (b and c)", "(c and b) and a"),
+            ("a or b and c", "c and b or a"),
+            ("not (a or not b)", "b and not a"),
+            ("not not a", "a"),
+            ("a or a", "a"),
+            ("not (a and b)", "not a or not b"),
+            ("not true", "false"),
+        ],
+    )
+    def test_equivalent_forms_have_the_same_hash(self, program_a: str, program_b: str) -> None:
+        expr_a, expr_b = parse(program_a), parse(program_b)
+        assert canonicalize(expr_a) == canonicalize(expr_b)
+        assert structural_hash(expr_a) == structural_hash(expr_b)
+
+    @pytest.mark.parametrize(
+        ("program_a", "program_b"),
+        [("a and b", "a or b"), ("a and not b", "not a and b"), ("a", "true"), ("(a and b) or c", "a and (b or c)")],
+    )
+    def test_different_formulas_have_different_hashes(self, program_a: str, program_b: str) -> None:
+        assert structural_hash(parse(program_a)) != structural_hash(parse(program_b))
+
+    def test_hash_is_independent_of_position(self) -> None:
+        assert structural_hash(parse("a and b")) == structural_hash(parse("\n  a   and\n b"))
+
+    def test_hash_is_stable(self) -> None:
+        assert structural_hash(Var("a")) == "8e0bc514590316bc38011eefeef763d5"
+
+    def test_canonicalize_pushes_negations_to_variables(self) -> None:
+        expr = canonicalize(parse("not (a and (b or not c))"))
+        assert isinstance(expr, Or)
+        assert UnaryOp(UnaryOpKind.NOT, Var("a")) in expr.args
+        assert expr == canonicalize(parse("c and not b or not a"))
+        assert all(isinstance(node.arg, Var) for node in walk(expr) if isinstance(node, UnaryOp))
+
+    def test_canonicalize_shared_nodes(self) -> None:
+        a = Var("a")
+        shared = Or((a, Var("b")))
+        expr = And((shared, a, UnaryOp(UnaryOpKind.NOT, shared)))
+        assert canonicalize(And((Or((a, Var("b"))), a))) == canonicalize(parse("(a or b) and a"))
+        assert structural_hash(expr) == structural_hash(parse("(a or b) and a and not (a or b)"))
+
+    def test_canonical_output_converts_to_normal_form(self) -> None:
+        # Canonical forms share variable nodes, so consumers must handle repeated node objects
+        assert to_cnf(canonicalize(parse("a and (a or b)"))).clauses == [[1], [1, 2]]
+
+    def test_deduplicator(self) -> None:
+        deduplicator = Deduplicator()
+        programs = ["a and b", "b and a", "a or b", "(b) and (a)", "a or b or a"]
+        assert [deduplicator.add(parse(program)) for program in programs] == [True, False, True, False, False]
+        assert len(deduplicator.seen) == 2
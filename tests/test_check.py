@@ -0,0 +1,55 @@
+from pathlib import Path
+
+import pytest
+from markers.check import Checker, CheckError, check_program
+from markers.lexer import Lexer
+from markers.parser import Parser, RecoveringParser
+
+
+class TestCheck:
+    @pytest.mark.parametrize(
+        ("program", "expected"),
+        [
+            ("a and", [("Unexpected end of input", 1, 3)]),
+            ("a b and c", [('Unexpected token "b"', 1, 3)]),
+            ("(a b) or (c", [('Unexpected token "b"', 1, 4), ("Expected closing paren matching opening", 1, 10)]),
+            ("a and and b or 1x", [('Unexpected token "and"', 1, 7), ('Unexpected token "1x"', 1, 16)]),
+            ("a and (b or ) and c", [('Unexpected token ")"', 1, 13)]),
+        ],
+    )
+    def test_check_program_reports_every_error(self, program: str, expected: list[tuple[str, int, int]]) -> None:
+        errors = check_program(program)
+        assert [(error.message, error.pos.line_no, error.pos.char_no) for error in errors] == expected
+
+    def test_check_program_uses_first_line(self) -> None:
+        (error,) = check_program("a or", first_line=7)
+        assert (error.pos.line_no, error.pos.char_no) == (7, 3)
+
+    def test_recovering_parser_matches_parser_on_valid_programs(self) -> None:
+        program = "not (a or b) and c or d"
+        parser = RecoveringParser(Lexer.tokenize(program))
+        assert parser.parse() == Parser(Lexer.tokenize(program)).parse()
+        assert parser.errors == []
+
+    @pytest.mark.parametrize("jobs", [1, 2])
+    def test_checker_reports_invalid_formulas_in_order(self, jobs: int, tmp_path: Path) -> None:
+        first = tmp_path / "first.markers"
+        first.write_text("a and b\n\na and\nnot x\n(a b\n", encoding="utf-8")
+        second = tmp_path / "second.markers"
+        second.write_text("".join(f"v{idx} or\n" if idx % 3 == 0 else f"v{idx}\n" for idx in range(10)))
+
+        checker = Checker(jobs, batch_size=2)
+        results = list(checker.check([first, second]))
+        assert [(Path(result.path).name, result.line_no) for result in results] == [
+            ("first.markers", 3),
+            ("first.markers", 5),
+            ("second.markers", 1),
+            ("second.markers", 4),
+            ("second.markers", 7),
+            ("second.markers", 10),
+        ]
+        assert results[1].errors == [
+            CheckError('Unexpected token "b"', 5, 4, 1),
+            CheckError("Expected closing paren matching opening", 5, 1, 1),
+        ]
+        assert (checker.formulas, checker.invalid) == (14, 6)
@@ -1,6 +1,10 @@
+import json
+from pathlib import Path
+
 import pytest
 from click.testing import CliRunner
 from markers.cli import main
+from markers.store import FormulaStore
 
 
 @pytest.fixture(scope="session", name="cli_runner")
@@ -12,20 +16,33 @@ class TestCli:
     def test_parse(self, cli_runner: CliRunner) -> None:
         result = cli_runner.invoke(main, ["parse", "a and b"])
         assert result.exit_code == 0
-        expected = """BinaryOp(
+        expected = """And(
 │   pos=PositionInfo(line_no=1, char_no=3, length=3),
-│   kind=<BinaryOpKind.AND: 'and'>,
-│   left=Var(pos=PositionInfo(line_no=1, char_no=1, length=1), name='a'),
-│   right=Var(pos=PositionInfo(line_no=1, char_no=7, length=1), name='b')
+│   args=(
+│   │   Var(pos=PositionInfo(line_no=1, char_no=1, length=1), name='a'),
+│   │   Var(pos=PositionInfo(line_no=1, char_no=7, length=1), name='b')
+│   )
 )
 """
         assert result.output == expected
 
+    def test_parse_pretty(self, cli_runner: CliRunner) -> None:
+        result = cli_runner.invoke(main, ["parse", "(a or true) and not (b and (c and d))", "--pretty"])
+        assert result.exit_code == 0
+        assert result.output == "(a or true) and not (b and (c and d))\n"
+
     def test_eval(self, cli_runner: CliRunner) -> None:
         result = cli_runner.invoke(main, ["eval", "a and b or d", "-t", "a", "-t", "b", "-f", "d"])
         assert result.exit_code == 0
         assert result.output == "True\n"
 
+    def test_eval_stats(self, cli_runner: CliRunner) -> None:
+        result = cli_runner.invoke(main, ["eval", "a or b", "-t", "a", "-t", "b", "--stats"])
+        assert result.exit_code == 0
+        assert result.output.startswith("True\n")
+        assert "short circuits: 1\n" in result.output
+        assert "lookups a: 1\n" in result.output
+
     def test_eval_error(self, cli_runner: CliRunner) -> None:
         result = cli_runner.invoke(main, ["eval", "alice and bob and chris", "-t", "alice", "-t", "bob"])
         assert result.exit_code == 0
@@ -36,3 +53,100 @@ alice and bob and chris
 ------------------^^^^^
 """
         assert result.output == expected
+
+    def test_eval_error_on_later_line(self, cli_runner: CliRunner) -> None:
+        result = cli_runner.invoke(main, ["eval", "alice and\n  bob or\nchris", "-t", "alice"])
+        assert result.exit_code == 0
+        expected = """EvaluateError: Unknown variable: "bob"
+line 2, col 3
+
+  bob or
+--^^^
+"""
+        assert result.output == expected
+
+    def test_eval_file(self, cli_runner: CliRunner, tmp_path: Path) -> None:
+        path = tmp_path / "program.markers"
+        path.write_text("a and\n  (b or d)\n", encoding="utf-8")
+        result = cli_runner.invoke(main, ["eval", "--file", str(path), "-t", "a", "-f", "b", "-t", "d"])
+        assert result.exit_code == 0
+        assert result.output == "True\n"
+
+    def test_eval_file_error(self, cli_runner: CliRunner, tmp_path: Path) -> None:
+        path = tmp_path / "program.markers"
+        path.write_text("née and\n  (b or dé)", encoding="utf-8")
+        result = cli_runner.invoke(main, ["eval", "--file", str(path), "-t", "née", "-f", "b"])
+        assert result.exit_code == 0
+        expected = """EvaluateError: Unknown variable: "dé"
+line 2, col 9
+
+  (b or dé)
+--------^^
+"""
+        assert result.output == expected
+
+    def test_parse_requires_program_or_file(self, cli_runner: CliRunner) -> None:
+        result = cli_runner.invoke(main, ["parse"])
+        assert result.exit_code == 2
+        assert "Provide exactly one of PROGRAM or --file" in result.output
+
+    def test_cnf(self, cli_runner: CliRunner) -> None:
+        result = cli_runner.invoke(main, ["cnf", "a or not b", "--exact"])
+        assert result.exit_code == 0
+        assert result.output == "c var 1 a\nc var 2 b\np cnf 2 1\n1 -2 0\n"
+
+    def test_cnf_budget_error(self, cli_runner: CliRunner) -> None:
+        result = cli_runner.invoke(main, ["cnf", "a and b or c and d", "--exact", "--max-clauses", "2"])
+        assert result.exit_code == 0
+        assert result.output.startswith("NormalFormError: Normal form exceeds the budget of 2 clauses\n")
+
+    def test_table_csv(self, cli_runner: CliRunner) -> None:
+        result = cli_runner.invoke(main, ["table", "a and not b"])
+        assert result.exit_code == 0
+        assert result.output == "a,b,result\n0,0,0\n0,1,0\n1,1,0\n1,0,1\n"
+
+    def test_table_jsonl_limit(self, cli_runner: CliRunner) -> None:
+        result = cli_runner.invoke(main, ["table", "a or b", "--format", "jsonl", "--limit", "2"])
+        assert result.exit_code == 0
+        assert result.output == (
+            '{"values": {"a": false, "b": false}, "result": false}\n'
+            '{"values": {"a": false, "b": true}, "result": true}\n'
+        )
+
+    def test_dedup(self, cli_runner: CliRunner) -> None:
+        corpus = "b and a\n(a and b)\n\nnot (a or not b)\nb and not a\na or\n"
+        result = cli_runner.invoke(main, ["dedup"], input=corpus)
+        assert result.exit_code == 0
+        assert result.output == "b and a\nnot (a or not b)\nline 6: ParseError: Unexpected end of input\n"
+
+    def test_check(self, cli_runner: CliRunner, tmp_path: Path) -> None:
+        corpus = tmp_path / "corpus.markers"
+        corpus.write_text("a and b\na and\n", encoding="utf-8")
+        result = cli_runner.invoke(main, ["check", str(corpus), "--jobs", "1"])
+        assert result.exit_code == 1
+        assert json.loads(result.output) == {
+            "file": str(corpus),
+            "line": 2,
+            "formula": "a and",
+            "errors": [{"message": "Unexpected end of input", "line": 2, "column": 3, "length": 3}],
+        }
+
+    def test_store(self, cli_runner: CliRunner, tmp_path: Path) -> None:
+        definitions = tmp_path / "rules.markers"
+        definitions.write_text("a = x and\n  not y\nb = a or z\n", encoding="utf-8")
+        output = tmp_path / "rules.store"
+        result = cli_runner.invoke(main, ["store", str(definitions), str(output)])
+        assert result.exit_code == 0
+        with FormulaStore(output) as store:
+            assert list(store.names()) == ["a", "b"]
+            assert store.evaluate("a", {"x": True, "y": False})
+
+    def test_minimize(self, cli_runner: CliRunner) -> None:
+        result = cli_runner.invoke(main, ["minimize", "a and b or a and not b or c and a"])
+        assert result.exit_code == 0
+        assert result.output == "a\nliterals: 6 -> 1 (quine-mccluskey)\n"
+
+    def test_minimize_prints_minimal_parentheses(self, cli_runner: CliRunner) -> None:
+        result = cli_runner.invoke(main, ["minimize", "(a and not b) or (not a and b) or (a and b and c)"])
+        assert result.exit_code == 0
+        assert result.output.splitlines()[0] == "a and not b or not a and b or b and c"
@@ -0,0 +1,58 @@
+import pytest
+from markers import Evaluator
+from markers.compiler import compile_expr
+from markers.error import EvaluateError
+from markers.expressions import Expr, SlotVar, UnaryOp, UnaryOpKind, Var, walk
+from markers.lexer import Lexer
+from markers.parser import Parser
+from markers.type import PositionInfo
+
+
+class TestCompiler:
+    def test_compile_assigns_slots_in_order_of_first_occurrence(self) -> None:
+        expr = Parser(Lexer.tokenize("b and (a or not b)")).parse()
+        compiled = compile_expr(expr)
+        assert compiled.names == ["b", "a"]
+        slots = [(node.name, node.slot) for node in walk(compiled.expr) if isinstance(node, SlotVar)]
+        assert slots == [("b", 0), ("a", 1), ("b", 0)]
+        assert str(compiled.expr) == str(expr)
+
+    @pytest.mark.parametrize("values", [[True, False], (True, False), bytearray([1, 0]), b"\x01\x00"])
+    def test_evaluate_compiled_accepts_sequences(self, values: list[bool]) -> None:
+        compiled = compile_expr(Parser(Lexer.tokenize("a and not b")).parse())
+        assert Evaluator().evaluate_compiled(compiled, values) is True
+
+    def test_bind_converts_env_once(self) -> None:
+        expr = Parser(Lexer.tokenize("a or b and c")).parse()
+        compiled = compile_expr(expr)
+        for a in [False, True]:
+            for b in [False, True]:
+                env = {"a": a, "b": b, "c": True, "unused": False}
+                values = compiled.bind(env)
+                assert values == bytearray([a, b, True])
+                assert Evaluator().evaluate_compiled(compiled, values) == Evaluator().evaluate(expr, env)
+
+    def test_bind_names_every_unbound_variable(self) -> None:
+        compiled = compile_expr(Parser(Lexer.tokenize("a and b or c and d")).parse())
+        with pytest.raises(EvaluateError, match='Unbound variables: "b", "d"') as exc:
+            compiled.bind({"a": True, "c": False})
+        assert exc.value.pos == PositionInfo(1, 7, 1)
+
+    def test_evaluate_compiled_wrong_length_raises_evaluate_error(self) -> None:
+        compiled = compile_expr(Parser(Lexer.tokenize("a and b")).parse())
+        with pytest.raises(EvaluateError, match="Expected 2 slot values, found 1"):
+            Evaluator().evaluate_compiled(compiled, [True])
+
+    def test_slot(self) -> None:
+        compiled = compile_expr(Parser(Lexer.tokenize("x or y")).parse())
+        assert compiled.slot("y") == 1
+        with pytest.raises(KeyError):
+            compiled.slot("z")
+
+    def test_compile_deep_negation_does_not_recurse(self) -> None:
+        expr: Expr = Var("a")
+        for _ in range(20_000):
+            expr = UnaryOp(UnaryOpKind.NOT, expr)
+        compiled = compile_expr(expr)
+        assert compiled.names == ["a"]
+        assert compiled.slot("a") == 0
@@ -0,0 +1,109 @@
+import re
+from pathlib import Path
+
+import pytest
+from markers.definitions import DefinitionGraph, iter_definitions, load_definitions
+from markers.error import DefinitionError, EvaluateError, ParseError
+from markers.expressions import Definition, Var
+from markers.type import PositionInfo
+
+
+class TestDefinitions:
+    def test_iter_definitions_multi_line(self) -> None:
+        lines = ["is_admin = role_admin\n", "  or superuser\n", "\n", "can_edit = is_admin and active\n"]
+        definitions = list(iter_definitions(lines))
+        assert [definition.name for definition in definitions] == ["is_admin", "can_edit"]
+        assert str(definitions[0].expr) == "(role_admin or superuser)"
+        assert definitions[1].pos == PositionInfo(4, 1, 8)
+
+    def test_iter_definitions_reports_file_position(self) -> None:
+        lines = ["a = x\n", "b = y\n", "  or 0bad\n"]
+        with pytest.raises(ParseError, match='Unexpected token "0bad"') as exc:
+            list(iter_definitions(lines))
+        assert exc.value.pos == PositionInfo(3, 6, 4)
+
+    def test_build_orders_dependencies_first(self) -> None:
+        definitions = [
+            Definition("c", Var("b")),
+            Definition("b", Var("a")),
+            Definition("a", Var("x")),
+        ]
+        graph = DefinitionGraph.build(definitions)
+        assert graph.order == ["a", "b", "c"]
+
+    def test_build_duplicate_raises_definition_error(self) -> None:
+        definitions = [Definition("a", Var("x")), Definition("a", Var("y"), pos=PositionInfo(2, 1, 1))]
+        with pytest.raises(DefinitionError, match='Duplicate definition: "a"') as exc:
+            DefinitionGraph.build(definitions)
+        assert exc.value.pos == PositionInfo(2, 1, 1)
+
+    def test_build_cycle_raises_definition_error(self) -> None:
+        definitions = list(iter_definitions(["root = a\n", "a = b or x\n", "b = not a\n"]))
+        with pytest.raises(DefinitionError, match=re.escape("Cyclic definitions: a -> b -> a")):
+            DefinitionGraph.build(definitions)
+
+    def test_build_self_reference_raises_definition_error(self) -> None:
+        definitions = list(iter_definitions(["a = a and x\n"]))
+        with pytest.raises(DefinitionError, match=re.escape("Cyclic definitions: a -> a")):
+            DefinitionGraph.build(definitions)
+
+    def test_evaluate_all(self) -> None:
+        graph = DefinitionGraph.build(iter_definitions(["admin = role or su\n", "edit = admin and active\n"]))
+        values = graph.evaluate({"role": False, "su": True, "active": False})
+        assert values == {"admin": True, "edit": False}
+
+    def test_evaluate_requested_names_only(self) -> None:
+        graph = DefinitionGraph.build(iter_definitions(["a = x\n", "b = a and y\n", "c = z\n"]))
+        values = graph.evaluate({"x": True, "y": True}, names=["b"])
+        assert values == {"b": True}
+
+    def test_evaluate_names_from_iterator(self) -> None:
+        graph = DefinitionGraph.build(iter_definitions(["a = x\n", "b = a and y\n", "c = z\n"]))
+        values = graph.evaluate({"x": True, "y": False}, names=iter(["b", "a"]))
+        assert values == {"b": False, "a": True}
+
+    def test_evaluate_shared_definition_once(self) -> None:
+        lines = ["shared = x and y\n", "p = shared or z\n", "q = not shared\n", "r = shared and p\n"]
+        graph = DefinitionGraph.build(iter_definitions(lines))
+        assert graph.dependencies == {"shared": [], "p": ["shared"], "q": ["shared"], "r": ["shared", "p"]}
+        values = graph.evaluate({"x": True, "y": True, "z": False})
+        assert values == {"shared": True, "p": True, "q": False, "r": True}
+
+    def test_evaluate_reads_definitions_lazily(self) -> None:
+        graph = DefinitionGraph.build(iter_definitions(["x = b\n", "y = a or x\n", "z = not y and x\n"]))
+        assert graph.evaluate({"a": True}, names=["y"]) == {"y": True}
+        assert graph.evaluate({"a": True}, names=["z", "y"]) == {"z": False, "y": True}
+        with pytest.raises(EvaluateError, match='Unknown variable: "b"'):
+            graph.evaluate({"a": False}, names=["y"])
+
+    def test_evaluate_reads_each_definition_once(self) -> None:
+        reads: list[str] = []
+
+        class CountingEnv(dict[str, bool]):
+            def __getitem__(self, name: str) -> bool:
+                reads.append(name)
+                return super().__getitem__(name)
+
+        lines = ["shared = x and y\n", "p = shared or z\n", "q = not shared and p\n"]
+        graph = DefinitionGraph.build(iter_definitions(lines))
+        values = graph.evaluate(CountingEnv(x=True, y=True, z=False), names=["q", "p"])
+        assert values == {"q": False, "p": True}
+        assert reads == ["x", "y"]
+
+    def test_evaluate_unknown_definition_raises_definition_error(self) -> None:
+        graph = DefinitionGraph.build(iter_definitions(["a = x\n"]))
+        with pytest.raises(DefinitionError, match='Unknown definition: "b"'):
+            graph.evaluate({"x": True}, names=["b"])
+
+    def test_evaluate_unknown_variable_raises_evaluate_error(self) -> None:
+        graph = DefinitionGraph.build(iter_definitions(["a = x\n", "b = a and y\n"]))
+        with pytest.raises(EvaluateError, match='Unknown variable: "y"'):
+            graph.evaluate({"x": True})
+
+    def test_load_definitions_long_chain(self, tmp_path: Path) -> None:
+        path = tmp_path / "rules.markers"
+        lines = ["d0 = x\n"] + [f"d{i} = not d{i - 1}\n" for i in range(1, 5_000)]
+        path.write_text("".join(lines), encoding="utf-8")
+        graph = load_definitions(path)
+        assert len(graph.order) == 5_000
+        assert graph.evaluate({"x": True}, names=["d4999"]) == {"d4999": False}
@@ -1,7 +1,7 @@
 import pytest
-from markers import Evaluator
+from markers import Evaluator, Lexer, Parser, Stats
 from markers.error import EvaluateError
-from markers.expressions import BinaryOp, BinaryOpKind, Lit, UnaryOp, UnaryOpKind, Var
+from markers.expressions import And, BinaryOp, BinaryOpKind, Lit, Or, UnaryOp, UnaryOpKind, Var
 from markers.type import Env, PositionInfo
 
 
@@ -89,3 +89,41 @@ class TestEvaluator:
         with pytest.raises(EvaluateError, match='Unknown variable: "C"') as exc:
             Evaluator().evaluate(expr, env)
         assert exc.value.pos == PositionInfo(2, 4, 1)
+
+    def test_evaluate_batch_matches_sequential_order(self) -> None:
+        expr = BinaryOp(BinaryOpKind.OR, Var("A"), UnaryOp(UnaryOpKind.NOT, Var("B")))
+        envs: list[Env] = [{"A": idx % 3 == 0, "B": idx % 2 == 0} for idx in range(1000)]
+        results = Evaluator().evaluate_batch(expr, envs, max_workers=4, chunk_size=7)
+        assert results == [Evaluator().evaluate(expr, env) for env in envs]
+
+    def test_evaluate_batch_unknown_variable_raises_evaluate_error(self) -> None:
+        expr = Var("A")
+        envs: list[Env] = [*([{"A": True}] * 10), {}]
+        with pytest.raises(EvaluateError, match='Unknown variable: "A"'):
+            Evaluator().evaluate_batch(expr, envs, max_workers=2, chunk_size=3)
+
+    def test_expressions_are_immutable(self) -> None:
+        expr = BinaryOp(BinaryOpKind.AND, Var("A"), Lit(True))
+        with pytest.raises(AttributeError):
+            expr.left = Var("B")  # type: ignore[misc]
+        with pytest.raises(AttributeError):
+            expr.pos.length = 3  # type: ignore[misc]
+
+    def test_evaluate_nary_short_circuits(self) -> None:
+        expr = Or((Var("A"), Var("B"), Var("C")))
+        stats = Stats()
+        assert Evaluator(stats=stats).evaluate(expr, {"A": False, "B": True})
+        assert stats.short_circuits == 1
+        assert stats.var_lookups == {"A": 1, "B": 1}
+
+    def test_evaluate_nary_and(self) -> None:
+        expr = And((Var("A"), Var("B"), Lit(True)))
+        assert Evaluator().evaluate(expr, {"A": True, "B": True})
+        assert not Evaluator().evaluate(expr, {"A": True, "B": False})
+
+    def test_evaluate_long_chain_does_not_recurse(self) -> None:
+        program = " and ".join(f"v{idx}" for idx in range(20_000))
+        expr = Parser(Lexer.tokenize(program)).parse()
+        env = {f"v{idx}": True for idx in range(20_000)}
+        assert Evaluator().evaluate(expr, env)
+        assert str(expr).count("and") == 19_999
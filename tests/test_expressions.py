@@ -0,0 +1,77 @@
+from markers.expressions import (
+    And,
+    BinaryOp,
+    BinaryOpKind,
+    Expr,
+    Or,
+    UnaryOp,
+    UnaryOpKind,
+    Var,
+    fold_polarized,
+    to_binary,
+    to_nary,
+)
+from markers.lexer import Lexer
+from markers.parser import Parser
+from markers.type import PositionInfo
+
+
+def _show_leaf(node: Expr, negated: bool) -> str:
+    return f"~{node}" if negated else str(node)
+
+
+def _show_operator(is_and: bool, operands: list[str]) -> str:
+    return "(" + (" & " if is_and else " | ").join(operands) + ")"
+
+
+class TestExpressions:
+    def test_to_binary_nests_left(self) -> None:
+        expr = And((Var("a"), Var("b"), Var("c")), ops=(PositionInfo(1, 3, 3), PositionInfo(1, 9, 3)))
+        assert to_binary(expr) == BinaryOp(
+            BinaryOpKind.AND,
+            BinaryOp(BinaryOpKind.AND, Var("a"), Var("b"), pos=PositionInfo(1, 3, 3)),
+            Var("c"),
+            pos=PositionInfo(1, 9, 3),
+        )
+
+    def test_to_nary_flattens_chains_of_the_same_kind(self) -> None:
+        expr = BinaryOp(
+            BinaryOpKind.OR,
+            BinaryOp(BinaryOpKind.OR, Var("a"), Var("b")),
+            UnaryOp(UnaryOpKind.NOT, BinaryOp(BinaryOpKind.AND, Var("c"), Var("d"))),
+        )
+        assert to_nary(expr) == Or((Var("a"), Var("b"), UnaryOp(UnaryOpKind.NOT, And((Var("c"), Var("d"))))))
+
+    def test_round_trip_keeps_operator_positions(self) -> None:
+        expr = Parser(Lexer.tokenize("a or b and c or not (d and e)")).parse()
+        binary = to_binary(expr)
+        assert to_nary(binary) == expr
+        assert to_binary(to_nary(binary)) == binary
+
+    def test_to_binary_long_chain_does_not_recurse(self) -> None:
+        expr = Or(tuple(Var(f"v{idx}") for idx in range(20_000)))
+        binary = to_binary(expr)
+        assert isinstance(binary, BinaryOp)
+        assert to_nary(binary) == expr
+
+    def test_fold_polarized_pushes_negations_down(self) -> None:
+        expr = Parser(Lexer.tokenize("not (a and not (b or c)) or not not d")).parse()
+        assert fold_polarized(expr, _show_leaf, _show_operator) == "((~a | (b | c)) | d)"
+
+    def test_fold_polarized_folds_shared_subexpressions_once_per_polarity(self) -> None:
+        shared = And((Var("a"), Var("b")))
+        expr = Or((shared, UnaryOp(UnaryOpKind.NOT, shared), shared))
+        folded: list[str] = []
+
+        def leaf(node: Expr, negated: bool) -> str:
+            folded.append(_show_leaf(node, negated))
+            return folded[-1]
+
+        assert fold_polarized(expr, leaf, _show_operator) == "((a & b) | (~a | ~b) | (a & b))"
+        assert folded == ["a", "b", "~a", "~b"]
+
+    def test_fold_polarized_deep_negation_does_not_recurse(self) -> None:
+        expr: Expr = Var("a")
+        for _ in range(20_001):
+            expr = UnaryOp(UnaryOpKind.NOT, expr)
+        assert fold_polarized(expr, _show_leaf, _show_operator) == "~a"
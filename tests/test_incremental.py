@@ -0,0 +1,167 @@
+import random
+
+import pytest
+from markers.error import InternalError
+from markers.expressions import And, Or, UnaryOp, Var, to_binary
+from markers.incremental import Edit, ParseResult, parse_program, reparse
+from markers.type import PositionInfo
+
+
+def _assert_same_as_full_parse(result: ParseResult) -> None:
+    full = parse_program(result.program)
+    assert result.tokens == full.tokens
+    assert result.expr == full.expr
+    if full.expr is not None:
+        assert result.expr is not None
+        # Binary nodes carry every operator position, which n-ary nodes do not compare
+        assert to_binary(result.expr) == to_binary(full.expr)
+    assert repr(result.error) == repr(full.error)
+    if full.error is not None:
+        assert result.error is not None
+        assert result.error.pos == full.error.pos
+
+
+class TestIncremental:
+    def test_parse_program(self) -> None:
+        result = parse_program("a and b")
+        assert result.expr == And(
+            (Var("a", pos=PositionInfo(1, 1, 1)), Var("b", pos=PositionInfo(1, 7, 1))),
+            pos=PositionInfo(1, 3, 3),
+        )
+        assert result.error is None
+
+    def test_parse_program_records_error(self) -> None:
+        result = parse_program("a and (b")
+        assert result.expr is None
+        assert result.error is not None
+        assert result.error.message == "Expected closing paren matching opening"
+
+    def test_reparse_rename_variable(self) -> None:
+        result = reparse(parse_program("(a and b) or (c and d)"), Edit(7, 1, "bee"))
+        assert result.program == "(a and bee) or (c and d)"
+        assert str(result.expr) == "((a and bee) or (c and d))"
+        _assert_same_as_full_parse(result)
+
+    def test_reparse_shifts_later_positions(self) -> None:
+        result = reparse(parse_program("x or\n(c and d)"), Edit(0, 1, "long\n"))
+        assert result.expr is not None
+        assert result.expr.pos == PositionInfo(2, 2, 2)
+        assert result.tokens[-1].pos == PositionInfo(3, 9, 1)
+        _assert_same_as_full_parse(result)
+
+    def test_reparse_reuses_groups_before_edit(self) -> None:
+        previous = parse_program("(a and b) or c")
+        assert isinstance(previous.expr, Or)
+        group = previous.expr.args[0]
+        result = reparse(previous, Edit(13, 1, "d"))
+        assert isinstance(result.expr, Or)
+        assert result.expr.args[0] is group
+        _assert_same_as_full_parse(result)
+
+    def test_reparse_merges_identifiers(self) -> None:
+        result = reparse(parse_program("ab or c"), Edit(2, 0, "cd"))
+        assert result.program == "abcd or c"
+        _assert_same_as_full_parse(result)
+
+    def test_reparse_introduces_error(self) -> None:
+        result = reparse(parse_program("(a and b) or (c and d)"), Edit(21, 1, ""))
+        assert result.expr is None
+        _assert_same_as_full_parse(result)
+
+    def test_reparse_fixes_error(self) -> None:
+        previous = parse_program("(a and b) or (c and")
+        result = reparse(previous, Edit(19, 0, " d)"))
+        assert str(result.expr) == "((a and b) or (c and d))"
+        _assert_same_as_full_parse(result)
+
+    def test_reparse_at_end_after_trailing_whitespace(self) -> None:
+        result = reparse(parse_program("a or "), Edit(5, 0, "b\n"))
+        assert str(result.expr) == "(a or b)"
+        _assert_same_as_full_parse(result)
+
+    def test_reparse_sequence_of_edits(self) -> None:
+        result = parse_program("(a and b)\nor (c and not d)\nor (e or f)")
+        for edit in [Edit(1, 1, "x\n"), Edit(21, 4, ""), Edit(0, 0, "("), Edit(-1, 0, ")")]:
+            if edit.offset < 0:
+                edit.offset = len(result.program)
+            result = reparse(result, edit)
+            _assert_same_as_full_parse(result)
+        assert result.program == "((x\n and b)\nor (c and d)\nor (e or f))"
+
+    def test_reparse_reuses_operands_of_long_chains(self) -> None:
+        program = " or\n".join(f"(a{idx} and not b{idx})" for idx in range(200))
+        previous = parse_program(program)
+        assert isinstance(previous.expr, Or)
+        operands = previous.expr.args
+        later_token = previous.tokens[-2]
+        offset = program.index("a100")
+        result = reparse(previous, Edit(offset, 4, "long_name"))
+        assert isinstance(result.expr, Or)
+        assert all(new is old for new, old in zip(result.expr.args[:100], operands[:100], strict=True))
+        assert all(new is old for new, old in zip(result.expr.args[101:], operands[101:], strict=True))
+        assert str(result.expr.args[100]) == "(long_name and (not b100))"
+        # Later tokens are kept, and their positions move with the edit when read
+        assert result.tokens[-2] is later_token
+        assert later_token.pos == PositionInfo(200, 15, 4)
+        assert later_token.pos.offset == len(result.program) - 5
+        _assert_same_as_full_parse(result)
+
+    def test_reparse_in_nested_chain(self) -> None:
+        previous = parse_program("x or not (a and b and c) or y")
+        assert isinstance(previous.expr, Or)
+        first = previous.expr.args[0]
+        result = reparse(previous, Edit(16, 1, "(b or d)"))
+        assert isinstance(result.expr, Or)
+        assert result.expr.args[0] is first
+        assert isinstance(result.expr.args[1], UnaryOp)
+        assert str(result.expr.args[1]) == "(not (a and (b or d) and c))"
+        _assert_same_as_full_parse(result)
+
+    def test_reparse_edit_that_changes_chain_structure(self) -> None:
+        result = reparse(parse_program("a and b and c or d"), Edit(6, 1, "b or e"))
+        assert str(result.expr) == "((a and b) or (e and c) or d)"
+        _assert_same_as_full_parse(result)
+
+    def test_reparse_unbalanced_paren_in_wrapped_program(self) -> None:
+        result = reparse(parse_program("((a and b) or c)"), Edit(3, 0, ")"))
+        assert result.error is not None
+        assert result.error.message == 'Unexpected token ")"'
+        _assert_same_as_full_parse(result)
+
+    def test_reparse_replacing_operator(self) -> None:
+        result = reparse(parse_program("true\n or a"), Edit(6, 2, "( and"))
+        assert result.error is not None
+        _assert_same_as_full_parse(result)
+
+    def test_reparse_random_edits(self) -> None:
+        rng = random.Random(0)
+        pieces = ["a", "b", "cd", " ", "\n", "(", ")", " and ", " or ", "not ", "true"]
+        for _ in range(200):
+            result = parse_program("(a and b)\nor not (c or d and e)\nor f and (g or h)")
+            for _ in range(5):
+                offset = rng.randint(0, len(result.program))
+                deleted = rng.randint(0, min(3, len(result.program) - offset))
+                inserted = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 2)))
+                result = reparse(result, Edit(offset, deleted, inserted))
+                _assert_same_as_full_parse(result)
+
+    def test_reparse_long_editing_session_bounds_edit_log(self) -> None:
+        rng = random.Random(0)
+        pieces = ["a", "b", "cd", " ", "\n", " and ", " or ", "not "]
+        result = parse_program(" or\n".join(f"(a{idx} and not b{idx})" for idx in range(30)))
+        for idx in range(1200):
+            offset = rng.randint(0, len(result.program))
+            deleted = rng.randint(0, min(3, len(result.program) - offset))
+            inserted = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 2)))
+            result = reparse(result, Edit(offset, deleted, inserted))
+            if idx % 8 == 7:
+                # Positions that are read now and then catch up with different numbers of edits
+                full = parse_program(result.program)
+                for token_idx in rng.sample(range(len(result.tokens)), len(result.tokens) // 2):
+                    assert result.tokens[token_idx].pos == full.tokens[token_idx].pos
+        assert len(result.log.shifts) < 600
+        _assert_same_as_full_parse(result)
+
+    def test_reparse_out_of_range_raises_internal_error(self) -> None:
+        with pytest.raises(InternalError, match="Edit is out of range"):
+            reparse(parse_program("a"), Edit(1, 1, ""))
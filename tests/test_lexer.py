@@ -1,4 +1,7 @@
-from markers.lexer import Lexer
+import mmap
+from pathlib import Path
+
+from markers.lexer import BytesLexer, Lexer
 from markers.tokens import (
     AndOpToken,
     LeftParenToken,
@@ -70,3 +73,44 @@ class TestLexer:
             NameToken("C", pos=PositionInfo(2, 10, 1)),
             RightParenToken(pos=PositionInfo(2, 11, 1)),
         ]
+
+    def test_tokenize_definition(self) -> None:
+        text = "a = b or c"
+        tokens = Lexer.tokenize(text)
+        assert self._to_strings(tokens) == ["a", "=", "b", "or", "c"]
+
+    def test_bytes_tokenize_matches_text_tokenize(self) -> None:
+        text = "(A)and\nnot(B or C)"
+        assert BytesLexer.tokenize(text.encode()) == Lexer.tokenize(text)
+
+    def test_bytes_tokenize_non_ascii_positions_count_characters(self) -> None:
+        text = "é1 and\u00a0ñ or ü\nand 日本"
+        tokens = BytesLexer.tokenize(text.encode())
+        assert self._to_strings(tokens) == ["é1", "and", "ñ", "or", "ü", "and", "日本"]
+        assert tokens == Lexer.tokenize(text)
+        assert tokens[-1].pos == PositionInfo(2, 5, 2)
+        assert tokens[-1].pos.offset == 22
+
+    def test_bytes_tokenize_positions_outlive_memory_map(self, tmp_path: Path) -> None:
+        path = tmp_path / "program.txt"
+        path.write_text("a and\n  é or b", encoding="utf-8")
+        with path.open("rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            tokens = BytesLexer.tokenize(buffer)
+        assert buffer.closed
+        assert tokens[-1].pos == PositionInfo(2, 8, 1)
+        assert tokens[2].pos == PositionInfo(2, 3, 1)
+
+    def test_bytes_lexer_detach_before_end(self, tmp_path: Path) -> None:
+        path = tmp_path / "program.txt"
+        path.write_text("a and b", encoding="utf-8")
+        with path.open("rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            lexer = BytesLexer(buffer)
+            token = lexer.next()
+            lexer.detach()
+        assert token.pos == PositionInfo(1, 1, 1)
+
+    def test_bytes_tokenize_shares_identifier_strings(self) -> None:
+        tokens = BytesLexer.tokenize(b"alpha or alpha")
+        assert isinstance(tokens[0], NameToken)
+        assert isinstance(tokens[2], NameToken)
+        assert tokens[0].value is tokens[2].value
@@ -0,0 +1,172 @@
+import itertools
+import random
+
+import pytest
+from markers import Evaluator, Lexer, Parser
+from markers.check import check_program
+from markers.error import EvaluateLimitError, LexLimitError, LimitError, ParseLimitError, UserError
+from markers.expressions import And, Expr, Or, UnaryOp, UnaryOpKind, Var
+from markers.lexer import BytesLexer
+from markers.limits import UNTRUSTED_LIMITS, Limits
+from markers.serializer import dumps
+from markers.type import PositionInfo
+
+# Frames a caller may already have on the stack when it parses untrusted input
+CALLER_FRAMES = 300
+ENVS = [dict(zip("abc", values, strict=True)) for values in itertools.product([False, True], repeat=3)]
+
+
+def parse(program: str, limits: Limits) -> Expr:
+    return Parser(Lexer.tokenize(program, limits=limits), limits=limits).parse()
+
+
+def deep_not(depth: int) -> Expr:
+    expr: Expr = Var("a")
+    for _ in range(depth):
+        expr = UnaryOp(UnaryOpKind.NOT, expr)
+    return expr
+
+
+def random_expr(rng: random.Random, depth: int) -> Expr:
+    choice = rng.random()
+    if depth == 0 or choice < 0.2:
+        return Var(rng.choice("abc"))
+    if choice < 0.5:
+        return UnaryOp(UnaryOpKind.NOT, random_expr(rng, depth - 1))
+    cls = And if choice < 0.75 else Or
+    return cls(tuple(random_expr(rng, depth - 1) for _ in range(rng.randint(2, 3))))
+
+
+class TestLimits:
+    def test_limit_errors_are_user_errors(self) -> None:
+        assert issubclass(LimitError, UserError)
+        for error_type in (LexLimitError, ParseLimitError, EvaluateLimitError):
+            assert issubclass(error_type, LimitError)
+
+    def test_programs_within_limits_parse(self) -> None:
+        expr = parse("a and (b or not c)", UNTRUSTED_LIMITS)
+        assert Evaluator(limits=UNTRUSTED_LIMITS).evaluate(expr, {"a": True, "b": False, "c": False})
+
+    def test_length_limit(self) -> None:
+        with pytest.raises(LexLimitError, match="^Input length 11 exceeds the limit of 5$") as exc_info:
+            Lexer.tokenize("a and bcdef", limits=Limits(max_length=5))
+        assert exc_info.value.pos.char_no == 6
+
+    def test_length_limit_allows_input_of_limit_length(self) -> None:
+        assert len(Lexer.tokenize("a or b", limits=Limits(max_length=6))) == 3
+
+    def test_token_limit(self) -> None:
+        with pytest.raises(LexLimitError, match="^Input exceeds the limit of 3 tokens$") as exc_info:
+            Lexer.tokenize("a and b or c", limits=Limits(max_tokens=3))
+        assert exc_info.value.pos == PositionInfo(1, 9, 1)
+
+    def test_token_limit_is_lazy(self) -> None:
+        tokens = Lexer.iter_tokens("a and b or c", limits=Limits(max_tokens=3))
+        for _ in range(3):
+            next(tokens)
+        with pytest.raises(LexLimitError):
+            next(tokens)
+
+    def test_bytes_lexer_limits(self) -> None:
+        with pytest.raises(LexLimitError, match="^Input length 12 exceeds the limit of 10$"):
+            BytesLexer.tokenize(b"a and b or c", limits=Limits(max_length=10))
+        with pytest.raises(LexLimitError, match="^Input exceeds the limit of 3 tokens$"):
+            BytesLexer.tokenize(b"a and b or c", limits=Limits(max_tokens=3))
+
+    def test_paren_depth_limit(self) -> None:
+        program = "(" * 200 + "a" + ")" * 200
+        with pytest.raises(ParseLimitError, match="^Nesting depth exceeds the limit of 100$") as exc_info:
+            parse(program, UNTRUSTED_LIMITS)
+        assert exc_info.value.pos == PositionInfo(1, 101, 1)
+
+    def test_depth_limit_from_deep_caller_stack(self) -> None:
+        def call_nested(depth: int, program: str) -> bool:
+            if depth > 0:
+                return call_nested(depth - 1, program)
+            expr = parse(program, UNTRUSTED_LIMITS)
+            return Evaluator(limits=UNTRUSTED_LIMITS).evaluate(expr, {"a": False, "b": True, "c": True})
+
+        assert call_nested(CALLER_FRAMES, "(" * 99 + "a or (b and c)" + ")" * 99)
+        assert not call_nested(CALLER_FRAMES, "a or b and " + "(c and " * 100 + "a" + ")" * 100)
+        with pytest.raises(ParseLimitError):
+            call_nested(CALLER_FRAMES, "(" * 1000 + "a" + ")" * 1000)
+
+    def test_not_depth_limit(self) -> None:
+        with pytest.raises(ParseLimitError, match="^Nesting depth exceeds the limit of 3$"):
+            parse("not not not not a", Limits(max_depth=3))
+        assert str(parse("not not not a", Limits(max_depth=3))) == str(deep_not(3))
+
+    def test_node_limit(self) -> None:
+        with pytest.raises(ParseLimitError, match="^Expression exceeds the limit of 4 nodes$"):
+            parse("a and b and c or d", Limits(max_nodes=4))
+        parse("a and b and c", Limits(max_nodes=4))
+
+    def test_flat_chain_does_not_count_toward_depth(self) -> None:
+        program = " and ".join(f"x{idx}" for idx in range(1000))
+        parse(program, Limits(max_depth=1))
+
+    def test_evaluate_step_limit(self) -> None:
+        evaluator = Evaluator(limits=Limits(max_steps=3))
+        with pytest.raises(EvaluateLimitError, match="^Evaluation exceeds the limit of 3 steps$"):
+            evaluator.evaluate(deep_not(3), {"a": True})
+        assert evaluator.evaluate(deep_not(2), {"a": True}) is True
+
+    def test_evaluate_depth_limit(self) -> None:
+        evaluator = Evaluator(limits=UNTRUSTED_LIMITS)
+        with pytest.raises(EvaluateLimitError, match="^Evaluation depth exceeds the limit of 100$"):
+            evaluator.evaluate(deep_not(10_000), {"a": True})
+
+    @pytest.mark.parametrize(
+        "program",
+        [
+            "not " * 100 + "a",
+            "(" * 100 + "a" + ")" * 100,
+            "(" * 99 + "a and (b or c)" + ")" * 99,
+            "a or b and " + "(c and " * 99 + "a" + ")" * 99,
+            "(not " * 50 + "a" + ")" * 50,
+        ],
+    )
+    def test_programs_parsed_at_depth_limit_evaluate(self, program: str) -> None:
+        expr = parse(program, UNTRUSTED_LIMITS)
+        for env in ENVS:
+            Evaluator(limits=UNTRUSTED_LIMITS).evaluate(expr, env)
+
+    @pytest.mark.parametrize(
+        "program",
+        [
+            "not " * 101 + "a",
+            "a or b and " + "(c and " * 101 + "a" + ")" * 101,
+            "not (c and " * 51 + "a" + ")" * 51,
+        ],
+    )
+    def test_programs_past_depth_limit_fail_to_evaluate(self, program: str) -> None:
+        with pytest.raises(ParseLimitError):
+            parse(program, UNTRUSTED_LIMITS)
+        expr = parse(program, Limits())
+        with pytest.raises(EvaluateLimitError, match="^Evaluation depth exceeds the limit of 100$"):
+            Evaluator(limits=UNTRUSTED_LIMITS).evaluate(expr, {"a": False, "b": True, "c": True})
+
+    def test_programs_parsed_within_depth_limit_evaluate(self) -> None:
+        rng = random.Random(0)
+        for _ in range(500):
+            program = dumps(random_expr(rng, 6))
+            for max_depth in range(5):
+                limits = Limits(max_depth=max_depth)
+                try:
+                    expr = parse(program, limits)
+                except ParseLimitError:
+                    continue
+                for env in ENVS:
+                    Evaluator(limits=limits).evaluate(expr, env)
+
+    def test_evaluate_batch_limits(self) -> None:
+        evaluator = Evaluator(limits=Limits(max_steps=3))
+        assert evaluator.evaluate_batch(deep_not(2), [{"a": True}, {"a": False}]) == [True, False]
+        with pytest.raises(EvaluateLimitError):
+            evaluator.evaluate_batch(deep_not(3), [{"a": True}])
+
+    def test_check_reports_limit_errors(self) -> None:
+        errors = check_program("(" * 200 + "a" + ")" * 200, limits=UNTRUSTED_LIMITS)
+        assert [error.message for error in errors] == ["Nesting depth exceeds the limit of 100"]
+        errors = check_program("a and b or c", limits=Limits(max_tokens=3))
+        assert [error.message for error in errors] == ["Input exceeds the limit of 3 tokens"]
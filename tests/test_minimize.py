@@ -0,0 +1,77 @@
+import itertools
+import time
+
+import pytest
+from markers import Evaluator
+from markers.expressions import Expr, Lit, variables
+from markers.minimize import count_literals, minimize
+
+from tests.conftest import parse
+
+
+def _assert_equivalent(expr_a: Expr, expr_b: Expr) -> None:
+    names = sorted(variables(expr_a) | variables(expr_b))
+    for values in itertools.product([False, True], repeat=len(names)):
+        env = dict(zip(names, values))
+        assert Evaluator().evaluate(expr_a, env) == Evaluator().evaluate(expr_b, env)
+
+
+PROGRAMS = [
+    "a and b or a and not b",
+    "(a or b) and (a or c)",
+    "not (a and (b or not c)) or d and a",
+    "a and not a",
+    "a or not a",
+    "(a and b) or (b and c) or (not a and c)",
+    "(a or not b) and (c or d and not a) or not (e and (f or a)) and g",
+]
+
+
+class TestMinimize:
+    @pytest.mark.parametrize("program", PROGRAMS)
+    @pytest.mark.parametrize("exact_max_vars", [0, 12])
+    def test_result_is_equivalent(self, program: str, exact_max_vars: int) -> None:
+        expr = parse(program)
+        result = minimize(expr, exact_max_vars=exact_max_vars)
+        assert result.complete
+        assert result.method == ("espresso" if exact_max_vars == 0 else "quine-mccluskey")
+        _assert_equivalent(expr, result.expr)
+        assert result.literals_before == count_literals(expr)
+        assert result.literals_after == count_literals(result.expr)
+
+    def test_quine_mccluskey_finds_minimal_cover(self) -> None:
+        result = minimize(parse("(a and b) or (b and c) or (not a and c)"))
+        assert str(result.expr) == "((a and b) or ((not a) and c))"
+        assert (result.literals_before, result.literals_after) == (6, 4)
+
+    def test_espresso_removes_redundant_literals(self) -> None:
+        result = minimize(parse("a and b or a and not b or c and a"), exact_max_vars=0)
+        assert str(result.expr) == "a"
+
+    def test_constants(self) -> None:
+        assert minimize(parse("a and not a")).expr == Lit(False)
+        assert minimize(parse("a or not a")).expr == Lit(True)
+
+    def test_time_budget_returns_valid_result(self) -> None:
+        program = " or ".join(f"(v{i} and not v{(i + 1) % 30} and v{(i * 7) % 30})" for i in range(30))
+        expr = parse(program)
+        result = minimize(expr, timeout=0)
+        assert not result.complete
+        assert result.literals_after <= result.literals_before
+
+    def test_time_budget_stops_truth_table_enumeration(self) -> None:
+        # The truth table has 2 ** 24 rows, which would take far longer than the budget to enumerate
+        expr = parse(" or ".join(f"(v{i} and not v{i + 12})" for i in range(12)))
+        start = time.monotonic()
+        result = minimize(expr, timeout=0.1, exact_max_vars=24)
+        assert time.monotonic() - start < 5
+        assert not result.complete
+        assert result.method == "quine-mccluskey"
+        assert result.expr is expr
+
+    def test_dnf_budget_returns_original(self) -> None:
+        program = " and ".join(f"(a{i} or b{i})" for i in range(10))
+        expr = parse(program)
+        result = minimize(expr, exact_max_vars=0, max_clauses=100)
+        assert not result.complete
+        assert result.expr is expr
@@ -0,0 +1,102 @@
+import itertools
+
+import pytest
+from markers.error import NormalFormError
+from markers.evaluator import Evaluator
+from markers.expressions import And, Or, UnaryOp, UnaryOpKind, Var, variables
+from markers.normal_form import ClauseSet, to_cnf, to_dnf, to_tseitin_cnf
+
+from tests.conftest import parse
+
+PROGRAMS = [
+    "a",
+    "not a",
+    "true",
+    "not false",
+    "a and b or c",
+    "not (a or b) and c",
+    "not (a and not (b or c)) or (c and a)",
+    "(a or b) and (not a or c) and (not b or not c)",
+    "a and false or b",
+]
+
+
+def satisfies(clause_set: ClauseSet, assignment: dict[int, bool]) -> bool:
+    def holds(literal: int) -> bool:
+        return assignment[abs(literal)] == (literal > 0)
+
+    if clause_set.conjunctive:
+        return all(any(map(holds, clause)) for clause in clause_set.clauses)
+    return any(all(map(holds, clause)) for clause in clause_set.clauses)
+
+
+def assignments(names: list[str]) -> list[dict[str, bool]]:
+    return [dict(zip(names, values)) for values in itertools.product([False, True], repeat=len(names))]
+
+
+class TestNormalForm:
+    @pytest.mark.parametrize("program", PROGRAMS)
+    def test_exact_cnf_and_dnf_are_equivalent(self, program: str) -> None:
+        expr = parse(program)
+        names = sorted(variables(expr))
+        for clause_set in [to_cnf(expr), to_dnf(expr)]:
+            for env in assignments(names):
+                assignment = {num: env[name] for num, name in enumerate(clause_set.variables, start=1)}
+                assert satisfies(clause_set, assignment) == Evaluator().evaluate(expr, env)
+
+    @pytest.mark.parametrize("program", PROGRAMS)
+    def test_tseitin_cnf_is_equisatisfiable(self, program: str) -> None:
+        expr = parse(program)
+        names = sorted(variables(expr))
+        clause_set = to_tseitin_cnf(expr)
+        num_aux = clause_set.num_vars - len(clause_set.variables)
+        for env in assignments(names):
+            original = {num: env[name] for num, name in enumerate(clause_set.variables, start=1)}
+            extensions = itertools.product([False, True], repeat=num_aux)
+            satisfiable = any(
+                satisfies(clause_set, {**original, **dict(enumerate(aux, start=len(original) + 1))})
+                for aux in extensions
+            )
+            assert satisfiable == Evaluator().evaluate(expr, env)
+
+    def test_exact_forms_of_shared_subtrees(self) -> None:
+        a = Var("a")
+        shared = Or((a, Var("b")))
+        expr = And((shared, UnaryOp(UnaryOpKind.NOT, And((shared, a))), a))
+        names = sorted(variables(expr))
+        assert to_cnf(And((a, a))).clauses == [[1]]
+        for clause_set in [to_cnf(expr), to_dnf(expr)]:
+            for env in assignments(names):
+                assignment = {num: env[name] for num, name in enumerate(clause_set.variables, start=1)}
+                assert satisfies(clause_set, assignment) == Evaluator().evaluate(expr, env)
+
+    def test_tseitin_cnf_is_linear(self) -> None:
+        program = " and ".join(f"(a{i} or b{i})" for i in range(200))
+        clause_set = to_tseitin_cnf(parse(program))
+        assert len(clause_set.variables) == 400
+        assert len(clause_set.clauses) == 200 * (2 + 1) + (200 + 1) + 1
+
+    def test_exact_cnf_budget_raises_normal_form_error(self) -> None:
+        program = " or ".join(f"(a{i} and b{i})" for i in range(20))
+        with pytest.raises(NormalFormError, match="exceeds the budget of 1000 clauses"):
+            to_cnf(parse(program), max_clauses=1000)
+
+    def test_exact_dnf_time_budget_raises_normal_form_error(self) -> None:
+        program = " and ".join(f"(a{i} or b{i})" for i in range(20))
+        with pytest.raises(NormalFormError, match="time budget"):
+            to_dnf(parse(program), timeout=0)
+
+    def test_exact_cnf_drops_tautologies(self) -> None:
+        clause_set = to_cnf(parse("a or not a"))
+        assert clause_set.clauses == []
+
+    def test_iter_dimacs(self) -> None:
+        clause_set = to_cnf(parse("(a or b) and not c"))
+        assert list(clause_set.iter_dimacs()) == [
+            "c var 1 a",
+            "c var 2 b",
+            "c var 3 c",
+            "p cnf 3 2",
+            "1 2 0",
+            "-3 0",
+        ]
@@ -3,9 +3,11 @@ import re
 import pytest
 from markers import Parser
 from markers.error import ParseError
-from markers.expressions import BinaryOp, BinaryOpKind, Lit, UnaryOp, UnaryOpKind, Var
+from markers.expressions import And, Definition, Lit, Or, UnaryOp, UnaryOpKind, Var
 from markers.tokens import (
     AndOpToken,
+    AssignToken,
+    EofToken,
     LeftParenToken,
     LitToken,
     NameToken,
@@ -31,12 +33,12 @@ class TestParser:
     def test_parse_and(self) -> None:
         tokens = [NameToken("A"), AndOpToken(), NameToken("B")]
         expr = Parser(tokens).parse()
-        assert expr == BinaryOp(BinaryOpKind.AND, Var("A"), Var("B"))
+        assert expr == And((Var("A"), Var("B")))
 
     def test_parse_or(self) -> None:
         tokens = [NameToken("A"), OrOpToken(), NameToken("B")]
         expr = Parser(tokens).parse()
-        assert expr == BinaryOp(BinaryOpKind.OR, Var("A"), Var("B"))
+        assert expr == Or((Var("A"), Var("B")))
 
     def test_parse_parentheses(self) -> None:
         tokens = [
@@ -49,12 +51,12 @@ class TestParser:
             RightParenToken(),
         ]
         expr = Parser(tokens).parse()
-        assert expr == BinaryOp(BinaryOpKind.AND, Var("A"), BinaryOp(BinaryOpKind.OR, Var("B"), Var("C")))
+        assert expr == And((Var("A"), Or((Var("B"), Var("C")))))
 
     def test_parse_and_binds_tighter_than_or(self) -> None:
         tokens = [NameToken("A"), AndOpToken(), NameToken("B"), OrOpToken(), NameToken("C")]
         expr = Parser(tokens).parse()
-        assert expr == BinaryOp(BinaryOpKind.OR, BinaryOp(BinaryOpKind.AND, Var("A"), Var("B")), Var("C"))
+        assert expr == Or((And((Var("A"), Var("B"))), Var("C")))
 
     def test_parse_double_negation(self) -> None:
         tokens = [NotOpToken(), NotOpToken(), NameToken("A")]
@@ -71,7 +73,7 @@ class TestParser:
             RightParenToken(),
         ]
         expr = Parser(tokens).parse()
-        assert expr == UnaryOp(UnaryOpKind.NOT, BinaryOp(BinaryOpKind.OR, Var("A"), Var("B")))
+        assert expr == UnaryOp(UnaryOpKind.NOT, Or((Var("A"), Var("B"))))
 
     def test_parse_missing_right_paren_raises_parse_error(self) -> None:
         tokens = [LeftParenToken(), NameToken("A"), OrOpToken(), NameToken("B")]
@@ -119,12 +121,12 @@ class TestParser:
     def test_parse_repeated_and(self) -> None:
         tokens = [NameToken("A"), AndOpToken(), NameToken("B"), AndOpToken(), NameToken("C")]
         expr = Parser(tokens).parse()
-        assert expr == BinaryOp(BinaryOpKind.AND, BinaryOp(BinaryOpKind.AND, Var("A"), Var("B")), Var("C"))
+        assert expr == And((Var("A"), Var("B"), Var("C")))
 
     def test_parse_repeated_or(self) -> None:
         tokens = [NameToken("A"), OrOpToken(), NameToken("B"), OrOpToken(), NameToken("C")]
         expr = Parser(tokens).parse()
-        assert expr == BinaryOp(BinaryOpKind.OR, BinaryOp(BinaryOpKind.OR, Var("A"), Var("B")), Var("C"))
+        assert expr == Or((Var("A"), Var("B"), Var("C")))
 
     def test_parse_expression_after_right_paren(self) -> None:
         tokens = [
@@ -135,7 +137,7 @@ class TestParser:
             NameToken("B"),
         ]
         expr = Parser(tokens).parse()
-        assert expr == BinaryOp(BinaryOpKind.OR, Var("A"), Var("B"))
+        assert expr == Or((Var("A"), Var("B")))
 
     def test_parse_retains_position_info(self) -> None:
         # Testing expression: "A and (B or C)"
@@ -149,18 +151,26 @@ class TestParser:
             RightParenToken(pos=PositionInfo(1, 14, 1)),
         ]
         expr = Parser(tokens).parse()
-        assert expr == BinaryOp(
-            BinaryOpKind.AND,
-            Var("A", pos=PositionInfo(1, 1, 1)),
-            BinaryOp(
-                BinaryOpKind.OR,
-                Var("B", pos=PositionInfo(1, 8, 1)),
-                Var("C", pos=PositionInfo(1, 13, 1)),
-                pos=PositionInfo(1, 10, 2),
+        assert expr == And(
+            (
+                Var("A", pos=PositionInfo(1, 1, 1)),
+                Or(
+                    (Var("B", pos=PositionInfo(1, 8, 1)), Var("C", pos=PositionInfo(1, 13, 1))),
+                    pos=PositionInfo(1, 10, 2),
+                ),
             ),
             pos=PositionInfo(1, 3, 3),
         )
 
+    def test_parse_long_chain_is_flat(self) -> None:
+        tokens: list[Token] = [NameToken("A0")]
+        for idx in range(1, 10_000):
+            tokens.extend([OrOpToken(), NameToken(f"A{idx}")])
+        expr = Parser(tokens).parse()
+        assert isinstance(expr, Or)
+        assert len(expr.args) == 10_000
+        assert len(expr.ops) == 9_999
+
     def test_parse_missing_right_paren_retains_position_info(self) -> None:
         # Testing expression: "not (A"
         tokens = [
@@ -171,3 +181,50 @@ class TestParser:
         with pytest.raises(ParseError, match=re.escape("Expected closing paren matching opening")) as exc:
             Parser(tokens).parse()
         assert exc.value.pos == PositionInfo(1, 5, 1)
+
+    def test_parse_definitions(self) -> None:
+        # Testing program: "a = x or y b = not a"
+        tokens = [
+            NameToken("a"),
+            AssignToken(),
+            NameToken("x"),
+            OrOpToken(),
+            NameToken("y"),
+            NameToken("b"),
+            AssignToken(),
+            NotOpToken(),
+            NameToken("a"),
+        ]
+        definitions = Parser(tokens).parse_definitions()
+        assert definitions == [
+            Definition("a", Or((Var("x"), Var("y")))),
+            Definition("b", UnaryOp(UnaryOpKind.NOT, Var("a"))),
+        ]
+
+    def test_parse_definitions_missing_assign_raises_parse_error(self) -> None:
+        tokens = [NameToken("a", pos=PositionInfo(1, 1, 1)), NameToken("x", pos=PositionInfo(1, 3, 1))]
+        with pytest.raises(ParseError, match=re.escape('Expected "=" after definition name "a"')) as exc:
+            Parser(tokens).parse_definitions()
+        assert exc.value.pos == PositionInfo(1, 1, 1)
+
+    def test_parse_token_iterator(self) -> None:
+        tokens = iter([NameToken("A"), OrOpToken(), NotOpToken(), NameToken("B")])
+        expr = Parser(tokens).parse()
+        assert expr == Or((Var("A"), UnaryOp(UnaryOpKind.NOT, Var("B"))))
+
+    def test_parse_token_iterator_reports_last_token(self) -> None:
+        tokens = iter([NameToken("A"), AndOpToken(), RightParenToken(), NameToken("B", pos=PositionInfo(1, 9, 1))])
+        with pytest.raises(ParseError, match=re.escape("Unexpected end of input")) as exc:
+            Parser(tokens).parse()
+        assert exc.value.pos == PositionInfo(1, 9, 1)
+
+    def test_parse_trailing_eof(self) -> None:
+        tokens = [NameToken("A"), OrOpToken(), NameToken("B"), EofToken()]
+        expr = Parser(tokens).parse()
+        assert expr == Or((Var("A"), Var("B")))
+
+    def test_parse_incomplete_before_eof_reports_eof_position(self) -> None:
+        tokens = [NameToken("A"), OrOpToken(), EofToken(pos=PositionInfo(1, 5, 0))]
+        with pytest.raises(ParseError, match=re.escape("Unexpected end of input")) as exc:
+            Parser(tokens).parse()
+        assert exc.value.pos == PositionInfo(1, 5, 0)
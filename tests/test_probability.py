@@ -0,0 +1,94 @@
+import itertools
+
+import pytest
+from markers import Evaluator
+from markers.error import EvaluateError, InternalError
+from markers.expressions import Expr
+from markers.probability import ProbabilityModel, probability
+from markers.type import PositionInfo
+
+from tests.conftest import parse
+
+PROBABILITIES = {"a": 0.5, "b": 0.25, "c": 0.9, "d": 0.1}
+
+
+def brute_force(expr: Expr) -> float:
+    total = 0.0
+    names = list(PROBABILITIES)
+    for values in itertools.product([False, True], repeat=len(names)):
+        env = dict(zip(names, values, strict=True))
+        if Evaluator().evaluate(expr, env):
+            weight = 1.0
+            for name, value in env.items():
+                weight *= PROBABILITIES[name] if value else 1 - PROBABILITIES[name]
+            total += weight
+    return total
+
+
+class TestProbability:
+    @pytest.mark.parametrize(
+        ("program", "method"),
+        [
+            ("a", "independent"),
+            ("true and not b", "independent"),
+            ("a and b or c and d", "independent"),
+            ("a and (a or b)", "bdd"),
+            ("(a or b) and (not a or c) and d", "bdd"),
+            ("not (a and b) or (b and c) or d", "bdd"),
+        ],
+    )
+    def test_exact_matches_brute_force(self, program: str, method: str) -> None:
+        expr = parse(program)
+        result = probability(expr, PROBABILITIES)
+        assert result.exact
+        assert result.method == method
+        assert result.value == pytest.approx(brute_force(expr))
+
+    def test_contradiction_and_tautology(self) -> None:
+        assert probability(parse("a and not a"), PROBABILITIES).value == pytest.approx(0.0)
+        assert probability(parse("a or not a"), PROBABILITIES).value == pytest.approx(1.0)
+
+    def test_falls_back_to_monte_carlo_over_budget(self) -> None:
+        expr = parse("(a or b) and (not a or c) and (b or d)")
+        result = probability(expr, PROBABILITIES, max_bdd_nodes=2, samples=50_000, seed=0)
+        assert not result.exact
+        assert result.method == "monte-carlo"
+        assert result.std_error > 0
+        assert result.value == pytest.approx(brute_force(expr), abs=5 * result.std_error)
+
+    def test_estimate_is_reproducible_with_seed(self) -> None:
+        expr = parse("a and b or c")
+        first = ProbabilityModel(PROBABILITIES, seed=1).estimate(expr, samples=1000)
+        second = ProbabilityModel(PROBABILITIES, seed=1).estimate(expr, samples=1000)
+        assert first == second
+
+    def test_model_reuses_decision_diagram_across_formulas(self) -> None:
+        model = ProbabilityModel(PROBABILITIES)
+        exprs = [parse("a and (a or b)"), parse("(a and (a or b)) or c"), parse("b and (b or c)")]
+        for expr in exprs:
+            assert model.probability(expr).value == pytest.approx(brute_force(expr))
+
+    def test_model_drops_decision_diagram_over_cache_size(self) -> None:
+        model = ProbabilityModel(PROBABILITIES, max_bdd_cache_size=20)
+        sizes = []
+        for a, b in itertools.permutations("abcd", 2):
+            for template in ["{a} and ({a} or {b})", "({a} or {b}) and (not {a} or {b})"]:
+                expr = parse(template.format(a=a, b=b))
+                assert model.probability(expr).value == pytest.approx(brute_force(expr))
+                sizes.append(model.cache_size)
+        # The diagram is dropped before a formula once it is over the cache size, and each of these adds a few entries
+        assert any(later < earlier for earlier, later in itertools.pairwise(sizes))
+        assert max(sizes) < 30
+
+    def test_unknown_variable_raises_evaluate_error(self) -> None:
+        with pytest.raises(EvaluateError, match='Unknown variable: "e"') as exc:
+            probability(parse("a or e"), PROBABILITIES)
+        assert exc.value.pos == PositionInfo(1, 6, 1)
+
+    def test_invalid_probability_raises_evaluate_error(self) -> None:
+        with pytest.raises(EvaluateError, match='Probability of "a" must be between 0 and 1, found 1.5'):
+            probability(parse("a"), {"a": 1.5})
+
+    def test_estimate_rejects_non_positive_samples(self) -> None:
+        with pytest.raises(InternalError, match="Sample count must be positive"):
+            ProbabilityModel(PROBABILITIES).estimate(parse("a"), samples=0)
@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+from markers import Evaluator
+from markers.error import EvaluateError
+from markers.providers import AsyncEvaluator, LazyEnv
+from markers.type import PositionInfo
+
+from tests.conftest import parse
+
+
+class TestProviders:
+    def test_lazy_env_memoizes_resolutions(self) -> None:
+        calls: list[str] = []
+
+        def provider(name: str) -> bool:
+            calls.append(name)
+            return name == "a"
+
+        env = LazyEnv(provider)
+        assert env["a"]
+        assert "a" in env
+        assert not env["b"]
+        assert calls == ["a", "b"]
+        assert len(env) == 2
+
+    def test_lazy_env_unknown_variable(self) -> None:
+        def provider(name: str) -> bool:
+            raise KeyError(name)
+
+        env = LazyEnv(provider)
+        assert "a" not in env
+        assert len(env) == 0
+
+    def test_evaluate_lazy_skips_short_circuited_variables(self) -> None:
+        calls: list[str] = []
+
+        def provider(name: str) -> bool:
+            calls.append(name)
+            return {"a": False, "b": True, "c": True}[name]
+
+        result = Evaluator().evaluate_lazy(parse("a and b or a and c or not a"), provider)
+        assert result.value
+        assert calls == ["a"]
+        assert result.resolved == 1
+        assert result.skipped == 2
+
+    def test_evaluate_lazy_unknown_variable_raises_evaluate_error(self) -> None:
+        with pytest.raises(EvaluateError, match='Unknown variable: "x"') as exc:
+            Evaluator().evaluate_lazy(parse("true and x"), {"y": True}.__getitem__)
+        assert exc.value.pos == PositionInfo(1, 10, 1)
+
+    def test_async_evaluate_resolves_operands_concurrently(self) -> None:
+        started: list[str] = []
+
+        async def provider(name: str) -> bool:
+            started.append(name)
+            await asyncio.sleep(0.01)
+            return True
+
+        result = asyncio.run(AsyncEvaluator().evaluate(parse("a and b"), provider))
+        assert result.value
+        assert sorted(started) == ["a", "b"]
+        assert result.resolved == 2
+        assert result.skipped == 0
+
+    def test_async_evaluate_cancels_short_circuited_operand(self) -> None:
+        started: list[str] = []
+        finished: list[str] = []
+
+        async def provider(name: str) -> bool:
+            started.append(name)
+            await asyncio.sleep(0 if name == "a" else 1)
+            finished.append(name)
+            return False
+
+        result = asyncio.run(AsyncEvaluator().evaluate(parse("a and (b or c)"), provider))
+        assert not result.value
+        # Only one operand runs ahead, and its call counts as resolved even though it was cancelled
+        assert started == ["a", "b"]
+        assert finished == ["a"]
+        assert result.resolved == 2
+        assert result.skipped == 1
+
+    def test_async_evaluate_limits_speculative_calls(self) -> None:
+        started: list[str] = []
+
+        async def provider(name: str) -> bool:
+            started.append(name)
+            await asyncio.sleep(0 if name == "a" else 0.01)
+            return name != "a"
+
+        program = "a and (b or c) and (d or e or f) and not g"
+        result = asyncio.run(AsyncEvaluator(max_speculative=0).evaluate(parse(program), provider))
+        assert not result.value
+        assert started == ["a"]
+        assert result.resolved == 1
+        assert result.skipped == 6
+
+        started.clear()
+        result = asyncio.run(AsyncEvaluator(max_speculative=2).evaluate(parse(program), provider))
+        assert not result.value
+        assert len(started) == result.resolved == 3
+        assert result.skipped == 4
+
+    def test_async_evaluate_sequential_resolves_shared_variable_once(self) -> None:
+        calls: list[str] = []
+
+        async def provider(name: str) -> bool:
+            calls.append(name)
+            return name != "b"
+
+        result = asyncio.run(AsyncEvaluator(concurrent=False).evaluate(parse("(a and b) or (a and c)"), provider))
+        assert result.value
+        assert calls == ["a", "b", "c"]
+
+    def test_async_evaluate_ignores_unknown_variable_when_short_circuited(self) -> None:
+        async def provider(name: str) -> bool:
+            if name == "a":
+                await asyncio.sleep(0.01)
+                return True
+            raise KeyError(name)
+
+        result = asyncio.run(AsyncEvaluator().evaluate(parse("a or missing"), provider))
+        assert result.value
+
+    def test_async_evaluate_unknown_variable_raises_evaluate_error(self) -> None:
+        async def provider(name: str) -> bool:
+            if name == "a":
+                return False
+            raise KeyError(name)
+
+        with pytest.raises(EvaluateError, match='Unknown variable: "missing"'):
+            asyncio.run(AsyncEvaluator().evaluate(parse("a or missing"), provider))
+
+    def test_async_evaluate_nary_cancels_remaining_operands(self) -> None:
+        finished: list[str] = []
+
+        async def provider(name: str) -> bool:
+            await asyncio.sleep({"a": 0, "b": 0.01}.get(name, 1))
+            finished.append(name)
+            return name == "b"
+
+        result = asyncio.run(AsyncEvaluator().evaluate(parse("a or b or c or d"), provider))
+        assert result.value
+        assert finished == ["a", "b"]
+        assert result.resolved == 2
+        assert result.skipped == 2
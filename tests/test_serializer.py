@@ -0,0 +1,78 @@
+import io
+
+import pytest
+from markers.error import InternalError
+from markers.expressions import And, BinaryOp, BinaryOpKind, Expr, Lit, Or, UnaryOp, UnaryOpKind, Var, to_nary
+from markers.serializer import dump, dumps
+
+from tests.conftest import parse
+
+
+class TestSerializer:
+    @pytest.mark.parametrize(
+        "program",
+        [
+            "a",
+            "true",
+            "false",
+            "not a",
+            "not not a",
+            "a and b and c",
+            "a or b and c",
+            "a and b or c",
+            "(a or b) and c",
+            "not a and b",
+            "not (a and b)",
+            "not (not a or b)",
+            "(a and b) and c",
+            "a and (b and c)",
+            "a or (b or c) or d",
+            "(a or true) and not (b and (c or not false))",
+        ],
+    )
+    def test_round_trips_minimal_programs(self, program: str) -> None:
+        assert dumps(parse(program)) == program
+
+    def test_removes_redundant_parentheses(self) -> None:
+        assert dumps(parse("((a)) or (not (b)) or ((c and d))")) == "a or not b or c and d"
+
+    def test_writes_lowercase_literals(self) -> None:
+        assert dumps(Or((Lit(True), Lit(False)))) == "true or false"
+
+    def test_flattens_binary_chains(self) -> None:
+        expr = BinaryOp(
+            BinaryOpKind.AND,
+            BinaryOp(BinaryOpKind.AND, Var("a"), Var("b")),
+            BinaryOp(BinaryOpKind.OR, Var("c"), Var("d")),
+        )
+        assert dumps(expr) == "a and b and (c or d)"
+        assert str(parse(dumps(expr))) == str(to_nary(expr))
+
+    def test_keeps_nested_nary_groups(self) -> None:
+        expr = And((And((Var("a"), Var("b"))), Var("c")))
+        assert dumps(expr) == "(a and b) and c"
+        assert parse(dumps(expr)) == parse("(a and b) and c")
+
+    def test_writes_deep_expressions_in_chunks(self) -> None:
+        depth = 10_000
+        expr: Expr = Var("a")
+        for idx in range(depth):
+            expr = UnaryOp(UnaryOpKind.NOT, expr) if idx % 2 else BinaryOp(BinaryOpKind.OR, Var("b"), expr)
+
+        class CountingStream(io.StringIO):
+            writes = 0
+
+            def write(self, text: str) -> int:
+                self.writes += 1
+                return super().write(text)
+
+        stream = CountingStream()
+        dump(expr, stream, buffer_size=1024)
+        text = stream.getvalue()
+        assert stream.writes > 1
+        assert text.startswith("not (b or not (b or ")
+        assert text.endswith("not (b or a)" + ")" * (depth // 2 - 1))
+
+    def test_invalid_expression(self) -> None:
+        with pytest.raises(InternalError, match="^Serialize is not implemented for expression type"):
+            dumps(Expr())
@@ -0,0 +1,53 @@
+from markers import Evaluator, Lexer, Parser, Stats
+from markers.compiler import compile_expr
+from markers.limits import Limits
+
+
+class TestStats:
+    def test_stats_records_phase_times(self) -> None:
+        stats = Stats()
+        tokens = Lexer.tokenize("a and b", stats=stats)
+        expr = Parser(tokens, stats=stats).parse()
+        Evaluator(stats=stats).evaluate(expr, {"a": True, "b": False})
+        assert stats.lex_seconds > 0
+        assert stats.parse_seconds > 0
+        assert stats.eval_seconds > 0
+
+    def test_stats_counts_node_visits(self) -> None:
+        stats = Stats()
+        expr = Parser(Lexer.tokenize("not a and b")).parse()
+        Evaluator(stats=stats).evaluate(expr, {"a": False, "b": True})
+        assert stats.node_visits == 4
+
+    def test_stats_counts_short_circuits(self) -> None:
+        stats = Stats()
+        expr = Parser(Lexer.tokenize("a and b or c")).parse()
+        Evaluator(stats=stats).evaluate(expr, {"a": False, "b": True, "c": True})
+        assert stats.short_circuits == 1
+        assert stats.var_lookups == {"a": 1, "c": 1}
+
+    def test_stats_counts_repeated_var_lookups(self) -> None:
+        stats = Stats()
+        expr = Parser(Lexer.tokenize("a and (a or b)")).parse()
+        Evaluator(stats=stats).evaluate(expr, {"a": True, "b": True})
+        assert stats.var_lookups["a"] == 2
+        assert stats.var_lookups["b"] == 0
+
+    def test_stats_accumulate_across_evaluations(self) -> None:
+        stats = Stats()
+        expr = Parser(Lexer.tokenize("a")).parse()
+        evaluator = Evaluator(stats=stats)
+        evaluator.evaluate(expr, {"a": True})
+        evaluator.evaluate(expr, {"a": False})
+        assert stats.node_visits == 2
+        assert stats.to_dict()["var_lookups"] == {"a": 2}
+
+    def test_stats_count_with_limits_and_compiled_expressions(self) -> None:
+        expr = Parser(Lexer.tokenize("a and b or c")).parse()
+        stats = Stats()
+        Evaluator(stats=stats, limits=Limits(max_steps=100)).evaluate(expr, {"a": False, "b": True, "c": True})
+        compiled = compile_expr(expr)
+        Evaluator(stats=stats).evaluate_compiled(compiled, compiled.bind({"a": False, "b": True, "c": True}))
+        assert stats.node_visits == 8
+        assert stats.short_circuits == 2
+        assert stats.var_lookups == {"a": 1, "c": 1}
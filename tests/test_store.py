@@ -0,0 +1,145 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pytest
+from markers import Evaluator
+from markers.definitions import DefinitionGraph, iter_definitions
+from markers.error import DefinitionError, EvaluateError, InternalError
+from markers.expressions import BinaryOp, BinaryOpKind, Definition, Var
+from markers.store import FormulaStore, build_store
+
+DEFINITIONS = """\
+both = x and y
+either = x or y or z
+neither = not (x or y)
+mixed = (x and not y) or (z and true) or false
+"""
+
+
+def _evaluate_in_worker(path: Path, name: str, x: bool) -> bool:
+    with FormulaStore(path) as store:
+        return store.evaluate(name, {"x": x, "y": True, "z": False})
+
+
+class TestStore:
+    def test_evaluate_matches_evaluator(self, tmp_path: Path) -> None:
+        definitions = list(iter_definitions(DEFINITIONS.splitlines(keepends=True)))
+        path = tmp_path / "rules.store"
+        build_store(path, definitions)
+        with FormulaStore(path) as store:
+            assert len(store) == 4
+            assert list(store.names()) == ["both", "either", "mixed", "neither"]
+            for x, y, z in itertools.product([False, True], repeat=3):
+                env = {"x": x, "y": y, "z": z}
+                for definition in definitions:
+                    assert store.evaluate(definition.name, env) == Evaluator().evaluate(definition.expr, env)
+
+    def test_evaluate_short_circuits_like_evaluator(self, tmp_path: Path) -> None:
+        definitions = list(iter_definitions(DEFINITIONS.splitlines(keepends=True)))
+        path = tmp_path / "rules.store"
+        build_store(path, definitions)
+        with FormulaStore(path) as store:
+            for values in itertools.product([False, True, None], repeat=3):
+                # Variables assigned None are left out of the environment
+                env = {var: val for var, val in zip("xyz", values, strict=True) if val is not None}
+                for definition in definitions:
+                    try:
+                        expected = Evaluator().evaluate(definition.expr, env)
+                    except EvaluateError:
+                        with pytest.raises(EvaluateError):
+                            store.evaluate(definition.name, env)
+                    else:
+                        assert store.evaluate(definition.name, env) == expected
+
+    def test_evaluate_skips_unneeded_references(self, tmp_path: Path) -> None:
+        path = tmp_path / "rules.store"
+        build_store(path, iter_definitions(["x = a or b\n", "y = not a and x\n"]))
+        with FormulaStore(path) as store:
+            assert store.evaluate("x", {"a": True})
+            assert not store.evaluate("y", {"a": True})
+
+    def test_evaluate_binary_expression(self, tmp_path: Path) -> None:
+        path = tmp_path / "rules.store"
+        build_store(path, [Definition("f", BinaryOp(BinaryOpKind.AND, Var("a"), Var("b")))])
+        with FormulaStore(path) as store:
+            assert store.evaluate("f", {"a": True, "b": True})
+            assert not store.evaluate("f", {"a": True, "b": False})
+
+    def test_missing_formula_raises_key_error(self, tmp_path: Path) -> None:
+        path = tmp_path / "rules.store"
+        build_store(path, iter_definitions(["a = x\n"]))
+        with FormulaStore(path) as store:
+            assert "a" in store
+            assert "b" not in store
+            with pytest.raises(KeyError):
+                store.evaluate("b", {"x": True})
+
+    def test_unknown_variable_raises_evaluate_error(self, tmp_path: Path) -> None:
+        path = tmp_path / "rules.store"
+        build_store(path, iter_definitions(["a = x and y\n"]))
+        with FormulaStore(path) as store, pytest.raises(EvaluateError, match='Unknown variable: "y" in formula "a"'):
+            store.evaluate("a", {"x": True})
+
+    def test_duplicate_definition_raises_definition_error(self, tmp_path: Path) -> None:
+        path = tmp_path / "rules.store"
+        with pytest.raises(DefinitionError, match='Duplicate definition: "a"'):
+            build_store(path, iter_definitions(["a = x\n", "a = y\n"]))
+        assert not path.exists()
+
+    def test_definitions_reference_other_definitions(self, tmp_path: Path) -> None:
+        lines = [
+            "can_edit = is_admin and not locked\n",
+            "is_admin = role_admin or superuser\n",
+            "can_delete = can_edit and is_admin and owner\n",
+        ]
+        path = tmp_path / "rules.store"
+        build_store(path, iter_definitions(lines))
+        graph = DefinitionGraph.build(iter_definitions(lines))
+        with FormulaStore(path) as store:
+            for values in itertools.product([False, True], repeat=4):
+                env = dict(zip(["role_admin", "superuser", "locked", "owner"], values, strict=True))
+                expected = graph.evaluate(env)
+                for name in ["can_edit", "is_admin", "can_delete"]:
+                    assert store.evaluate(name, env) == expected[name]
+
+    def test_unknown_variable_in_referenced_definition(self, tmp_path: Path) -> None:
+        path = tmp_path / "rules.store"
+        build_store(path, iter_definitions(["a = b and x\n", "b = y\n"]))
+        with FormulaStore(path) as store, pytest.raises(EvaluateError, match='Unknown variable: "y" in formula "b"'):
+            store.evaluate("a", {"x": True})
+
+    def test_cyclic_definitions_raise_definition_error(self, tmp_path: Path) -> None:
+        path = tmp_path / "rules.store"
+        with pytest.raises(DefinitionError, match="^Cyclic definitions: a -> b -> a$"):
+            build_store(path, iter_definitions(["a = b or x\n", "b = a\n"]))
+        assert not path.exists()
+
+    def test_invalid_file_raises_internal_error(self, tmp_path: Path) -> None:
+        path = tmp_path / "rules.store"
+        path.write_bytes(b"not a store at all!!")
+        with pytest.raises(InternalError, match="Not a formula store"):
+            FormulaStore(path)
+
+    def test_reload_swaps_in_new_version(self, tmp_path: Path) -> None:
+        path = tmp_path / "rules.store"
+        build_store(path, iter_definitions(["a = x\n"]))
+        with FormulaStore(path) as store:
+            assert not store.reload()
+            build_store(path, iter_definitions(["a = not x\n", "b = x\n"]))
+            assert store.evaluate("a", {"x": True})
+            assert store.reload()
+            assert not store.evaluate("a", {"x": True})
+            assert len(store) == 2
+        assert [p.name for p in tmp_path.iterdir()] == ["rules.store"]
+
+    def test_worker_processes_share_store(self, tmp_path: Path) -> None:
+        path = tmp_path / "rules.store"
+        build_store(path, iter_definitions(DEFINITIONS.splitlines(keepends=True)))
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            results = list(
+                executor.map(
+                    _evaluate_in_worker, [path] * 4, ["both", "both", "neither", "either"], [True, False, False, False]
+                )
+            )
+        assert results == [True, False, False, True]
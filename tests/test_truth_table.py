@@ -0,0 +1,51 @@
+import pytest
+from markers import Evaluator
+from markers.expressions import BinaryOp, BinaryOpKind, Var
+from markers.truth_table import IncrementalEvaluator, TableRow, iter_truth_table
+
+from tests.conftest import parse
+
+
+class TestTruthTable:
+    @pytest.mark.parametrize(
+        "program",
+        [
+            "a",
+            "not a and true",
+            "a and b or not c",
+            "(a or not b) and (c or d and not a) or not (e and (f or a)) and g",
+            "a and a and not a",
+        ],
+    )
+    def test_rows_match_evaluator(self, program: str) -> None:
+        expr = parse(program)
+        names = IncrementalEvaluator(expr).names
+        rows = list(iter_truth_table(expr))
+        assert len(rows) == 2 ** len(names)
+        assert len({row.values for row in rows}) == len(rows)
+        for row in rows:
+            assert row.result == Evaluator().evaluate(expr, dict(zip(names, row.values)))
+
+    def test_consecutive_rows_differ_in_one_variable(self) -> None:
+        rows = list(iter_truth_table(parse("a or b or c or d")))
+        for prev, curr in zip(rows, rows[1:]):
+            assert sum(x != y for x, y in zip(prev.values, curr.values)) == 1
+
+    def test_gray_code_order(self) -> None:
+        rows = list(iter_truth_table(parse("a and not b")))
+        assert rows == [
+            TableRow((False, False), False),
+            TableRow((False, True), False),
+            TableRow((True, True), False),
+            TableRow((True, False), True),
+        ]
+
+    def test_no_variables(self) -> None:
+        assert list(iter_truth_table(parse("true or false"))) == [TableRow((), True)]
+
+    def test_flip_binary_expression(self) -> None:
+        evaluator = IncrementalEvaluator(BinaryOp(BinaryOpKind.AND, Var("a"), Var("b")))
+        assert evaluator.names == ["a", "b"]
+        assert not evaluator.flip(0)
+        assert evaluator.flip(1)
+        assert not evaluator.flip(0)
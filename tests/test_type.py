@@ -0,0 +1,25 @@
+from markers.type import LineIndex, PositionInfo
+
+
+class TestType:
+    def test_line_index_location(self) -> None:
+        index = LineIndex("ab\ncd\n\nef")
+        assert index.location(0) == (1, 1)
+        assert index.location(2) == (1, 3)
+        assert index.location(3) == (2, 1)
+        assert index.location(6) == (3, 1)
+        assert index.location(8) == (4, 2)
+
+    def test_line_index_line(self) -> None:
+        index = LineIndex("ab\ncd\n\nef")
+        assert index.line(1) == "ab"
+        assert index.line(2) == "cd"
+        assert index.line(3) == ""
+        assert index.line(4) == "ef"
+
+    def test_lazy_position_info_equals_explicit(self) -> None:
+        index = LineIndex("a and\nb")
+        pos = PositionInfo.at(index, 6, 1)
+        assert pos.offset == 6
+        assert pos == PositionInfo(2, 1, 1)
+        assert repr(pos) == "PositionInfo(line_no=2, char_no=1, length=1)"